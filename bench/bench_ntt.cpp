@@ -0,0 +1,422 @@
+// bench_ntt.cpp
+//
+// Microbenchmark of the modular multiplication kernels and of NTT/BigNTT
+// convolutions, against the division-based kernels they replaced, and of
+// NTT convolutions with each vectorised kernel set supported by the CPU,
+// of CrtNTT convolutions (with one and two primes) against BigNTT and
+// NTT, of Toeplitz extraction with the packed GF(2)[x] engine against
+// the NTT, and of Toeplitz extraction at the input lengths of bench.py
+// with transforms of the shortest admissible length (2^l or 3 * 2^l)
+// against the power of 2 they were padded to before, and of convolutions
+// computing only m = L / 64 output coefficients against full ones, and
+// of Horner evaluation in the word-level GF(2^k) of the Trevisan
+// extractor against the bitset GF2Poly.
+//
+// Usage: bench_ntt [max_l]   (default max_l = 24)
+#include <bigntt.h>
+#include <crtntt.h>
+#include <extractors.h>
+#include <gf2k.h>
+#include <gf2x.h>
+#include <modarith.h>
+#include <ntt.h>
+#include <trevisan.h>
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+using namespace std;
+
+static uint32_t reference_mul32(uint32_t a, uint32_t b) {
+    uint64_t n = a; n *= b;
+    return n % mod32::P;
+}
+
+static uint64_t reference_mul64(uint64_t a, uint64_t b) {
+    const uint64_t P = mod64::P;
+    uint64_t c = (double)a * b / P;
+    int64_t ans = int64_t(a * b - c * P) % int64_t(P);
+    if (ans < 0)
+        ans += P;
+    return ans;
+}
+
+template <class F>
+static double seconds(F f, int repeats = 3) {
+    double best = 1e300;
+    for (int i = 0; i < repeats; i++) {
+        auto start = chrono::steady_clock::now();
+        f();
+        chrono::duration<double> d = chrono::steady_clock::now() - start;
+        best = min(best, d.count());
+    }
+    return best;
+}
+
+/**
+ * NTT::conv and BigNTT::conv as computed before the Montgomery/Shoup
+ * kernels: fully reduced butterflies with a division-based modular
+ * multiplication.
+ */
+template <class T, T (*mul)(T, T)>
+class ReferenceNTT {
+  private:
+    size_t L;
+    T P, Linv;
+    vector<T> R, Rinv;
+    vector<size_t> revbits;
+
+    T modexp(T x, T e) const {
+        T r = 1;
+        for (; e; e >>= 1, x = mul(x, x)) {
+            if (e & 1) {
+                r = mul(r, x);
+            }
+        }
+        return r;
+    }
+
+    vector<T> ntt(const vector<T> &x, bool inverse) const {
+        const vector<T> &U = inverse ? Rinv : R;
+        vector<T> y(L);
+        for (size_t i = 0; i < L; i++) {
+            y[revbits[i]] = x[i];
+        }
+        for (size_t h = 2, k = 1, u = L / 2; h <= L; k = h, h <<= 1, u >>= 1) {
+            for (size_t i = 0; i < L; i += h) {
+                for (size_t j = 0, v = 0; j < k; j++, v += u) {
+                    T a = y[i + j];
+                    T b = mul(y[i + j + k], U[v]);
+                    uint64_t c = (uint64_t)a + b;
+                    y[i + j] = c >= P ? c - P : c;
+                    y[i + j + k] = a >= b ? a - b : a + (P - b);
+                }
+            }
+        }
+        if (inverse) {
+            for (size_t i = 0; i < L; i++) {
+                y[i] = mul(Linv, y[i]);
+            }
+        }
+        return y;
+    }
+
+  public:
+    ReferenceNTT(unsigned l, T P) : L(size_t(1) << l), P(P), R(L / 2), Rinv(L / 2), revbits(L) {
+        T root = modexp(5, (P - 1) >> l), root_inv = modexp(root, P - 2);
+        for (size_t i = 0, t = 1, tinv = 1; i < L / 2; i++, t = mul(t, root), tinv = mul(tinv, root_inv)) {
+            R[i] = t;
+            Rinv[i] = tinv;
+        }
+        for (size_t i = 0; i < L; i++) {
+            for (unsigned k = 0; k < l; k++) {
+                revbits[i] |= ((i >> k) & 1) << (l - 1 - k);
+            }
+        }
+        Linv = modexp(L % P, P - 2);
+    }
+
+    vector<T> conv(const vector<T> &a, const vector<T> &b) const {
+        vector<T> fa = ntt(a, false), fb = ntt(b, false);
+        for (size_t i = 0; i < L; i++) {
+            fa[i] = mul(fa[i], fb[i]);
+        }
+        return ntt(fa, true);
+    }
+};
+
+template <class T>
+static volatile T sink;
+
+static void bench_kernels(size_t n) {
+    mt19937_64 rng(1);
+    vector<uint32_t> a32(n), b32(n), s32(n);
+    vector<uint64_t> a64(n), b64(n), s64(n);
+    for (size_t i = 0; i < n; i++) {
+        a32[i] = rng() % mod32::P;
+        b32[i] = rng() % mod32::P;
+        s32[i] = mod32::to_mont(b32[i]);
+        a64[i] = rng() % mod64::P;
+        b64[i] = rng() % mod64::P;
+        s64[i] = mod64::shoup(b64[i]);
+    }
+
+    auto run32 = [&](auto mul) {
+        return seconds([&] {
+            uint32_t acc = 0;
+            for (size_t i = 0; i < n; i++) {
+                acc ^= mul(a32[i] ^ (acc & 1), i);
+            }
+            sink<uint32_t> = acc;
+        }) / n * 1e9;
+    };
+    auto run64 = [&](auto mul) {
+        return seconds([&] {
+            uint64_t acc = 0;
+            for (size_t i = 0; i < n; i++) {
+                acc ^= mul(a64[i] ^ (acc & 1), i);
+            }
+            sink<uint64_t> = acc;
+        }) / n * 1e9;
+    };
+
+    printf("%-34s %8s\n", "kernel", "ns/op");
+    printf("%-34s %8.2f\n", "mod32 reference (64-bit %)",
+           run32([&](uint32_t a, size_t i) { return reference_mul32(a, b32[i]); }));
+    printf("%-34s %8.2f\n", "mod32 Montgomery",
+           run32([&](uint32_t a, size_t i) { return mod32::mul(a, b32[i]); }));
+    printf("%-34s %8.2f\n", "mod32 Montgomery (fixed operand)",
+           run32([&](uint32_t a, size_t i) { return mod32::mul_mont(a, s32[i]); }));
+    printf("%-34s %8.2f\n", "mod64 reference (double + %)",
+           run64([&](uint64_t a, size_t i) { return reference_mul64(a, b64[i]); }));
+    printf("%-34s %8.2f\n", "mod64 Montgomery",
+           run64([&](uint64_t a, size_t i) { return mod64::mul(a, b64[i]); }));
+    printf("%-34s %8.2f\n", "mod64 Shoup (fixed operand)",
+           run64([&](uint64_t a, size_t i) { return mod64::mul_shoup(a, b64[i], s64[i]); }));
+    printf("%-34s %8.2f\n", "mod64 Shoup lazy (fixed operand)",
+           run64([&](uint64_t a, size_t i) { return mod64::mul_shoup_lazy(a, b64[i], s64[i]); }));
+    printf("\n");
+}
+
+static void bench_transforms(unsigned max_l) {
+    printf("%4s %12s %12s %8s %12s %12s %8s\n", "l", "ref 32-bit", "NTT::conv", "speedup",
+           "ref 64-bit", "BigNTT::conv", "speedup");
+    mt19937_64 rng(2);
+    for (unsigned l = 12; l <= max_l; l += 2) {
+        size_t L = size_t(1) << l;
+        vector<uint32_t> a(L), b(L);
+        vector<uint64_t> a64(L), b64(L);
+        for (size_t i = 0; i < L; i++) {
+            a[i] = a64[i] = rng() & 1;
+            b[i] = b64[i] = rng() & 1;
+        }
+        NTT ntt(l);
+        BigNTT big_ntt(l);
+        ReferenceNTT<uint32_t, reference_mul32> ref(l, mod32::P);
+        ReferenceNTT<uint64_t, reference_mul64> ref64(l, mod64::P);
+        if (ref.conv(a, b) != ntt.conv(a, b) || ref64.conv(a64, b64) != big_ntt.conv(a64, b64)) {
+            printf("convolutions differ at l = %u\n", l);
+            exit(1);
+        }
+        double t_ref = seconds([&] { sink<uint32_t> = ref.conv(a, b)[0]; });
+        double t_ntt = seconds([&] { sink<uint32_t> = ntt.conv(a, b)[0]; });
+        double t_ref64 = seconds([&] { sink<uint64_t> = ref64.conv(a64, b64)[0]; });
+        double t_big = seconds([&] { sink<uint64_t> = big_ntt.conv(a64, b64)[0]; });
+        printf("%4u %11.4fs %11.4fs %7.2fx %11.4fs %11.4fs %7.2fx\n",
+               l, t_ref, t_ntt, t_ref / t_ntt, t_ref64, t_big, t_ref64 / t_big);
+    }
+}
+
+static void bench_simd(unsigned max_l) {
+    vector<const NttKernels *> kernels = available_ntt_kernels();
+    printf("\n%4s", "l");
+    for (const NttKernels *k : kernels) {
+        printf(" %12s", k->name);
+    }
+    printf("   (NTT::conv)\n");
+    mt19937_64 rng(3);
+    for (unsigned l = 12; l <= max_l; l += 2) {
+        size_t L = size_t(1) << l;
+        vector<uint32_t> a(L), b(L);
+        for (size_t i = 0; i < L; i++) {
+            a[i] = rng() & 1;
+            b[i] = rng() & 1;
+        }
+        printf("%4u", l);
+        for (const NttKernels *k : kernels) {
+            NTT ntt(l, *k);
+            printf(" %11.4fs", seconds([&] { sink<uint32_t> = ntt.conv(a, b)[0]; }));
+        }
+        printf("\n");
+    }
+}
+
+static void bench_crt(unsigned max_l) {
+    printf("\n%4s %12s %12s %12s %12s\n", "l", "NTT::conv", "BigNTT::conv", "CrtNTT 1", "CrtNTT 2");
+    mt19937_64 rng(4);
+    for (unsigned l = 12; l <= max_l; l += 2) {
+        size_t L = size_t(1) << l;
+        vector<uint32_t> a(L), b(L);
+        vector<uint64_t> a64(L), b64(L);
+        for (size_t i = 0; i < L; i++) {
+            a[i] = a64[i] = rng() & 1;
+            b[i] = b64[i] = rng() & 1;
+        }
+        NTT ntt(l);
+        BigNTT big_ntt(l);
+        // Rows of 2^(l/2) elements, as for the longest sequences
+        CrtNTT crt1(l, l / 2 + 1, 1), crt2(l, l / 2 + 1, 2);
+        vector<uint64_t> c = big_ntt.conv(a64, b64);
+        if (crt1.conv(a64, b64) != c || crt2.conv(a64, b64) != c) {
+            printf("convolutions differ at l = %u\n", l);
+            exit(1);
+        }
+        printf("%4u %11.4fs %11.4fs %11.4fs %11.4fs\n", l,
+               seconds([&] { sink<uint32_t> = ntt.conv(a, b)[0]; }),
+               seconds([&] { sink<uint64_t> = big_ntt.conv(a64, b64)[0]; }),
+               seconds([&] { sink<uint64_t> = crt1.conv(a64, b64)[0]; }),
+               seconds([&] { sink<uint64_t> = crt2.conv(a64, b64)[0]; }));
+    }
+}
+
+static void bench_gf2(unsigned max_l) {
+    vector<const Gf2xKernels *> kernels = available_gf2x_kernels();
+    printf("\n%10s %12s", "n_1", "NTT");
+    for (const Gf2xKernels *k : kernels) {
+        printf(" %12s", k->name);
+    }
+    printf("   (Toeplitz extraction, m = n_1 / 2)\n");
+    mt19937_64 rng(5);
+    for (unsigned l = 12; l <= max_l; l += 2) {
+        uint64_t n = uint64_t(1) << (l - 1), m = n / 2;
+        vector<uint8_t> x(n), y(n + m - 1);
+        for (uint8_t &b : x) {
+            b = rng() & 1;
+        }
+        for (uint8_t &b : y) {
+            b = rng() & 1;
+        }
+        BitView bx{x.data(), x.size()}, by{y.data(), y.size()};
+        NTT ntt(l);
+        vector<uint8_t> expected = conv_extract(ntt, ConvKind::toeplitz, bx, by, n, m);
+        printf("%10llu %11.4fs", (unsigned long long)n,
+               seconds([&] { sink<uint32_t> = conv_extract(ntt, ConvKind::toeplitz, bx, by, n, m)[0]; }));
+        for (const Gf2xKernels *k : kernels) {
+            GF2Conv gf2(l, *k);
+            if (conv_extract(gf2, ConvKind::toeplitz, bx, by, n, m) != expected) {
+                printf("\noutputs differ at n_1 = %llu\n", (unsigned long long)n);
+                exit(1);
+            }
+            printf(" %11.4fs", seconds([&] { sink<uint32_t> = conv_extract(gf2, ConvKind::toeplitz, bx, by, n, m)[0]; }));
+        }
+        printf("\n");
+    }
+}
+
+static void bench_sizes(unsigned max_l) {
+    printf("\n%10s %10s %10s %10s %10s   (Toeplitz extraction, m = n_1 / 2)\n",
+           "n_1", "old L", "time", "new L", "time");
+    mt19937_64 rng(6);
+    for (uint64_t p = 10; p <= (uint64_t(1) << max_l); p *= 10) {
+        for (uint64_t c : {10, 18, 32, 56}) {
+            uint64_t n = c * p, m = n / 2;
+            // As cryptomite.utils.log_2(2 * n_1) and conv_plan(n_1 + m - 1)
+            unsigned old_l = 0, l = 1;
+            while ((uint64_t(1) << old_l) <= 2 * n) {
+                old_l++;
+            }
+            while ((uint64_t(1) << l) < n + m - 1) {
+                l++;
+            }
+            unsigned threes = l > 2 && (uint64_t(3) << (l - 2)) >= n + m - 1;
+            if (old_l > max_l + 1) {
+                return;
+            }
+            vector<uint8_t> x(n), y(n + m - 1);
+            for (uint8_t &b : x) {
+                b = rng() & 1;
+            }
+            for (uint8_t &b : y) {
+                b = rng() & 1;
+            }
+            BitView bx{x.data(), x.size()}, by{y.data(), y.size()};
+            NTT old_ntt(old_l), ntt(threes ? l - 2 : l, threes);
+            vector<uint8_t> expected = conv_extract(old_ntt, ConvKind::toeplitz, bx, by, n, m);
+            if (conv_extract(ntt, ConvKind::toeplitz, bx, by, n, m) != expected) {
+                printf("\noutputs differ at n_1 = %llu\n", (unsigned long long)n);
+                exit(1);
+            }
+            printf("%10llu %10llu %9.4fs %10llu %9.4fs\n", (unsigned long long)n,
+                   (unsigned long long)old_ntt.size(),
+                   seconds([&] { sink<uint32_t> = conv_extract(old_ntt, ConvKind::toeplitz, bx, by, n, m)[0]; }),
+                   (unsigned long long)ntt.size(),
+                   seconds([&] { sink<uint32_t> = conv_extract(ntt, ConvKind::toeplitz, bx, by, n, m)[0]; }));
+        }
+    }
+}
+
+static void bench_pruned(unsigned max_l) {
+    printf("\n%4s %12s %12s %12s %12s   (conv_transformed, m = L / 64)\n",
+           "l", "NTT", "pruned", "CrtNTT", "pruned");
+    mt19937_64 rng(7);
+    for (unsigned l = 12; l <= max_l; l += 2) {
+        NTT ntt(l);
+        CrtNTT crt(l, 16);
+        vector<uint32_t> a(ntt.size()), b(ntt.size());
+        vector<uint64_t> a64(ntt.size()), b64(ntt.size());
+        for (size_t i = 0; i < a.size(); i++) {
+            a[i] = a64[i] = rng() & 1;
+            b[i] = b64[i] = rng() & 1;
+        }
+        CoefficientRanges keep = {{0, ntt.size() / 64}};
+        vector<uint32_t> b_hat = ntt.ntt(b, false);
+        CrtNTT::spectrum_type b64_hat = crt.ntt(b64, false);
+        printf("%4u %11.4fs %11.4fs %11.4fs %11.4fs\n", l,
+               seconds([&] { sink<uint32_t> = ntt.conv_transformed(a, b_hat)[0]; }),
+               seconds([&] { sink<uint32_t> = ntt.conv_transformed(a, b_hat, keep)[0]; }),
+               seconds([&] { sink<uint64_t> = crt.conv_transformed(a64, b64_hat)[0]; }),
+               seconds([&] { sink<uint64_t> = crt.conv_transformed(a64, b64_hat, keep)[0]; }));
+    }
+}
+
+static void bench_gf2k() {
+    vector<const Gf2xKernels *> kernels = available_gf2x_kernels();
+    printf("\n%10s %12s", "k", "GF2Poly");
+    for (const Gf2xKernels *k : kernels) {
+        printf(" %12s", k->name);
+    }
+    printf("   (Horner evaluation of 1000 coefficients)\n");
+    mt19937_64 rng(8);
+    const size_t n = 1000;
+    for (int k : {8, 16, 40, 64, 100, 200}) {
+        GF2Poly poly(k);
+        GF2k field(k);
+        vector<poly_bits> coeff_bits(n);
+        vector<uint64_t> coeffs(n * field.words);
+        GF2k::element x{};
+        poly_bits x_bits;
+        for (size_t j = 0; j <= n; j++) {
+            for (int i = 0; i < k; i++) {
+                if (rng() & 1) {
+                    if (j == n) {
+                        x[i / 64] |= uint64_t(1) << (i % 64);
+                        x_bits[i] = 1;
+                    } else {
+                        coeffs[j * field.words + i / 64] |= uint64_t(1) << (i % 64);
+                        coeff_bits[j][i] = 1;
+                    }
+                }
+            }
+        }
+        poly_bits expected = poly.horner_method(coeff_bits, x_bits);
+        printf("%10d %11.6fs", k, seconds([&] { sink<uint64_t> = poly.horner_method(coeff_bits, x_bits)[0]; }));
+        for (const Gf2xKernels *kern : kernels) {
+            GF2k f(k, *kern);
+            GF2k::element r = f.horner(coeffs.data(), n, x);
+            for (int i = 0; i < k; i++) {
+                if (((r[i / 64] >> (i % 64)) & 1) != expected[i]) {
+                    printf("\noutputs differ at k = %d\n", k);
+                    exit(1);
+                }
+            }
+            printf(" %11.6fs", seconds([&] { sink<uint64_t> = f.horner(coeffs.data(), n, x)[0]; }));
+        }
+        printf("\n");
+    }
+}
+
+int main(int argc, char **argv) {
+    unsigned max_l = argc > 1 ? atoi(argv[1]) : 24;
+    bench_kernels(1 << 22);
+    bench_transforms(max_l);
+    bench_simd(max_l);
+    bench_crt(max_l);
+    bench_gf2(max_l);
+    bench_sizes(max_l);
+    bench_pruned(max_l);
+    bench_gf2k();
+    return 0;
+}
@@ -0,0 +1,5 @@
+import sys
+
+from cryptomite.cli import main
+
+sys.exit(main())
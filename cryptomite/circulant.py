@@ -5,9 +5,15 @@ a (weak) seed of `n_1 + 1' bits, where `n_1 + 1' is prime.
 from __future__ import annotations
 
 from math import floor
-from typing import cast
+from typing import TYPE_CHECKING
 
-from cryptomite.utils import BitsT, closest_prime, conv, log_2
+from cryptomite import _cryptomite
+from cryptomite._cryptomite import SeededExtractor
+from cryptomite.utils import (BitRowsLikeT, BitsLikeT, BitsT, closest_prime,
+                              conv_plan)
+
+if TYPE_CHECKING:
+    from numpy import ndarray
 
 __all__ = ['Circulant']
 
@@ -16,7 +22,7 @@ class Circulant:
     """
     Circulant extractor based on [For2024]_.
     """
-    def __init__(self, n_1: int, m: int):
+    def __init__(self, n_1: int, m: int, engine: str | None = None):
         """
         Initialize a Circulant extractor.
 
@@ -27,20 +33,32 @@ class Circulant:
             **Note:** n_1 + 1 must be prime.
         m : int
             The length of the extractor output (in bits).
+        engine : str, optional
+            The convolution engine, as for
+            `cryptomite.utils.conv_plan` (default: the number theoretic
+            transform suited to the length). 'gf2' multiplies packed
+            polynomials over GF(2) instead, which is faster and needs 32
+            times less memory.
         """
         self.n_1, self.m = n_1, m
+        self.engine = engine
 
-    def extract(self, input1: BitsT, input2: BitsT) -> BitsT:
+    def extract(self, input1: BitsLikeT, input2: BitsLikeT,
+                packed_input: bool = False) -> BitsT:
         """
         Perform randomness extraction.
 
         Parameters
         ----------
-        input1 : list of bits (0s and 1s)
+        input1 : list of bits (0s and 1s), or bit buffer
             The first input (the 'weak input'), consisting of n_1 bits.
-        input2 : list of bits (0s and 1s)
+        input2 : list of bits (0s and 1s), or bit buffer
             The second input (the '(weak) seed'), consisting
             of n_2 = n_1 + 1 bits.
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
 
         Returns
         -------
@@ -48,19 +66,72 @@ class Circulant:
             The extractor output bits, of length m.
         """
         n_1, m = self.n_1, self.m
-        assert len(input1) == len(input2) - 1 == n_1
         assert n_1 >= m
-        input1 = input1 + [0]
-        n_1 += 1
-        input1, input2 = list(input1), list(input2)
-        l = log_2(2 * n_1 - 2)
-        L = 1 << l
-        input1 = input1[0:1] + input1[1:][::-1] + [0] * (L - n_1)
-        input2 = input2 + [0] * (L - len(input2))
-        conv_output = conv(l, input1, input2)
-        output: BitsT = cast(BitsT, [
-            (conv_output[i] + conv_output[i + n_1]) & 1 for i in range(m)])
-        return output
+        plan = conv_plan(2 * n_1 + 1, self.engine)
+        return _cryptomite.circulant_extract(plan, input1, input2, n_1, m,
+                                             packed_input)
+
+    def extract_many(self, inputs: BitRowsLikeT,
+                     seeds: BitRowsLikeT | BitsLikeT,
+                     packed_input: bool = False) -> ndarray:
+        """
+        Perform randomness extraction on a batch of blocks, natively
+        and in parallel (see Toeplitz.extract_many).
+
+        Parameters
+        ----------
+        inputs : 2-D array of bits, or list of bit lists
+            The first inputs, one row of n_1 bits per block.
+        seeds : 2-D array of bits, or list of bit lists, or bits
+            The second inputs, one row of n_2 = n_1 + 1 bits per block,
+            or a single one shared by all blocks.
+        packed_input : bool
+            If True, the rows of both inputs are packed eight bits per
+            byte along their last axis, as by
+            ``numpy.packbits(..., axis=1)``, in exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
+
+        Returns
+        -------
+        numpy.ndarray
+            The extractor outputs, an array of shape (blocks, m) with
+            dtype uint8.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        plan = conv_plan(2 * n_1 + 1, self.engine)
+        return _cryptomite.circulant_extract_many(
+            plan, inputs, seeds, n_1, m, packed_input)
+
+    def with_seed(self, input2: BitsLikeT,
+                  packed_input: bool = False) -> SeededExtractor:
+        """
+        Fix the (weak) seed, transforming it once for all later
+        extractions (see Toeplitz.with_seed).
+
+        Parameters
+        ----------
+        input2 : list of bits (0s and 1s), or bit buffer
+            The second input (the '(weak) seed'), consisting
+            of n_2 = n_1 + 1 bits.
+        packed_input : bool
+            If True, input2 is a bit buffer packed eight bits per byte,
+            as by ``numpy.packbits``, of exactly ceil(n_2 / 8) bytes
+            (default: False, one bit per item). The extractor returned
+            takes the same argument.
+
+        Returns
+        -------
+        SeededExtractor
+            An extractor whose ``extract(input1)`` method behaves like
+            ``self.extract(input1, input2)``.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        plan = conv_plan(2 * n_1 + 1, self.engine)
+        return _cryptomite.seeded_extractor(
+            plan, _cryptomite.ConvKind.circulant, input2, n_1, m,
+            packed_input)
 
     @staticmethod
     def from_params(
@@ -70,7 +141,8 @@ class Circulant:
             k_2: float,
             log2_error: float,
             q_proof: bool,
-            verbose: bool = True) -> Circulant:
+            verbose: bool = True,
+            engine: str | None = None) -> Circulant:
         """
         Generate a Circulant extractor with valid parameters
         based on input constraints.
@@ -89,10 +161,15 @@ class Circulant:
             The logarithm (base 2) of the acceptable extractor error.
             Must be negative, as the extractor error is 2^log2_error.
         q_proof : bool
-            If True, adjusts parameters to ensure quantum-proof extraction
-            in the Markov and product sources models (see [For2024]_).
+            If True, adjusts parameters to ensure quantum-proof
+            extraction in the Markov and product sources models (see
+            [For2024]_).
         verbose : bool
-            If True, prints the parameters used for extraction (default: True).
+            If True, prints the parameters used for extraction
+            (default: True).
+        engine : str, optional
+            The convolution engine of the extractor returned (see
+            `Circulant`; default: the number theoretic transform).
 
         Returns
         -------
@@ -106,18 +183,20 @@ class Circulant:
 
         Notes
         -----
-        - If n_2 is not prime, the function selects the closest prime and
-          adjusts the other parameters accordingly.
-        - For this extractor, the output length remains the same when it is
-          classical-proof, quantum-proof in the product sources model, and
-          quantum-proof in the Markov model (see [For2024]_).
+        - If n_2 is not prime, the function selects the closest prime
+          and adjusts the other parameters accordingly.
+        - For this extractor, the output length remains the same when it
+          is classical-proof, quantum-proof in the product sources
+          model, and quantum-proof in the Markov model (see
+          [For2024]_).
         """
         assert log2_error <= 0
 
         # Find the closest prime to the average of input lengths.
         n_2_adjusted = closest_prime((n_1 + n_2) // 2)
 
-        # Adjust min-entropy values if input lengths exceed the computed prime.
+        # Adjust min-entropy values if input lengths exceed the computed
+        # prime.
         k_1_adjusted = k_1 - max(0, n_1 - (n_2_adjusted - 1))
         k_2_adjusted = k_2 - max(0, n_2 - n_2_adjusted)
 
@@ -151,4 +230,4 @@ class Circulant:
             print("""Adjust the length of the input
                   and (weak) seed accordingly.""")
 
-        return Circulant(n_2_adjusted - 1, m)
+        return Circulant(n_2_adjusted - 1, m, engine=engine)
@@ -0,0 +1,306 @@
+"""
+Command-line interface, run as ``python -m cryptomite``.
+
+The ``extract`` command reads raw, packed bits (eight per byte, most
+significant bit first, as by ``numpy.packbits``) from memory-mapped
+input and seed files, extracts them block by block with the
+parameters chosen by the extractor's ``from_params`` helper, and
+writes the output bits packed in the same way.
+"""
+from __future__ import annotations
+
+import argparse
+import mmap
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from math import floor
+from typing import BinaryIO, Iterator, Sequence
+
+from cryptomite import raz
+from cryptomite.circulant import Circulant
+from cryptomite.dodis import Dodis
+from cryptomite.toeplitz import Toeplitz
+from cryptomite.trevisan import Trevisan
+
+import numpy as np
+
+__all__ = ['main']
+
+EXTRACTORS = ['toeplitz', 'circulant', 'dodis', 'raz', 'trevisan',
+              'von-neumann']
+ENGINES = ['ntt', 'bigntt', 'crt', 'gf2']
+RAZ_ENGINES = ['gf2', 'ntt']
+
+# The options of each extractor, rejected when given to any other
+_CONV_OPTIONS = ['seed', 'n_1', 'k_1', 'n_2', 'k_2', 'log2_error',
+                 'q_proof', 'engine', 'seed_per_block']
+_OPTIONS = {
+    'toeplitz': _CONV_OPTIONS,
+    'circulant': _CONV_OPTIONS,
+    'dodis': _CONV_OPTIONS,
+    'raz': ['seed', 'n_1', 'k_1', 'n_2', 'k_2', 'log2_error', 'engine',
+            'seed_per_block'],
+    'trevisan': ['seed', 'n_1', 'k_1', 'log2_error', 'seed_per_block'],
+    'von-neumann': [],
+}
+_DEFAULT_LOG2_ERROR = -32
+
+# Input bits per batch of blocks handed to extract_many, by default
+_BATCH_BITS = 1 << 24
+
+
+class _BitWriter:
+    """
+    Packs a stream of bits into whole bytes, zero padding the last one.
+    """
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.pending = np.zeros(0, dtype=np.uint8)
+        self.nbits = 0
+
+    def write(self, bits: np.ndarray) -> None:
+        bits = np.concatenate([self.pending, bits.reshape(-1)])
+        whole = len(bits) - len(bits) % 8
+        self.out.write(np.packbits(bits[:whole]).tobytes())
+        self.pending = bits[whole:]
+        self.nbits += whole
+
+    def close(self) -> None:
+        if len(self.pending):
+            self.out.write(np.packbits(self.pending).tobytes())
+            self.nbits += len(self.pending)
+            self.pending = self.pending[:0]
+
+
+@contextmanager
+def _closing(mapped: mmap.mmap) -> Iterator[mmap.mmap]:
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # An array over the map outlives the context, e.g. held by
+            # the traceback of an error: the map closes once it is
+            # collected
+            pass
+
+
+def _map(stack: ExitStack, path: str) -> np.ndarray:
+    """
+    The bytes of a file, memory-mapped until the stack is closed.
+    """
+    f = stack.enter_context(open(path, 'rb'))
+    # mmap refuses empty files
+    if not f.seek(0, 2):
+        return np.zeros(0, dtype=np.uint8)
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(stack.enter_context(_closing(mapped)),
+                         dtype=np.uint8)
+
+
+def _bit_rows(data: np.ndarray, start: int, rows: int, nbits: int,
+              pad: int = 0) -> np.ndarray:
+    """
+    Rows of nbits bits each, starting at bit `start` of the packed data,
+    right padded with `pad` zeros and packed eight bits per byte: a view
+    of the mapped bytes when rows are byte aligned, else repacked.
+    """
+    if start % 8 == 0 and nbits % 8 == 0 and not pad:
+        first = start // 8
+        return data[first:first + rows * nbits // 8].reshape(rows, -1)
+    first, last = start // 8, (start + rows * nbits + 7) // 8
+    bits = np.unpackbits(data[first:last])
+    offset = start - 8 * first
+    bits = bits[offset:offset + rows * nbits].reshape(rows, nbits)
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.packbits(bits, axis=1)
+
+
+def _check_options(parser: argparse.ArgumentParser,
+                   args: argparse.Namespace) -> None:
+    """
+    Exit with a usage error if an option does not apply to the
+    extractor.
+    """
+    # The convolution extractors take every option
+    for name in _CONV_OPTIONS:
+        value = getattr(args, name)
+        if value not in (None, False) and name not in _OPTIONS[args.extractor]:
+            option = '--' + name.replace('_', '-')
+            parser.error(f'{option} does not apply to the {args.extractor} '
+                         'extractor.')
+    if args.extractor == 'raz' and args.engine not in (None, *RAZ_ENGINES):
+        parser.error(f'--engine {args.engine} does not apply to the raz '
+                     f'extractor, expected one of {", ".join(RAZ_ENGINES)}.')
+
+
+def _extractor(args: argparse.Namespace, seed_bits: int):
+    """
+    The extractor, its input block length and its seed length in bits.
+    """
+    log2_error = args.log2_error
+    if log2_error is None:
+        log2_error = _DEFAULT_LOG2_ERROR
+    if args.extractor == 'trevisan':
+        ext = Trevisan(args.n_1, floor(args.k_1), 2.0 ** log2_error)
+        return ext, ext.config.n, ext.ext.get_seed_length()
+    n_2 = args.n_2 if args.n_2 is not None else seed_bits
+    k_2 = args.k_2 if args.k_2 is not None else n_2
+    params = (args.n_1, args.k_1, n_2, k_2, log2_error)
+    if args.extractor == 'toeplitz':
+        ext = Toeplitz.from_params(*params, args.q_proof, args.verbose,
+                                   args.engine)
+        return ext, ext.n_1, ext.n_1 + ext.m - 1
+    if args.extractor == 'circulant':
+        ext = Circulant.from_params(*params, args.q_proof, args.verbose,
+                                    args.engine)
+        return ext, ext.n_1, ext.n_1 + 1
+    if args.extractor == 'dodis':
+        ext = Dodis.from_params(*params, args.q_proof, args.verbose,
+                                args.engine)
+        return ext, ext.n, ext.n
+    ext = raz.from_params(*params, verbose=args.verbose, engine=args.engine)
+    # Shorter seeds are zero padded to n_1 / 2 bits.
+    return ext, 2 * ext.n, min(n_2, ext.n)
+
+
+def _extract(args: argparse.Namespace, data: np.ndarray, seed: np.ndarray,
+             writer: _BitWriter) -> int:
+    """
+    Extract every whole block of the input, returning the number of
+    input bits used.
+    """
+    seed_bits = 8 * len(seed)
+    if (args.seed_per_block and args.n_2 is None
+            and args.extractor != 'trevisan'):
+        raise ValueError('--n-2 is required with --seed-per-block.')
+    ext, n, d = _extractor(args, seed_bits)
+    blocks = 8 * len(data) // n
+    if args.seed_per_block:
+        blocks = min(blocks, seed_bits // d)
+    elif d > seed_bits:
+        raise ValueError(f'The seed file holds {seed_bits} bits, '
+                         f'{d} are needed.')
+    pad = ext.n - d if args.extractor == 'raz' else 0
+    batch = args.batch or max(1, _BATCH_BITS // n)
+    shared = None
+    if not args.seed_per_block:
+        shared = _bit_rows(seed, 0, 1, d, pad)[0]
+    for first in range(0, blocks, batch):
+        rows = min(batch, blocks - first)
+        inputs = _bit_rows(data, first * n, rows, n)
+        seeds = shared
+        if seeds is None:
+            seeds = _bit_rows(seed, first * d, rows, d, pad)
+        writer.write(ext.extract_many(inputs, seeds, packed_input=True))
+    return blocks * n
+
+
+def _von_neumann(args: argparse.Namespace, data: np.ndarray,
+                 writer: _BitWriter) -> int:
+    batch = (args.batch or _BATCH_BITS) // 8 or 1
+    for first in range(0, len(data), batch):
+        bits = np.unpackbits(data[first:first + batch])
+        x, y = bits[::2], bits[1::2]
+        writer.write(x[x != y])
+    return 8 * len(data)
+
+
+def extract(args: argparse.Namespace) -> int:
+    """
+    Run the ``extract`` command.
+    """
+    with ExitStack() as stack:
+        data, seed = _map(stack, args.input), None
+        out = stack.enter_context(open(args.out, 'wb'))
+        writer = _BitWriter(out)
+        start = time.perf_counter()
+        if args.extractor == 'von-neumann':
+            used = _von_neumann(args, data, writer)
+        else:
+            if args.seed is None or args.n_1 is None or args.k_1 is None:
+                raise ValueError(f'The {args.extractor} extractor needs '
+                                 '--seed, --n-1 and --k-1.')
+            seed = _map(stack, args.seed)
+            used = _extract(args, data, seed, writer)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        input_bits = 8 * len(data)
+        # Release the arrays over the maps, so that they close with the
+        # stack
+        del data, seed
+    rate = used / 8e6 / elapsed if elapsed > 0 else float('inf')
+    print(f'Extracted {writer.nbits} bits from {used} input bits '
+          f'({input_bits - used} unused) in {elapsed:.3f}s: '
+          f'{rate:.2f} MB/s of input.', file=sys.stderr)
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Entry point of ``python -m cryptomite``.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command-line arguments (default: ``sys.argv[1:]``).
+
+    Returns
+    -------
+    int
+        The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m cryptomite',
+        description='Randomness extractors on packed binary files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    cmd = commands.add_parser(
+        'extract', help='extract a file block by block',
+        description='Extract the packed bits of a file block by block. The '
+                    'output bits are written packed, the last byte zero '
+                    'padded.')
+    cmd.add_argument('--extractor', required=True, choices=EXTRACTORS)
+    cmd.add_argument('--input', required=True,
+                     help='file of packed input bits')
+    cmd.add_argument('--seed',
+                     help='file of packed (weak) seed bits, shared by all '
+                          'blocks unless --seed-per-block is given')
+    cmd.add_argument('--out', required=True,
+                     help='file to write the packed output bits to')
+    cmd.add_argument('--n-1', type=int,
+                     help='length of an input block, in bits')
+    cmd.add_argument('--k-1', type=float,
+                     help='min-entropy of an input block')
+    cmd.add_argument('--n-2', type=int,
+                     help='length of a seed, in bits (default: the whole '
+                          'seed file)')
+    cmd.add_argument('--k-2', type=float,
+                     help='min-entropy of a seed (default: n_2)')
+    cmd.add_argument('--log2-error', type=float,
+                     help='base 2 logarithm of the extractor error '
+                          f'(default: {_DEFAULT_LOG2_ERROR})')
+    cmd.add_argument('--q-proof', action='store_true',
+                     help='choose quantum-proof parameters')
+    cmd.add_argument('--engine', choices=ENGINES,
+                     help='convolution engine of the toeplitz, circulant and '
+                          'dodis extractors (default: the number theoretic '
+                          'transform; gf2, faster, multiplies packed '
+                          'polynomials over GF(2)), or field multiplication '
+                          'of the raz extractor (gf2, the default, or ntt)')
+    cmd.add_argument('--seed-per-block', action='store_true',
+                     help='read a new seed for every block')
+    cmd.add_argument('--batch', type=int,
+                     help='number of blocks extracted at a time (bits for '
+                          'von-neumann)')
+    cmd.add_argument('--verbose', action='store_true',
+                     help='print the extractor parameters')
+    args = parser.parse_args(argv)
+    _check_options(cmd, args)
+    try:
+        return extract(args)
+    except (OSError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
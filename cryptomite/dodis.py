@@ -7,9 +7,15 @@ requires n to be prime with primitive root 2.
 from __future__ import annotations
 
 from math import floor, log2
-from typing import cast
+from typing import TYPE_CHECKING
 
-from cryptomite.utils import BitsT, closest_na_set, conv, log_2
+from cryptomite import _cryptomite
+from cryptomite._cryptomite import SeededExtractor
+from cryptomite.utils import (BitRowsLikeT, BitsLikeT, BitsT, closest_na_set,
+                              conv_plan)
+
+if TYPE_CHECKING:
+    from numpy import ndarray
 
 __all__ = ['Dodis']
 
@@ -19,7 +25,7 @@ class Dodis:
     Dodis et al. extractor [Dodis2004]_, with implementation
     based on [For2020, For2024]_.
     """
-    def __init__(self, n: int, m: int):
+    def __init__(self, n: int, m: int, engine: str | None = None):
         """
         Initialize a Dodis extractor.
 
@@ -30,19 +36,31 @@ class Dodis:
             **Note:** n must be prime with primitive root 2.
         m : int
             The length of the extractor output (in bits).
+        engine : str, optional
+            The convolution engine, as for
+            `cryptomite.utils.conv_plan` (default: the number theoretic
+            transform suited to the length). 'gf2' multiplies packed
+            polynomials over GF(2) instead, which is faster and needs 32
+            times less memory.
         """
         self.n, self.m = n, m
+        self.engine = engine
 
-    def extract(self, input1: BitsT, input2: BitsT) -> BitsT:
+    def extract(self, input1: BitsLikeT, input2: BitsLikeT,
+                packed_input: bool = False) -> BitsT:
         """
         Perform randomness extraction.
 
         Parameters
         ----------
-        input1 : list of bits (0s and 1s)
+        input1 : list of bits (0s and 1s), or bit buffer
             The first input (the 'weak input'), consisting of n bits.
-        input2 : list of bits (0s and 1s)
+        input2 : list of bits (0s and 1s), or bit buffer
             The second input (the '(weak) seed'), consisting of n bits.
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
 
         Returns
         -------
@@ -50,17 +68,71 @@ class Dodis:
             The extractor output bits, of length m.
         """
         n, m = self.n, self.m
-        assert len(input1) == len(input2) == n
         assert n >= m
-        l = log_2(2 * n - 2)
-        L = 1 << l
-        input1, input2 = list(input1), list(input2)
-        input1 = input1[0:1] + input1[1:][::-1] + [0] * (L - n)
-        input2 = input2 + [0] * (L - len(input2))
-        conv_output = conv(l, input1, input2)
-        output: BitsT = cast(BitsT, [
-            (conv_output[i] + conv_output[i + n]) & 1 for i in range(m)])
-        return output
+        plan = conv_plan(2 * n - 1, self.engine)
+        return _cryptomite.dodis_extract(plan, input1, input2, n, m,
+                                         packed_input)
+
+    def extract_many(self, inputs: BitRowsLikeT,
+                     seeds: BitRowsLikeT | BitsLikeT,
+                     packed_input: bool = False) -> ndarray:
+        """
+        Perform randomness extraction on a batch of blocks, natively
+        and in parallel (see Toeplitz.extract_many).
+
+        Parameters
+        ----------
+        inputs : 2-D array of bits, or list of bit lists
+            The first inputs, one row of n bits per block.
+        seeds : 2-D array of bits, or list of bit lists, or bits
+            The second inputs, one row of n bits per block, or a
+            single one shared by all blocks.
+        packed_input : bool
+            If True, the rows of both inputs are packed eight bits per
+            byte along their last axis, as by
+            ``numpy.packbits(..., axis=1)``, in exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
+
+        Returns
+        -------
+        numpy.ndarray
+            The extractor outputs, an array of shape (blocks, m) with
+            dtype uint8.
+        """
+        n, m = self.n, self.m
+        assert n >= m
+        plan = conv_plan(2 * n - 1, self.engine)
+        return _cryptomite.dodis_extract_many(
+            plan, inputs, seeds, n, m, packed_input)
+
+    def with_seed(self, input2: BitsLikeT,
+                  packed_input: bool = False) -> SeededExtractor:
+        """
+        Fix the (weak) seed, transforming it once for all later
+        extractions (see Toeplitz.with_seed).
+
+        Parameters
+        ----------
+        input2 : list of bits (0s and 1s), or bit buffer
+            The second input (the '(weak) seed'), consisting of n bits.
+        packed_input : bool
+            If True, input2 is a bit buffer packed eight bits per byte,
+            as by ``numpy.packbits``, of exactly ceil(n / 8) bytes
+            (default: False, one bit per item). The extractor returned
+            takes the same argument.
+
+        Returns
+        -------
+        SeededExtractor
+            An extractor whose ``extract(input1)`` method behaves like
+            ``self.extract(input1, input2)``.
+        """
+        n, m = self.n, self.m
+        assert n >= m
+        plan = conv_plan(2 * n - 1, self.engine)
+        return _cryptomite.seeded_extractor(
+            plan, _cryptomite.ConvKind.dodis, input2, n, m,
+            packed_input)
 
     @staticmethod
     def from_params(
@@ -70,7 +142,8 @@ class Dodis:
             k_2: float,
             log2_error: float,
             q_proof: bool,
-            verbose: bool = True) -> Dodis:
+            verbose: bool = True,
+            engine: str | None = None) -> Dodis:
         """
         Generate a Dodis et al. extractor with valid parameters
         based on input constraints.
@@ -89,10 +162,15 @@ class Dodis:
             The logarithm (base 2) of the acceptable extractor error.
             Must be negative, as the extractor error is 2^log2_error.
         q_proof : bool
-            If True, adjusts parameters to ensure quantum-proof extraction
-            in the Markov and product sources models (see [For2024]_).
+            If True, adjusts parameters to ensure quantum-proof
+            extraction in the Markov and product sources models (see
+            [For2024]_).
         verbose : bool
-            If True, prints the parameters used for extraction (default: True).
+            If True, prints the parameters used for extraction
+            (default: True).
+        engine : str, optional
+            The convolution engine of the extractor returned (see
+            `Dodis`; default: the number theoretic transform).
 
         Returns
         -------
@@ -151,4 +229,4 @@ class Dodis:
             )
             print("""Adjust the length of the input
                   and (weak) seed accordingly.""")
-        return Dodis(n_adjusted, m)
+        return Dodis(n_adjusted, m, engine=engine)
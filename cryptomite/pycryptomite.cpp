@@ -1,15 +1,310 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
+#include <bitview.h>
+#include <extractors.h>
 #include <ntt.h>
+#include <parallel.h>
 #include <bigntt.h>
+#include <crtntt.h>
+#include <gf2n.h>
+#include <gf2x.h>
+#include <raz.h>
 #include <trevisan.cpp>
 
+#include <algorithm>
+#include <memory>
+#include <string>
+
 
 namespace py = pybind11;
 
+/** The sequences taken by the NTT methods (see ntt.h) */
+typedef std::vector<uint32_t> Sequence;
+
 // PYBIND11_MAKE_OPAQUE(std::vector<int>);
 
-PYBIND11_MODULE(_cryptomite, m) {
+namespace {
+
+/** View of nbits packed bits in `size` items of itemsize bytes, which must be ceil(nbits / 8) bytes */
+BitView packed_row(const uint8_t *data, py::ssize_t size, py::ssize_t itemsize, py::ssize_t stride, uint64_t nbits) {
+    if (itemsize != 1 || uint64_t(size) != (nbits + 7) / 8) {
+        throw py::value_error("Expected " + std::to_string(nbits) + " packed bits in " + std::to_string((nbits + 7) / 8)
+                              + " bytes, got " + std::to_string(size) + " items of " + std::to_string(itemsize)
+                              + " bytes.");
+    }
+    BitView view;
+    view.data = data;
+    view.stride = stride;
+    view.size = nbits;
+    view.packed = true;
+    return view;
+}
+
+/** View of one row of bits in a buffer, one bit per item or packed */
+BitView buffer_row(const py::buffer_info &info, const void *data, py::ssize_t size, py::ssize_t stride, uint64_t nbits,
+                   bool packed) {
+    char kind = info.format.empty() ? 'B' : info.format.back();
+    if (std::string("?bBhHiIlLqQnN").find(kind) == std::string::npos) {
+        throw py::type_error("Bit buffers must hold integers or booleans, got format '" + info.format + "'.");
+    }
+    if (packed) {
+        return packed_row(static_cast<const uint8_t *>(data), size, info.itemsize, stride, nbits);
+    }
+    BitView view;
+    view.data = static_cast<const uint8_t *>(data);
+    view.itemsize = info.itemsize;
+    view.stride = stride;
+    view.size = size;
+    return view;
+}
+
+/**
+ * Bits passed in from Python.
+ *
+ * Objects supporting the buffer protocol (NumPy arrays, bytes, bytearray,
+ * memoryview, ...) are read in place. They hold one bit per item, or, if
+ * `packed` is set, bits packed by `numpy.packbits` in ceil(nbits / 8)
+ * bytes exactly. Any other sequence (e.g. a list of ints) is copied, with
+ * one bit or, if `packed` is set, one byte of packed bits per item.
+ */
+class PyBits {
+  private:
+    std::unique_ptr<py::buffer_info> info;
+    std::vector<uint8_t> owned;
+
+  public:
+    BitView view;
+
+    PyBits(const py::object &obj, uint64_t nbits, bool packed) {
+        if (!PyObject_CheckBuffer(obj.ptr())) {
+            owned = obj.cast<std::vector<uint8_t>>();
+            if (packed) {
+                view = packed_row(owned.data(), owned.size(), 1, 1, nbits);
+                return;
+            }
+            view.data = owned.data();
+            view.size = owned.size();
+            return;
+        }
+        info = std::make_unique<py::buffer_info>(py::reinterpret_borrow<py::buffer>(obj).request());
+        if (info->ndim != 1) {
+            throw py::value_error("Bit buffers must be one-dimensional.");
+        }
+        view = buffer_row(*info, info->ptr, info->shape[0], info->strides[0], nbits, packed);
+    }
+};
+
+/** Whether an item of a sequence is itself a row of bits, not a bit (e.g. a NumPy scalar) */
+bool is_row(const py::handle &item) {
+    if (PyObject_CheckBuffer(item.ptr())) {
+        return py::reinterpret_borrow<py::buffer>(item).request().ndim == 1;
+    }
+    return py::isinstance<py::sequence>(item);
+}
+
+/**
+ * Rows of bits passed in from Python, one per block: a two-dimensional
+ * buffer (packed along its last axis if `packed` is set) or a sequence of
+ * bit sequences or buffers (see PyBits). A single row of bits (a one-dimensional buffer or
+ * a sequence of bits) is accepted where `single` is set, e.g. for a seed
+ * shared by all blocks.
+ */
+class PyBitRows {
+  private:
+    std::unique_ptr<py::buffer_info> info;
+    std::vector<PyBits> rows;
+
+  public:
+    std::vector<BitView> views;
+
+    PyBitRows(const py::object &obj, uint64_t nbits, bool single, const char *what, bool packed) {
+        if (PyObject_CheckBuffer(obj.ptr())) {
+            info = std::make_unique<py::buffer_info>(py::reinterpret_borrow<py::buffer>(obj).request());
+            if (info->ndim == 2) {
+                const char *data = static_cast<const char *>(info->ptr);
+                for (py::ssize_t i = 0; i < info->shape[0]; i++) {
+                    views.push_back(buffer_row(*info, data + i * info->strides[0], info->shape[1], info->strides[1], nbits,
+                                                packed));
+                }
+                return;
+            }
+            if (info->ndim != 1 || !single) {
+                throw py::value_error(std::string(what) + " must be a two-dimensional array of bits.");
+            }
+            info.reset();
+            rows.emplace_back(obj, nbits, packed);
+        } else {
+            py::sequence seq = obj.cast<py::sequence>();
+            bool is_rows = seq.size() == 0 || is_row(seq[0]);
+            if (!is_rows && !single) {
+                throw py::value_error(std::string(what) + " must be a two-dimensional array of bits.");
+            }
+            if (is_rows) {
+                for (py::handle row : seq) {
+                    rows.emplace_back(py::reinterpret_borrow<py::object>(row), nbits, packed);
+                }
+            } else {
+                rows.emplace_back(obj, nbits, packed);
+            }
+        }
+        for (const PyBits &row : rows) {
+            views.push_back(row.view);
+        }
+    }
+};
+
+/**
+ * Extract every row of `xs` with the matching row of `ys`, or its single
+ * row, calling f(x, y) on the worker threads without holding the GIL.
+ * Returns a (rows, m) array.
+ */
+template <class F>
+py::array_t<uint8_t> extract_rows(const PyBitRows &xs, const PyBitRows &ys, uint64_t m, F f) {
+    size_t rows = xs.views.size();
+    bool shared = ys.views.size() == 1;
+    if (!shared && ys.views.size() != rows) {
+        throw py::value_error("Expected a single seed or one seed per input, got "
+                              + std::to_string(ys.views.size()) + " seeds for "
+                              + std::to_string(rows) + " inputs.");
+    }
+    py::array_t<uint8_t> out({(py::ssize_t)rows, (py::ssize_t)m});
+    uint8_t *data = out.mutable_data();
+    {
+        py::gil_scoped_release release;
+        parallel_for(rows, [&](size_t i) {
+            auto bits = f(xs.views[i], ys.views[shared ? 0 : i]);
+            std::copy(bits.begin(), bits.end(), data + i * m);
+        });
+    }
+    return out;
+}
+
+/** Batched convolution extraction, transforming a shared seed only once */
+template <class Engine>
+py::array_t<uint8_t> conv_extract_rows(Engine &ntt, ConvKind kind, const py::object &x, const py::object &y, uint64_t n, uint64_t m,
+                                       bool packed) {
+    PyBitRows xs(x, n, false, "Inputs", packed), ys(y, conv_seed_length(kind, n, m), true, "Seeds", packed);
+    if (ys.views.size() == 1) {
+        std::unique_ptr<SeededExtractor> ext;
+        {
+            py::gil_scoped_release release;
+            ext = make_seeded_extractor(ntt, kind, ys.views[0], n, m);
+        }
+        return extract_rows(xs, ys, m, [&](const BitView &x, const BitView &) {
+            return ext->extract(x);
+        });
+    }
+    return extract_rows(xs, ys, m, [&](const BitView &x, const BitView &y) {
+        return conv_extract(ntt, kind, x, y, n, m);
+    });
+}
+
+/** Bits packed eight to a byte, as by numpy.packbits */
+py::bytes pack_bits(const std::vector<uint8_t> &bits) {
+    std::string packed((bits.size() + 7) / 8, '\0');
+    for (size_t i = 0; i < bits.size(); i++) {
+        packed[i >> 3] |= char(bits[i] << (7 - (i & 7)));
+    }
+    return py::bytes(packed);
+}
+
+/** The bits of a view, for the std::vector<bool> interfaces */
+std::vector<bool> to_bools(const BitView &v) {
+    std::vector<bool> bits(v.size);
+    for (size_t i = 0; i < v.size; i++) {
+        bits[i] = v[i];
+    }
+    return bits;
+}
+
+} // namespace
+
+template <class Engine>
+static void def_extractors(py::module_ &m) {
+    m.def("toeplitz_extract", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n_1, uint64_t m,
+                                 bool packed_input) {
+        PyBits bx(x, n_1, packed_input), by(y, n_1 + m - 1, packed_input);
+        py::gil_scoped_release release;
+        return conv_extract(ntt, ConvKind::toeplitz, bx.view, by.view, n_1, m);
+    }, py::arg("ntt"), py::arg("input1"), py::arg("input2"), py::arg("n_1"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("circulant_extract", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n_1, uint64_t m,
+                                  bool packed_input) {
+        PyBits bx(x, n_1, packed_input), by(y, n_1 + 1, packed_input);
+        py::gil_scoped_release release;
+        return conv_extract(ntt, ConvKind::circulant, bx.view, by.view, n_1, m);
+    }, py::arg("ntt"), py::arg("input1"), py::arg("input2"), py::arg("n_1"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("dodis_extract", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n, uint64_t m,
+                              bool packed_input) {
+        PyBits bx(x, n, packed_input), by(y, n, packed_input);
+        py::gil_scoped_release release;
+        return conv_extract(ntt, ConvKind::dodis, bx.view, by.view, n, m);
+    }, py::arg("ntt"), py::arg("input1"), py::arg("input2"), py::arg("n"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("toeplitz_extract_many", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n_1, uint64_t m,
+                                      bool packed_input) {
+        return conv_extract_rows(ntt, ConvKind::toeplitz, x, y, n_1, m, packed_input);
+    }, py::arg("ntt"), py::arg("inputs"), py::arg("seeds"), py::arg("n_1"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("circulant_extract_many", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n_1, uint64_t m,
+                                       bool packed_input) {
+        return conv_extract_rows(ntt, ConvKind::circulant, x, y, n_1, m, packed_input);
+    }, py::arg("ntt"), py::arg("inputs"), py::arg("seeds"), py::arg("n_1"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("dodis_extract_many", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n, uint64_t m,
+                                   bool packed_input) {
+        return conv_extract_rows(ntt, ConvKind::dodis, x, y, n, m, packed_input);
+    }, py::arg("ntt"), py::arg("inputs"), py::arg("seeds"), py::arg("n"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("seeded_extractor", [](Engine &ntt, ConvKind kind, const py::object &y, uint64_t n, uint64_t m,
+                                 bool packed_input) {
+        PyBits by(y, conv_seed_length(kind, n, m), packed_input);
+        py::gil_scoped_release release;
+        return make_seeded_extractor(ntt, kind, by.view, n, m);
+    }, py::keep_alive<0, 1>(), py::arg("ntt"), py::arg("kind"), py::arg("input2"), py::arg("n"), py::arg("m"),
+       py::arg("packed_input") = false);
+}
+
+/** The Raz extractor, on transforms of one bit per element or on packed words */
+template <class Engine>
+static void def_raz(py::module_ &m) {
+    m.def("raz_extract", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n, uint64_t s, uint64_t m,
+                            bool packed_input) {
+        PyBits bx(x, 2 * n, packed_input), by(y, n, packed_input);
+        py::gil_scoped_release release;
+        return raz_extract(ntt, bx.view, by.view, n, s, m);
+    }, py::arg("ntt"), py::arg("input1"), py::arg("input2"), py::arg("n"), py::arg("s"), py::arg("m"),
+       py::arg("packed_input") = false);
+
+    m.def("raz_extract_many", [](Engine &ntt, const py::object &x, const py::object &y, uint64_t n, uint64_t s, uint64_t m,
+                                 bool packed_input) {
+        PyBitRows xs(x, 2 * n, false, "Inputs", packed_input), ys(y, n, true, "Seeds", packed_input);
+        return extract_rows(xs, ys, m, [&](const BitView &x, const BitView &y) {
+            return raz_extract(ntt, x, y, n, s, m);
+        });
+    }, py::arg("ntt"), py::arg("inputs"), py::arg("seeds"), py::arg("n"), py::arg("s"), py::arg("m"),
+       py::arg("packed_input") = false);
+}
+
+/**
+ * Native work runs without the GIL: arguments are converted (and buffers
+ * requested) while holding it, then released for the computation. NTT,
+ * BigNTT, CrtNTT, GF2Conv and SeededExtractor objects are read-only once
+ * built and Trevisan keeps its loaded source per thread, so all of them can
+ * be shared between threads (a ToeplitzStream holds the state of its
+ * stream, so it cannot).
+ * The module therefore also declares that it runs without the GIL
+ * on free-threaded builds of CPython.
+ */
+PYBIND11_MODULE(_cryptomite, m, py::mod_gil_not_used()) {
     // optional module docstring
     m.doc() = "C++ Implementation of Randomness Extractors";
 
@@ -21,22 +316,233 @@ PYBIND11_MODULE(_cryptomite, m) {
         .def_readonly("l", &TrevisanConfig::l);
 
     py::class_<Trevisan>(m, "Trevisan")
-        .def(py::init<TrevisanConfig>())
+        .def(py::init<TrevisanConfig>(), py::call_guard<py::gil_scoped_release>())
         .def("get_seed_length", &Trevisan::get_seed_length)
-        .def("load_source", &Trevisan::load_source)
-        .def("extract_bit", &Trevisan::extract_bit);
+        .def("load_source", &Trevisan::load_source, py::call_guard<py::gil_scoped_release>())
+        .def("extract_bit", &Trevisan::extract_bit, py::call_guard<py::gil_scoped_release>())
+        .def("extract_block", &Trevisan::extract_block, py::call_guard<py::gil_scoped_release>(),
+             py::arg("input1"), py::arg("input2"))
+        .def("extract_all", [](Trevisan &ext, const py::object &x, const py::object &y, bool packed, bool packed_input) {
+            PyBits bx(x, ext.n, packed_input), by(y, ext.get_seed_length(), packed_input);
+            std::vector<uint8_t> bits;
+            {
+                py::gil_scoped_release release;
+                bits = ext.extract_all(to_bools(bx.view), to_bools(by.view));
+            }
+            if (packed) {
+                return py::object(pack_bits(bits));
+            }
+            return py::object(py::array_t<uint8_t>(bits.size(), bits.data()));
+        }, py::arg("input1"), py::arg("input2"), py::arg("packed") = false, py::arg("packed_input") = false)
+        .def("extract_many", [](Trevisan &ext, const py::object &x, const py::object &y, bool packed_input) {
+            PyBitRows xs(x, ext.n, false, "Inputs", packed_input), ys(y, ext.get_seed_length(), true, "Seeds", packed_input);
+            return extract_rows(xs, ys, ext.m, [&](const BitView &x, const BitView &y) {
+                return ext.extract_block(to_bools(x), to_bools(y));
+            });
+        }, py::arg("inputs"), py::arg("seeds"), py::arg("packed_input") = false)
+        .def("design_table", [](Trevisan &ext) {
+            std::shared_ptr<const WeakDesignTable> table;
+            {
+                py::gil_scoped_release release;
+                table = ext.design_table();
+            }
+            // A read-only view, which keeps the table alive
+            auto owner = new std::shared_ptr<const WeakDesignTable>(table);
+            py::capsule base(owner, [](void *p) { delete static_cast<std::shared_ptr<const WeakDesignTable> *>(p); });
+            py::array_t<uint16_t> out({(py::ssize_t)table->rows, (py::ssize_t)table->width}, table->entries(), base);
+            out.attr("setflags")(py::arg("write") = false);
+            return out;
+        }, "The table of the weak design, a (rows, 2 l) uint16 array.")
+        .def("set_design_table", [](Trevisan &ext, py::array_t<uint16_t, py::array::c_style | py::array::forcecast> table) {
+            if (table.ndim() != 2) {
+                throw py::value_error("Weak design tables must be two-dimensional.");
+            }
+            // The table views the array, released with the GIL held
+            auto array = new py::object(table);
+            std::shared_ptr<const WeakDesignTable> design(
+                new WeakDesignTable(table.data(), table.shape(0), table.shape(1)),
+                [array](const WeakDesignTable *p) {
+                    delete p;
+                    py::gil_scoped_acquire acquire;
+                    delete array;
+                });
+            try {
+                ext.set_design_table(design);
+            } catch (const std::runtime_error &e) {
+                throw py::value_error(e.what());
+            }
+        }, py::arg("table"), "Use a table of the weak design, e.g. one saved and mapped back into memory.");
+
+
+    py::class_<ToeplitzStream>(m, "ToeplitzStream",
+        "A Toeplitz extractor with a fixed seed, fed a stream of input bits.")
+        .def_readonly("n", &ToeplitzStream::n)
+        .def_readonly("m", &ToeplitzStream::m)
+        .def_property_readonly("buffered", &ToeplitzStream::buffered)
+        .def("update", [](ToeplitzStream &ext, const py::object &x, uint64_t nbits, bool packed, bool packed_input) {
+            PyBits bx(x, nbits, packed_input);
+            if (bx.view.size != nbits) {
+                throw py::value_error("Expected a chunk of " + std::to_string(nbits) + " bits.");
+            }
+            std::vector<std::vector<uint8_t>> blocks;
+            {
+                py::gil_scoped_release release;
+                blocks = ext.update(bx.view);
+            }
+            py::list out;
+            for (const std::vector<uint8_t> &bits : blocks) {
+                out.append(packed ? py::object(pack_bits(bits)) : py::cast(bits));
+            }
+            return out;
+        }, py::arg("chunk"), py::arg("nbits"), py::arg("packed") = false, py::arg("packed_input") = false,
+        "Consume `nbits` input bits, returning the output of each block they complete.");
+
+    m.def("toeplitz_stream", [](NTT &ntt, const py::object &y, uint64_t n_1, uint64_t m, uint64_t chunk,
+                                bool packed_input) {
+        PyBits by(y, n_1 + m - 1, packed_input);
+        py::gil_scoped_release release;
+        return std::make_unique<ToeplitzStream>(ntt, by.view, n_1, m, chunk);
+    }, py::keep_alive<0, 1>(), py::arg("ntt"), py::arg("input2"), py::arg("n_1"), py::arg("m"), py::arg("chunk"),
+       py::arg("packed_input") = false);
+
+    m.def("toeplitz_extract_segmented", [](NTT &ntt, const py::object &x, const py::object &y, uint64_t n_1, uint64_t m,
+                                           uint64_t segment, bool packed_input) {
+        PyBits bx(x, n_1, packed_input), by(y, n_1 + m - 1, packed_input);
+        py::gil_scoped_release release;
+        return toeplitz_extract_segmented(ntt, bx.view, by.view, n_1, m, segment);
+    }, py::arg("ntt"), py::arg("input1"), py::arg("input2"), py::arg("n_1"), py::arg("m"), py::arg("segment"),
+       py::arg("packed_input") = false);
+
+    py::enum_<ConvKind>(m, "ConvKind")
+        .value("toeplitz", ConvKind::toeplitz)
+        .value("circulant", ConvKind::circulant)
+        .value("dodis", ConvKind::dodis);
+
+    py::class_<SeededExtractor>(m, "SeededExtractor",
+        "A Toeplitz, Circulant or Dodis et al. extractor with a fixed, "
+        "pre-transformed (weak) seed.")
+        .def_readonly("kind", &SeededExtractor::kind)
+        .def_readonly("n", &SeededExtractor::n)
+        .def_readonly("m", &SeededExtractor::m)
+        .def("extract", [](const SeededExtractor &ext, const py::object &x, bool packed_input) {
+            PyBits bx(x, ext.n, packed_input);
+            py::gil_scoped_release release;
+            return ext.extract(bx.view);
+        }, py::arg("input1"), py::arg("packed_input") = false,
+        "Extract m bits from the n-bit (weak) input, packed by numpy.packbits if packed_input is set.");
+
+    m.def("get_num_threads", &get_num_threads,
+          "Number of threads used by parallel transforms.");
+    m.def("set_num_threads", &set_num_threads, py::arg("n"),
+          "Set the number of threads used by parallel transforms (0 restores the default).");
+
+    m.def("ntt_kernel", [] { return ntt_kernels().name; },
+          "Instruction set of the NTT kernels used by default.");
+    m.def("available_ntt_kernels", [] {
+        std::vector<std::string> names;
+        for (const NttKernels *k : available_ntt_kernels()) {
+            names.push_back(k->name);
+        }
+        return names;
+    }, "Instruction sets of the NTT kernels supported by this CPU, best first.");
+    m.def("gf2x_kernel", [] { return gf2x_kernels().name; },
+          "Instruction set of the GF(2)[x] multiplication kernels used by default.");
+    m.def("available_gf2x_kernels", [] {
+        std::vector<std::string> names;
+        for (const Gf2xKernels *k : available_gf2x_kernels()) {
+            names.push_back(k->name);
+        }
+        return names;
+    }, "Instruction sets of the GF(2)[x] multiplication kernels supported by this CPU, best first.");
 
     py::class_<NTT>(m, "NTT")
-        .def(py::init<int>())
-        .def("ntt", &NTT::ntt, py::arg("x"), py::arg("inverse"), py::arg("plusone") = false)
-        .def("mul_vec", &NTT::mul_vec)
-        .def("conv", &NTT::conv)
-        .def("conv_and_reduce", &NTT::conv_and_reduce)
-        .def("raz_iteration", &NTT::raz_iteration);
+        .def(py::init<int, unsigned>(), py::call_guard<py::gil_scoped_release>(),
+             py::arg("l"), py::arg("threes") = 0)
+        .def(py::init([](int l, const std::string &kernel) {
+            for (const NttKernels *k : available_ntt_kernels()) {
+                if (kernel == k->name) {
+                    py::gil_scoped_release release;
+                    return new NTT(l, *k);
+                }
+            }
+            throw py::value_error("NTT kernel " + kernel + " is not available on this CPU.");
+        }), py::arg("l"), py::arg("kernel"))
+        .def_property_readonly("size", &NTT::size)
+        .def_property_readonly("nbytes", &NTT::nbytes)
+        .def_property_readonly("kernel", &NTT::kernel_name)
+        .def("ntt", &NTT::ntt, py::call_guard<py::gil_scoped_release>(),
+             py::arg("x"), py::arg("inverse"), py::arg("plusone") = false)
+        .def("mul_vec", py::overload_cast<const Sequence &, const Sequence &>(&NTT::mul_vec),
+             py::call_guard<py::gil_scoped_release>())
+        .def("conv", py::overload_cast<const Sequence &, const Sequence &>(&NTT::conv),
+             py::call_guard<py::gil_scoped_release>())
+        .def("conv_and_reduce",
+             py::overload_cast<const Sequence &, const Sequence &, uint32_t, uint32_t>(&NTT::conv_and_reduce),
+             py::call_guard<py::gil_scoped_release>())
+        .def("raz_iteration",
+             py::overload_cast<const Sequence &, const Sequence &, uint32_t, uint32_t>(&NTT::raz_iteration),
+             py::call_guard<py::gil_scoped_release>());
 
     py::class_<BigNTT>(m, "BigNTT")
-        .def(py::init<int>())
-        .def("ntt", &BigNTT::ntt)
-        .def("mul_vec", &BigNTT::mul_vec)
-        .def("conv", &BigNTT::conv);
+        .def(py::init<int, unsigned>(), py::call_guard<py::gil_scoped_release>(),
+             py::arg("l"), py::arg("threes") = 0)
+        .def_property_readonly("size", &BigNTT::size)
+        .def_property_readonly("nbytes", &BigNTT::nbytes)
+        .def("ntt", &BigNTT::ntt, py::call_guard<py::gil_scoped_release>())
+        .def("mul_vec", &BigNTT::mul_vec, py::call_guard<py::gil_scoped_release>())
+        .def("conv", &BigNTT::conv, py::call_guard<py::gil_scoped_release>());
+
+    py::class_<CrtNTT>(m, "CrtNTT")
+        .def(py::init<unsigned, unsigned, unsigned>(), py::call_guard<py::gil_scoped_release>(),
+             py::arg("l"), py::arg("row_l") = 22, py::arg("primes") = 0)
+        .def_property_readonly("size", &CrtNTT::size)
+        .def_property_readonly("nbytes", &CrtNTT::nbytes)
+        .def_property_readonly("primes", &CrtNTT::num_primes)
+        .def("conv", &CrtNTT::conv, py::call_guard<py::gil_scoped_release>());
+
+    py::class_<GF2Conv>(m, "GF2Conv")
+        .def(py::init<unsigned>(), py::call_guard<py::gil_scoped_release>())
+        .def(py::init([](unsigned l, const std::string &kernel) {
+            for (const Gf2xKernels *k : available_gf2x_kernels()) {
+                if (kernel == k->name) {
+                    return new GF2Conv(l, *k);
+                }
+            }
+            throw py::value_error("GF(2)[x] kernel " + kernel + " is not available on this CPU.");
+        }), py::arg("l"), py::arg("kernel"))
+        .def_property_readonly("size", &GF2Conv::size)
+        .def_property_readonly("nbytes", &GF2Conv::nbytes)
+        .def_property_readonly("kernel", &GF2Conv::kernel_name)
+        .def("mul", py::overload_cast<const std::vector<uint64_t> &, const std::vector<uint64_t> &>(&GF2Conv::mul, py::const_),
+             py::call_guard<py::gil_scoped_release>())
+        .def("conv", &GF2Conv::conv, py::call_guard<py::gil_scoped_release>());
+
+    def_extractors<NTT>(m);
+    def_extractors<BigNTT>(m);
+    def_extractors<CrtNTT>(m);
+    def_extractors<GF2Conv>(m);
+    def_raz<NTT>(m);
+    def_raz<GF2Conv>(m);
+
+    m.def("trinomial_is_irreducible", &trinomial_is_irreducible, py::call_guard<py::gil_scoped_release>(),
+          py::arg("n"), py::arg("s"), "Whether x^n + x^s + 1 is irreducible over GF(2), for 0 < s < n.");
+    m.def("find_trinomial", [](uint64_t n, uint64_t first, uint64_t last) {
+        return find_trinomial(n, first, last);
+    }, py::call_guard<py::gil_scoped_release>(), py::arg("n"),
+          py::arg("first") = 1, py::arg("last") = 0,
+          "The least s in [first, last] (last = 0: n / 2) with x^n + x^s + 1 irreducible over GF(2), or 0 "
+          "if there is none.");
+    m.def("search_trinomial", [](uint64_t n, uint64_t first, uint64_t last, double timeout) {
+        uint64_t s, searched;
+        {
+            py::gil_scoped_release release;
+            auto deadline = std::chrono::steady_clock::now()
+                            + std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                                  std::chrono::duration<double>(std::max(timeout, 0.0)));
+            s = find_trinomial(n, first, last, deadline, &searched);
+        }
+        return std::make_pair(s, searched);
+    }, py::arg("n"), py::arg("first"), py::arg("last"), py::arg("timeout"),
+       "As find_trinomial, giving up after timeout seconds: returns (s, searched), every candidate up to "
+       "searched having been settled.");
 }
@@ -2,18 +2,29 @@
 The Raz extractor [Raz2005]_ takes two inputs of length
 'n_1, n_2', such that 'n_1/2 > n_2'. This implementation
 is based on the efficient construction described in [Fore2025]_,
-which requires a known irreducible trinomial for the field
-GF_2^{n_1/2}.
+which requires an irreducible trinomial for the field
+GF_2^{n_1/2}. Trinomials of lengths missing from `Raz.trinomial_s`
+are searched for and kept in a local cache file.
 """
 from __future__ import annotations
 
+import json
+import os
+import tempfile
+import time
 from math import ceil, floor, log2
-from typing import cast
+from threading import Lock
+from typing import TYPE_CHECKING
 
-from cryptomite._cryptomite import NTT
-from cryptomite.utils import BitsT, log_2
+from cryptomite import _cryptomite
+from cryptomite.utils import BitRowsLikeT, BitsLikeT, BitsT, log_2, ntt_plan
 
-__all__ = ['Raz']
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+__all__ = ['Raz', 'find_trinomial', 'is_irreducible_trinomial',
+           'previous_trinomial', 'closest_trinomial',
+           'trinomial_cache_path']
 
 
 class Raz:
@@ -50,7 +61,8 @@ class Raz:
                    74207281: 9156813,  # t44a
                    }
 
-    def __init__(self, n1: int, m: int, trinomial=None):
+    def __init__(self, n1: int, m: int, trinomial=None,
+                 engine: str | None = None, verify: bool = False):
         """
         Initialize a Raz extractor.
 
@@ -58,16 +70,29 @@ class Raz:
         ----------
         n1: int
             The length of the first input (in bits).
-            **Note:** GF_2^{n1/2} must have a known irreducible trinomial.
+            **Note:** GF_2^{n1/2} must have an irreducible trinomial. If
+            n1/2 is not a key of `trinomial_s`, one with s <= 1024 is
+            looked for by `find_trinomial` (see `previous_trinomial` for
+            usable lengths, or search every s with `find_trinomial` and
+            pass the result as trinomial).
         m : int
             The length of the extractor output (in bits).
         trinomial : int
-            An optional parameter which defines an irreducible trinomial over
-            GF_2^{n1/2}, i.e., x^{n1/2} + x^{trinomial} + 1 is an irreducible
-            trinomial. **Note:** This does not test whether the trinomial is
-            irreducible, because it is computationally expensive to do so.
-            Please ensure if you provide a value that it is correct, or use
-            one of the known values.
+            An optional parameter which defines an irreducible trinomial
+            over GF_2^{n1/2}, i.e., x^{n1/2} + x^{trinomial} + 1 is an
+            irreducible trinomial. It is only checked if verify is True.
+        engine : str, optional
+            'gf2' (the default) keeps the field elements packed 64 bits
+            to a word, squares them by spreading their bits and reduces
+            them by the trinomial a word at a time. 'ntt' multiplies
+            them with number theoretic transforms of one bit per
+            element instead.
+        verify : bool
+            If True, check the trinomial given with
+            `is_irreducible_trinomial` (default: False). Unless the
+            check is settled by `trinomial_s` or the cache of
+            `find_trinomial`, this takes O(n1^2) bit operations: seconds
+            for n1 of a few 10^5, hours for the largest table entries.
         """
         assert (m <= n1/2)
         self.n = int(n1/2)
@@ -75,80 +100,382 @@ class Raz:
         self.logp = log_2(self.n)+1
         self.pad_amount = (1 << self.logp) - self.n
         if trinomial is None:
-            if self.n not in self.trinomial_s:
-                raise ValueError('GF(2^(n1/2)) must have a known irreducible trinomial.')  # noqa: E501
-            self.s = self.trinomial_s[self.n]
+            self.s = find_trinomial(self.n, max_s=1024)
+            if not self.s:
+                raise ValueError(
+                    f'x^{self.n} + x^s + 1 is reducible for every s <= 1024: '
+                    'use previous_trinomial or from_params for a usable n1, '
+                    'or pass the s found by find_trinomial as trinomial.')
         else:
+            if verify and not is_irreducible_trinomial(self.n, trinomial):
+                raise ValueError(f'x^{self.n} + x^{trinomial} + 1 is not '
+                                 'irreducible.')
             self.s = trinomial
-        self.ntt = NTT(self.logp)
-
-    def __poly_reduce(self, x: BitsT):
-        r = self.n
-        s = self.s
-        for i in range(self.n-1, -1, -1):
-            red = x[r+i] % 2
-            x[r+i] = 0
-            x[s+i] = (x[s+i] % 2) ^ red
-            x[i] = (x[i] % 2) ^ red
-
-    def __gf_add(self, x: BitsT, y: BitsT) -> BitsT:
-        return map(lambda b1, b2: b1 ^ b2, x, y)
-
-    def __gf_add_one(self, input: BitsT) -> BitsT:
-        x = input.copy()
-        x[0] = x[0] ^ 1
-        return x
-
-    def gf_mul(self, x: BitsT, y: BitsT) -> BitsT:
-        conv_output = cast(BitsT, [e % 2 for e in
-                                   self.ntt.conv_and_reduce(x, y,
-                                                            self.n, self.s)])
-        return conv_output
-
-    def extract(self, input1: BitsT, input2: BitsT) -> BitsT:
+        if engine is None:
+            engine = 'gf2'
+        if engine not in ('gf2', 'ntt'):
+            raise ValueError(f"Unknown engine {engine!r}, expected 'gf2' or "
+                             "'ntt'.")
+        self.ntt = ntt_plan(self.logp, engine)
+
+    def extract(self, input1: BitsLikeT, input2: BitsLikeT,
+                packed_input: bool = False) -> BitsT:
         """
         Perform randomness extraction.
 
+        The whole computation runs natively, the state held in native
+        buffers from the inputs to the m output bits.
+
         Parameters
         ----------
-        input1 : list of bits (0s and 1s)
+        input1 : list of bits (0s and 1s), or bit buffer
             The first input, consisting of n_1 bits.
-        input2 : list of bits (0s and 1s)
+        input2 : list of bits (0s and 1s), or bit buffer
             The second input, consisting of n_2 < n_1/2 bits.
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(n_1 / 8) and
+            ceil(n_1 / 16) bytes: packed seeds are not zero padded
+            (default: False, one bit per item).
 
         Returns
         -------
         list of bits (0s and 1s)
             The extractor output bits, of length m.
         """
-        assert len(input1) >= 2*self.n
-        assert 0 < len(input2) <= self.n
-
-        x1, x2 = input1[0:self.n], input1[self.n:]
-        y = input2 + [0] * (len(input2) - self.n)
-
-        pad_amount = self.pad_amount
-        x1 = x1 + [0]*pad_amount
-        x2 = x2 + [0]*pad_amount
-        y = y + [0]*pad_amount
-
-        cur_delta = self.gf_mul(y, x1)
-        product = self.__gf_add_one(cur_delta)  # GF 1 times lambda_0
-        cur_delta = self.gf_mul(cur_delta, cur_delta)  # delta^2
-
-        # First loop is starting from product = product * lambda_1,
-        # i.e. (delta^(2^1) + 1)), followed by cur_delta = delta^4
-        # up to product * (lambda_{logp-1}, i.e. delta^{2^(logp-1))
-        # and cur_delta = delta^(2^logp)
-        # Note: we could unwrap the final multiplication at self.logp-1
-        # to save the unnecessary calculation of delta^(2^logp),
-        # but it happens in parallel anyway and makes the code harder to read.
-        for _i in range(1, self.logp):
-            # product times lambda_1 ... lambda_{l-1}
-            (product, cur_delta) = self.ntt.raz_iteration(product, cur_delta,
-                                                          self.n, self.s)
-        conv_output = self.gf_mul(product, x2)
-        return cast(BitsT, [conv_output[i] for i in range(self.m)])
+        return _cryptomite.raz_extract(self.ntt, input1, input2,
+                                       self.n, self.s, self.m,
+                                       packed_input)
+
+    def extract_many(self, inputs: BitRowsLikeT,
+                     seeds: BitRowsLikeT | BitsLikeT,
+                     packed_input: bool = False) -> ndarray:
+        """
+        Perform randomness extraction on a batch of blocks, natively
+        and in parallel (see Toeplitz.extract_many).
+
+        Parameters
+        ----------
+        inputs : 2-D array of bits, or list of bit lists
+            The first inputs, one row of n_1 bits per block.
+        seeds : 2-D array of bits, or list of bit lists, or bits
+            The second inputs, one row of n_2 <= n_1/2 bits per block,
+            or a single one shared by all blocks.
+        packed_input : bool
+            If True, the rows of both inputs are packed eight bits per
+            byte along their last axis, as by
+            ``numpy.packbits(..., axis=1)``, as in `extract`
+            (default: False, one bit per item).
+
+        Returns
+        -------
+        numpy.ndarray
+            The extractor outputs, an array of shape (blocks, m) with
+            dtype uint8.
+        """
+        return _cryptomite.raz_extract_many(self.ntt, inputs, seeds,
+                                            self.n, self.s, self.m,
+                                            packed_input)
+
+# ------- TRINOMIALS -------
+
+
+# Searches of find_trinomial by cache file and degree n: the least
+# s > 0 of an irreducible x^n + x^s + 1, or -S <= 0 if there is none
+# with s <= S.
+_trinomials: dict[tuple[str, int], int] = {}
+_trinomials_lock = Lock()
+
+
+def trinomial_cache_path() -> str:
+    """
+    The file keeping the results of `find_trinomial` across processes.
+
+    Returns
+    -------
+    str
+        trinomials.json in the directory named by the
+        ``CRYPTOMITE_CACHE_DIR`` environment variable if set, else in
+        the cryptomite directory of ``XDG_CACHE_HOME`` (default:
+        ~/.cache).
+    """
+    cache_dir = os.environ.get('CRYPTOMITE_CACHE_DIR')
+    if not cache_dir:
+        base = (os.environ.get('XDG_CACHE_HOME')
+                or os.path.join(os.path.expanduser('~'), '.cache'))
+        cache_dir = os.path.join(base, 'cryptomite')
+    return os.path.join(cache_dir, 'trinomials.json')
+
+
+def _read_trinomials(path: str) -> dict[int, int]:
+    # A missing or damaged cache file is an empty one.
+    try:
+        with open(path) as f:
+            return {int(n): int(s) for n, s in json.load(f).items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _merge_trinomial(a: int, b: int) -> int:
+    if a > 0 or b > 0:
+        return min(s for s in (a, b) if s > 0)
+    return min(a, b)
+
+
+def _known_trinomial(path: str, n: int) -> int:
+    # Caller holds _trinomials_lock.
+    if (path, n) not in _trinomials:
+        _trinomials[path, n] = _read_trinomials(path).get(n, 0)
+    return _trinomials[path, n]
+
+
+def _store_trinomial(path: str, n: int, s: int) -> None:
+    # Caller holds _trinomials_lock. Entries written meanwhile by other
+    # processes are kept, and the file is replaced in one step.
+    trinomials = _read_trinomials(path)
+    s = _merge_trinomial(trinomials.get(n, 0), s)
+    trinomials[n] = _trinomials[path, n] = s
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path),
+                                   suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({str(k): trinomials[k] for k in sorted(trinomials)},
+                      f, indent=0)
+        os.replace(tmp, path)
+    except OSError:
+        # The cache is only an optimisation.
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def find_trinomial(n: int, max_s: int | None = None) -> int:
+    """
+    Find an irreducible trinomial x^n + x^s + 1 over GF(2).
+
+    Degrees in `Raz.trinomial_s` take their s from there. Others are
+    searched natively for their least s: Swan's theorem and the small
+    irreducible polynomials rule out most candidates, and the rest go
+    through Rabin's irreducibility test with modular squarings of
+    packed words. Results, including unsuccessful searches, are kept in
+    the file given by `trinomial_cache_path`, so each degree is
+    searched once; a later search with a larger max_s carries on from
+    the last s searched.
+
+    Parameters
+    ----------
+    n : int
+        The degree of the trinomial.
+    max_s : int, optional
+        Only look for s <= max_s (default: n // 2, which finds an
+        irreducible trinomial if there is any).
+
+    Returns
+    -------
+    int
+        s, or 0 if x^n + x^s + 1 is reducible for every s searched.
+
+    Notes
+    -----
+    Rabin's test takes O(n^2) bit operations, a fraction of a second
+    per candidate for n of a few 10^4 and seconds for n = 10^5. Degrees
+    without any irreducible trinomial are the slowest, every candidate
+    up to n // 2 being tested.
+    """
+    s = _search_trinomial(n, max_s, None)
+    assert s is not None
+    return s
+
+
+def _search_trinomial(n: int, max_s: int | None,
+                      deadline: float | None) -> int | None:
+    # find_trinomial, giving up at the time.monotonic() deadline:
+    # None if it did, the candidates settled meanwhile being cached
+    # all the same.
+    if n in Raz.trinomial_s:
+        return Raz.trinomial_s[n]
+    if n < 2:
+        return 0
+    max_s = n // 2 if max_s is None else min(max_s, n // 2)
+    path = trinomial_cache_path()
+    with _trinomials_lock:
+        known = _known_trinomial(path, n)
+    if known > 0:
+        return known if known <= max_s else 0
+    if -known >= max_s:
+        return 0
+    if deadline is None:
+        s = _cryptomite.find_trinomial(n, 1 - known, max_s)
+        searched = s or max_s
+    else:
+        s, searched = _cryptomite.search_trinomial(
+            n, 1 - known, max_s, deadline - time.monotonic())
+    if s or searched > -known:
+        with _trinomials_lock:
+            _store_trinomial(path, n, s or -searched)
+    return s if s or searched >= max_s else None
+
+
+def _known_degrees(max_s: int | None) -> set[int]:
+    # The degrees known to have an irreducible trinomial with
+    # s <= max_s, besides those of Raz.trinomial_s, without searching.
+    path = trinomial_cache_path()
+    with _trinomials_lock:
+        known = _read_trinomials(path)
+        for (p, n), s in _trinomials.items():
+            if p == path:
+                known[n] = _merge_trinomial(known.get(n, 0), s)
+    return set(Raz.trinomial_s).union(
+        n for n, s in known.items()
+        if s > 0 and (max_s is None or s <= max_s))
+
+
+def is_irreducible_trinomial(n: int, s: int) -> bool:
+    """
+    Check whether x^n + x^s + 1 is irreducible over GF(2).
+
+    The results of `find_trinomial` are used when they settle it,
+    Rabin's test otherwise (see `find_trinomial`).
+
+    Parameters
+    ----------
+    n : int
+        The degree of the trinomial.
+    s : int
+        The degree of its middle term, 0 < s < n.
+
+    Returns
+    -------
+    bool
+        Whether x^n + x^s + 1 is irreducible.
+    """
+    if not 0 < s < n:
+        raise ValueError('Trinomials x^n + x^s + 1 must have 0 < s < n.')
+    # x^n + x^(n-s) + 1, the reciprocal, is irreducible with
+    # x^n + x^s + 1
+    if Raz.trinomial_s.get(n) in (s, n - s):
+        return True
+    with _trinomials_lock:
+        known = _known_trinomial(trinomial_cache_path(), n)
+    if known > 0 and min(s, n - s) <= known:
+        return min(s, n - s) == known
+    if known <= 0 and min(s, n - s) <= -known:
+        return False
+    return _cryptomite.trinomial_is_irreducible(n, s)
+
+
+def previous_trinomial(k: int, max_s: int | None = 1024,
+                       timeout: float | None = 30.0) -> int:
+    """
+    Find the largest degree at most k of an irreducible trinomial over
+    GF(2).
+
+    The degrees of `Raz.trinomial_s` and those already found by
+    `find_trinomial` are known without searching. Only the degrees
+    above the largest known one are searched, downwards from k.
+
+    Parameters
+    ----------
+    k : int
+        The largest degree allowed, at least 2.
+    max_s : int, optional
+        Only count the trinomials x^n + x^s + 1 with s <= max_s, besides
+        those of `Raz.trinomial_s` (default: 1024). None searches every
+        s, which is exact but slow for the degrees that have none.
+    timeout : float, optional
+        Give up the search after this many seconds (default: 30). None
+        searches until a degree is found.
+
+    Returns
+    -------
+    int
+        The largest degree 2 <= n <= k with an irreducible trinomial.
+
+    Raises
+    ------
+    TimeoutError
+        If the search took longer than timeout. The candidates settled
+        are cached, so a later search carries on from there.
+
+    Notes
+    -----
+    Most degrees of a few 10^4 and more have no irreducible trinomial
+    with a small s, and ruling out the 1024 s of one of them takes
+    seconds to minutes (see `find_trinomial`).
+    """
+    if k < 2:
+        raise ValueError('There are no irreducible trinomials of degree < 2.')
+    # x^2 + x + 1 is irreducible, so the search stops there at the
+    # latest.
+    known = max((n for n in _known_degrees(max_s) if n <= k), default=1)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for n in range(k, known, -1):
+        s = _search_trinomial(n, max_s, deadline)
+        if s is None:
+            raise TimeoutError(
+                f'No irreducible trinomial x^n + x^s + 1 with s <= {max_s} '
+                f'was found for {n} <= n <= {k} within {timeout} s. The '
+                f'largest known degree is {known}: use it, or search on '
+                'with a larger timeout, which carries on where this '
+                'search stopped.')
+        if s:
+            return n
+    return known
+
+
+def closest_trinomial(k: int, max_s: int | None = 1024,
+                      timeout: float | None = 30.0) -> int:
+    """
+    Find the degree closest to k of an irreducible trinomial over GF(2).
+
+    Degrees are tried in order of distance from k, the lower one first.
+    Those known without searching (see `previous_trinomial`) are taken
+    as they are, the others searched with `find_trinomial`.
+
+    Parameters
+    ----------
+    k : int
+        The degree to approach.
+    max_s : int, optional
+        Only count the trinomials x^n + x^s + 1 with s <= max_s, besides
+        those of `Raz.trinomial_s` (default: 1024). None searches every
+        s, which is exact but slow for the degrees that have none.
+
+    timeout : float, optional
+        Give up the search after this many seconds (default: 30). None
+        searches until a degree is found.
+
+    Returns
+    -------
+    int
+        The closest degree n >= 2 with an irreducible trinomial.
+
+    Raises
+    ------
+    TimeoutError
+        If the search took longer than timeout. The candidates settled
+        are cached, so a later search carries on from there.
+    """
+    known = _known_degrees(max_s)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    d = 0
+    while True:
+        for n in (k - d, k + d) if d else (k,):
+            if n < 2:
+                continue
+            if n in known:
+                return n
+            s = _search_trinomial(n, max_s, deadline)
+            if s is None:
+                raise TimeoutError(
+                    f'No irreducible trinomial x^n + x^s + 1 with s <= '
+                    f'{max_s} was found for |n - {k}| < {d} within '
+                    f'{timeout} s. Search on with a larger timeout, which '
+                    'carries on where this search stopped.')
+            if s:
+                return n
+        d += 1
 
 # ------- UTILITY FUNCTIONS -------
 
@@ -268,7 +595,8 @@ def opt_error_raz(n_1: int,
 
     # Coarse search: iterate over candidate l values.
     for current_l in ls:
-        # Compute the maximum number of p values to try for the current l.
+        # Compute the maximum number of p values to try for the current
+        # l.
         p_half_max = int((2**(current_l - log2(m)))//2)
         # Generate candidate p values: even integers starting from 2.
         p_values = [2 * phalf + 2 for phalf in range(p_half_max)]
@@ -279,7 +607,8 @@ def opt_error_raz(n_1: int,
             if eps < min_log2_error:
                 min_log2_error, best_l, best_p = eps, current_l, current_p
 
-    # If detailed optimisation is enabled, perform a more exhaustive search.
+    # If detailed optimisation is enabled, perform a more exhaustive
+    # search.
     if detailed_opt:
         # Generate a list of l values to try with finer granularity.
         num_values = min(l_max, max_tests_detailed)
@@ -447,7 +776,6 @@ def calc_raz_out(n_1: int,
 # ------ MAIN FUNCTION -------
 
 
-@staticmethod
 def from_params(
         n_1: int,
         k_1: float,
@@ -455,7 +783,9 @@ def from_params(
         k_2: float,
         log2_error: float,
         detailed_opt=False,
-        verbose: bool = False) -> Raz:
+        verbose: bool = False,
+        engine: str | None = None,
+        timeout: float | None = 30.0) -> Raz:
     """
     Generate a weak version of the efficient Raz
     extractor from [Fore2025]_ with valid
@@ -480,6 +810,12 @@ def from_params(
     verbose : bool
         If True, prints the parameters used for
         extraction (default: True).
+    engine : str, optional
+        The engine of the extractor returned, 'gf2' or 'ntt' (see
+        `Raz`; default: 'gf2').
+    timeout : float, optional
+        Give up looking for a length after this many seconds (see
+        `previous_trinomial`; default: 30).
 
     Returns
     -------
@@ -490,21 +826,44 @@ def from_params(
     ------
     ValueError
         If the output length is non-positive.
+    TimeoutError
+        If no length was found within timeout.
+
+    Notes
+    -----
+    - If GF_2^{n_1/2} has no irreducible trinomial, the function
+      selects the largest shorter length that has one (see
+      `previous_trinomial`), so that n_1 bits always suffice, and
+      adjusts the other parameters accordingly.
     """
-    m = calc_raz_out(n_1, k_1, n_2, k_2, log2_error,
-                     detailed_opt=detailed_opt, verbose=verbose)
+    # Find the largest length with an irreducible trinomial that fits
+    # n_1.
+    if n_1 < 4:
+        raise ValueError('The first input must have at least 4 bits.')
+    n = previous_trinomial(n_1 // 2, timeout=timeout)
+    n_1_adjusted = 2 * n
+    n_2_adjusted = min(n_2, n)
+
+    # Adjust min-entropy values if input lengths exceed the new ones.
+    k_1_adjusted = k_1 - max(0, n_1 - n_1_adjusted)
+    k_2_adjusted = k_2 - max(0, n_2 - n_2_adjusted)
+    if k_1_adjusted <= 0 or k_2_adjusted <= 0:
+        raise ValueError('Output length must be positive.')
+
+    m = calc_raz_out(n_1_adjusted, k_1_adjusted, n_2_adjusted, k_2_adjusted,
+                     log2_error, detailed_opt=detailed_opt, verbose=verbose)
     if m <= 0:
         raise ValueError('Output length must be positive.')
     if verbose:
         print(
             f'--- New Raz Extractor Parameters ---\n'
-            f'Input Length 1 (n_1): {n_1}, '
-            f'Min Entropy of Input 1 (k_1): {k_1}, '
-            f'Input Length 2 (n_2): {n_2}, '
-            f'Min Entropy of Input 2 (k_2): {k_2}, '
+            f'Input Length 1 (n_1): {n_1_adjusted}, '
+            f'Min Entropy of Input 1 (k_1): {k_1_adjusted}, '
+            f'Input Length 2 (n_2): {n_2_adjusted}, '
+            f'Min Entropy of Input 2 (k_2): {k_2_adjusted}, '
             f'Output Length (m): {m}, '
             f'Extraction Error (log2_error): {log2_error}. '
         )
         print("""Adjust the length of the input
                 and (weak) seed accordingly.""")
-    return Raz(n_1, m)
+    return Raz(n_1_adjusted, m, engine=engine)
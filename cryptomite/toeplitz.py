@@ -6,10 +6,16 @@ presented in [For2024]_.
 """
 from __future__ import annotations
 
+from functools import partial
 from math import floor
-from typing import cast
+from typing import BinaryIO, Iterable, Iterator, TYPE_CHECKING
 
-from cryptomite.utils import BitT, BitsT, conv, log_2
+from cryptomite import _cryptomite
+from cryptomite._cryptomite import SeededExtractor
+from cryptomite.utils import BitRowsLikeT, BitsLikeT, BitsT, conv_plan
+
+if TYPE_CHECKING:
+    from numpy import ndarray
 
 __all__ = ['Toeplitz']
 
@@ -19,7 +25,7 @@ class Toeplitz:
     Toeplitz extractor with implementation
     based on [For2024]_.
     """
-    def __init__(self, n_1: int, m: int):
+    def __init__(self, n_1: int, m: int, engine: str | None = None):
         """
         Initialize a Toeplitz extractor.
 
@@ -29,20 +35,78 @@ class Toeplitz:
             The length of the first input (in bits).
         m : int
             The length of the extractor output (in bits).
+        engine : str, optional
+            The convolution engine, as for
+            `cryptomite.utils.conv_plan` (default: the number theoretic
+            transform suited to the length). 'gf2' multiplies packed
+            polynomials over GF(2) instead, which is faster and needs 32
+            times less memory.
         """
         self.n_1, self.m = n_1, m
+        self.engine = engine
 
-    def extract(self, input1: BitsT, input2: BitsT) -> BitsT:
+    def extract(self, input1: BitsLikeT, input2: BitsLikeT,
+                packed_input: bool = False) -> BitsT:
         """
         Perform randomness extraction.
 
         Parameters
         ----------
-        input1 : list of bits (0s and 1s)
+        input1 : list of bits (0s and 1s), or bit buffer
+            The first input (the 'weak input'), consisting of n_1 bits.
+        input2 : list of bits (0s and 1s), or bit buffer
+            The second input (the '(weak) seed'), consisting
+            of n_2 = n_1 + m - 1 bits.
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
+
+        Notes
+        -----
+        Buffer-protocol objects (NumPy arrays, bytes, bytearray,
+        memoryview) are read in place.
+
+        Returns
+        -------
+        list of bits (0s and 1s)
+            The extractor output bits, of length m.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        plan = conv_plan(n_1 + m - 1, self.engine)
+        return _cryptomite.toeplitz_extract(plan, input1, input2, n_1, m,
+                                            packed_input)
+
+    def extract_segmented(self, input1: BitsLikeT, input2: BitsLikeT,
+                          segment_size: int = 1 << 20,
+                          packed_input: bool = False) -> BitsT:
+        """
+        Perform randomness extraction with memory independent of n_1.
+
+        The input is cut into segments of ``segment_size`` bits, the
+        product of each segment with its columns of the Toeplitz
+        matrix is computed by block convolution as in
+        `extract_stream`, and the products are summed mod 2. Segments
+        are spread over the threads set by
+        `cryptomite.utils.set_num_threads`, so the working memory is
+        O(m + segment_size) per thread: suited to very long inputs
+        with a short output. The output is that of `extract`.
+
+        Parameters
+        ----------
+        input1 : list of bits (0s and 1s), or bit buffer
             The first input (the 'weak input'), consisting of n_1 bits.
-        input2 : list of bits (0s and 1s)
+        input2 : list of bits (0s and 1s), or bit buffer
             The second input (the '(weak) seed'), consisting
             of n_2 = n_1 + m - 1 bits.
+        segment_size : int
+            The number of input bits convolved at a time
+            (default: 2^20).
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
 
         Returns
         -------
@@ -50,17 +114,146 @@ class Toeplitz:
             The extractor output bits, of length m.
         """
         n_1, m = self.n_1, self.m
-        assert len(input1) == n_1
-        assert len(input2) == n_1 + m - 1
         assert n_1 >= m
-        l = log_2(2 * n_1)
-        L = 1 << l
-        input1, input2 = list(input1), list(input2)
-        input1 = input1 + [0] * (L - n_1)
-        input2 = input2[:m] + [0] * (L - (m + n_1 - 1)) + input2[m:]
-        conv_output = conv(l, input1, input2)
-        output: BitsT = [cast(BitT, x & 1) for x in conv_output[:m]]
-        return output
+        if segment_size < 1:
+            raise ValueError('segment_size must be positive.')
+        segment_size = min(segment_size, n_1)
+        plan = conv_plan(2 * segment_size - 1, 'ntt')
+        return _cryptomite.toeplitz_extract_segmented(
+            plan, input1, input2, n_1, m, segment_size, packed_input)
+
+    def extract_many(self, inputs: BitRowsLikeT,
+                     seeds: BitRowsLikeT | BitsLikeT,
+                     packed_input: bool = False) -> ndarray:
+        """
+        Perform randomness extraction on a batch of blocks.
+
+        The whole batch runs natively, with the blocks spread over the
+        threads set by `cryptomite.utils.set_num_threads`.
+
+        Parameters
+        ----------
+        inputs : 2-D array of bits, or list of bit lists
+            The first inputs, one row of n_1 bits per block.
+        seeds : 2-D array of bits, or list of bit lists, or bits
+            The second inputs, one row of n_2 = n_1 + m - 1 bits per
+            block, or a single one shared by all blocks (which is then
+            number theoretic transformed only once).
+        packed_input : bool
+            If True, the rows of both inputs are packed eight bits per
+            byte along their last axis, as by
+            ``numpy.packbits(..., axis=1)``, in exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
+
+        Notes
+        -----
+        Rows are read in place from buffer-protocol objects.
+
+        Returns
+        -------
+        numpy.ndarray
+            The extractor outputs, an array of shape (blocks, m) with
+            dtype uint8.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        plan = conv_plan(n_1 + m - 1, self.engine)
+        return _cryptomite.toeplitz_extract_many(
+            plan, inputs, seeds, n_1, m, packed_input)
+
+    def with_seed(self, input2: BitsLikeT,
+                  packed_input: bool = False) -> SeededExtractor:
+        """
+        Fix the (weak) seed for repeated extraction.
+
+        The seed is padded and number theoretic transformed once, so
+        each later extraction needs one forward transform, one pointwise
+        product and one inverse transform instead of three transforms.
+
+        Parameters
+        ----------
+        input2 : list of bits (0s and 1s), or bit buffer
+            The second input (the '(weak) seed'), consisting
+            of n_2 = n_1 + m - 1 bits.
+        packed_input : bool
+            If True, input2 is a bit buffer packed eight bits per byte,
+            as by ``numpy.packbits``, of exactly ceil(n_2 / 8) bytes
+            (default: False, one bit per item). The extractor returned
+            takes the same argument.
+
+        Returns
+        -------
+        SeededExtractor
+            An extractor whose ``extract(input1)`` method behaves like
+            ``self.extract(input1, input2)``.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        plan = conv_plan(n_1 + m - 1, self.engine)
+        return _cryptomite.seeded_extractor(
+            plan, _cryptomite.ConvKind.toeplitz, input2, n_1, m,
+            packed_input)
+
+    def extract_stream(self, stream: BinaryIO | Iterable[BitsLikeT],
+                       input2: BitsLikeT, chunk_size: int = 1 << 16,
+                       packed: bool = False,
+                       packed_input: bool = False
+                       ) -> Iterator[BitsT | bytes]:
+        """
+        Perform randomness extraction on a stream of blocks.
+
+        The stream is cut into consecutive blocks of n_1 bits, each
+        extracted with the same (weak) seed. Input is consumed
+        ``chunk_size`` bits at a time by block convolution
+        (overlap-save), so the transforms, and most of the memory,
+        scale with ``chunk_size`` rather than with n_1. Streams always
+        use the number theoretic transform, whatever the engine.
+
+        Parameters
+        ----------
+        stream : binary file object, or iterable of bit chunks
+            The first input (the 'weak input'). File objects are read
+            as packed bits. Chunks may have any length; bytes,
+            bytearray and memoryview chunks hold packed bits, other
+            chunks (lists, NumPy arrays, ...) one bit per item.
+        input2 : list of bits (0s and 1s), or bit buffer
+            The second input (the '(weak) seed'), consisting
+            of n_2 = n_1 + m - 1 bits.
+        chunk_size : int
+            The number of input bits convolved at a time
+            (default: 2^16).
+        packed : bool
+            If True, yield each output packed eight bits per byte, as
+            by ``numpy.packbits`` (default: False).
+        packed_input : bool
+            If True, input2 is a bit buffer packed eight bits per byte,
+            as by ``numpy.packbits``, of exactly ceil(n_2 / 8) bytes
+            (default: False, one bit per item). Chunks of the stream
+            are packed or not by their type, as above.
+
+        Yields
+        ------
+        list of bits (0s and 1s), or bytes
+            The extractor output of each block, of length m, as soon as
+            the last bit of the block has been read. Bits left over
+            after the last complete block are discarded.
+        """
+        n_1, m = self.n_1, self.m
+        assert n_1 >= m
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive.')
+        plan = conv_plan(2 * chunk_size - 1, 'ntt')
+        ext = _cryptomite.toeplitz_stream(plan, input2, n_1, m, chunk_size,
+                                          packed_input)
+        if hasattr(stream, 'read'):
+            stream = iter(partial(stream.read, max(1, chunk_size // 8)), b'')
+        for chunk in stream:
+            is_bytes = isinstance(chunk, (bytes, bytearray, memoryview))
+            if is_bytes:
+                nbits = 8 * memoryview(chunk).nbytes
+            else:
+                nbits = len(chunk)
+            yield from ext.update(chunk, nbits, packed, is_bytes)
 
     @staticmethod
     def from_params(
@@ -70,7 +263,8 @@ class Toeplitz:
             k_2: float,
             log2_error: float,
             q_proof: bool,
-            verbose: bool = True) -> Toeplitz:
+            verbose: bool = True,
+            engine: str | None = None) -> Toeplitz:
         """
         Generate a Toeplitz extractor with valid parameters
         based on input constraints.
@@ -89,10 +283,15 @@ class Toeplitz:
             The logarithm (base 2) of the acceptable extractor error.
             Must be negative, as the extractor error is 2^log2_error.
         q_proof : bool
-            If True, adjusts parameters to ensure quantum-proof extraction
-            in the Markov and product sources models (see [For2024]_).
+            If True, adjusts parameters to ensure quantum-proof
+            extraction in the Markov and product sources models (see
+            [For2024]_).
         verbose : bool
-            If True, prints the parameters used for extraction (default: True).
+            If True, prints the parameters used for extraction
+            (default: True).
+        engine : str, optional
+            The convolution engine of the extractor returned (see
+            `Toeplitz`; default: the number theoretic transform).
 
         Returns
         -------
@@ -109,9 +308,10 @@ class Toeplitz:
 
         Notes
         -----
-        - For this extractor, the output length remains the same when it is
-          classical-proof, quantum-proof in the product sources model, and
-          quantum-proof in the Markov model (see [For2024]_).
+        - For this extractor, the output length remains the same when it
+          is classical-proof, quantum-proof in the product sources
+          model, and quantum-proof in the Markov model (see
+          [For2024]_).
         """
         assert log2_error <= 0
 
@@ -162,4 +362,4 @@ class Toeplitz:
             print("""Adjust the length of the input
                   and (weak) seed accordingly.""")
 
-        return Toeplitz(n_1, m)
+        return Toeplitz(n_1, m, engine=engine)
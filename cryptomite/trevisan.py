@@ -8,7 +8,18 @@ from __future__ import annotations
 
 __all__ = ['Trevisan']
 
+from os import PathLike
+from typing import TYPE_CHECKING, Union
+
 from cryptomite import _cryptomite
+from cryptomite.utils import BitRowsLikeT, BitsLikeT, BitsT
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+PathT = Union[str, PathLike]
 
 
 class Trevisan:
@@ -16,7 +27,8 @@ class Trevisan:
     Trevisan extractor [Trev2001]_ with implementation
     based on [Mauer2012]_ and [For2024]_.
     """
-    def __init__(self, n: int, k: float, error: float):
+    def __init__(self, n: int, k: float, error: float,
+                 design: PathT | None = None):
         """Initialize a Trevisan Extractor.
 
         Parameters
@@ -27,31 +39,110 @@ class Trevisan:
             The min-entropy of the input bits.
         error : float
             The maximum acceptable extractor error.
+        design : str or path-like, optional
+            A weak design table saved by `save_design` for the same
+            parameters, to memory-map instead of building the table
+            (see `load_design`).
         """
         self.config = _cryptomite.TrevisanConfig(n, k, error)
         self.ext = _cryptomite.Trevisan(self.config)
+        if design is not None:
+            self.load_design(design)
 
-    def extract(self, input1: list[bool], input2: list[bool]) -> list[bool]:
+    def extract(self, input1: BitsLikeT, input2: BitsLikeT,
+                packed: bool = False,
+                packed_input: bool = False) -> BitsT | bytes:
         """
         Extract randomness.
 
+        The output bits are computed natively, spread over the threads
+        set by `cryptomite.utils.set_num_threads`.
+
         Parameters
         ----------
-        input1 : list of bits (0s and 1s)
+        input1 : list of bits (0s and 1s), or bit buffer
             The first input (the 'weak input'), consisting of n bits.
-        input2 : list of bits (0s and 1s)
+        input2 : list of bits (0s and 1s), or bit buffer
             The second input (the '(weak) seed').
+        packed : bool
+            If True, return the output packed eight bits per byte, as
+            by ``numpy.packbits`` (default: False).
+        packed_input : bool
+            If True, both inputs are bit buffers packed eight bits per
+            byte, as by ``numpy.packbits``, of exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
 
         Returns
         -------
-        list of bits (0s and 1s)
+        list of bits (0s and 1s), or bytes
             The extractor output bits, of length m.
         """
-        self.ext.load_source(input1, input2)
+        bits = self.ext.extract_all(input1, input2, packed, packed_input)
+        return bits if packed else bits.tolist()
+
+    def extract_many(self, inputs: BitRowsLikeT,
+                     seeds: BitRowsLikeT | BitsLikeT,
+                     packed_input: bool = False) -> ndarray:
+        """
+        Extract randomness from a batch of blocks, natively and in
+        parallel (see Toeplitz.extract_many).
+
+        Parameters
+        ----------
+        inputs : 2-D array of bits, or list of bit lists
+            The first inputs, one row of n bits per block.
+        seeds : 2-D array of bits, or list of bit lists, or bits
+            The second inputs, one row of ``ext.get_seed_length()``
+            bits per block, or a single one shared by all blocks.
+        packed_input : bool
+            If True, the rows of both inputs are packed eight bits per
+            byte along their last axis, as by
+            ``numpy.packbits(..., axis=1)``, in exactly ceil(bits / 8)
+            bytes (default: False, one bit per item).
+
+        Returns
+        -------
+        numpy.ndarray
+            The extractor outputs, an array of shape (blocks, m) with
+            dtype uint8.
+        """
+        return self.ext.extract_many(inputs, seeds, packed_input)
 
-        m = self.config.m
-        bits = []
-        for i in range(m):
-            bit = self.ext.extract_bit(i)
-            bits.append(bit)
-        return bits
+    def save_design(self, path: PathT) -> None:
+        """
+        Save the weak design table, building it if needed.
+
+        The weak design selects the seed bits of every output bit. It
+        only depends on the parameters (m and t), not on the inputs, so
+        its table is built once and shared by all extractors with the
+        same parameters while any of them is in use. Saving it lets
+        other processes skip building it altogether.
+
+        Parameters
+        ----------
+        path : str or path-like
+            The file to write, in NumPy ``.npy`` format (``.npy`` is
+            appended to names without it, as by ``numpy.save``).
+        """
+        np.save(path, self.ext.design_table())
+
+    def load_design(self, path: PathT, mmap: bool = True) -> None:
+        """
+        Use a weak design table saved by `save_design`.
+
+        Parameters
+        ----------
+        path : str or path-like
+            The ``.npy`` file holding the table.
+        mmap : bool
+            If True, map the file into memory rather than reading it,
+            so that processes using the same table share its pages
+            (default: True).
+
+        Raises
+        ------
+        ValueError
+            If the table does not match the parameters of the extractor.
+        """
+        table = np.load(path, mmap_mode='r' if mmap else None)
+        self.ext.set_design_table(table)
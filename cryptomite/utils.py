@@ -3,18 +3,33 @@ This is a module.
 """
 from __future__ import annotations
 
+from collections import OrderedDict
 from math import sqrt
-from typing import Literal, Sequence
+from threading import Lock
+from typing import Literal, NamedTuple, Sequence, Union
 
-from cryptomite._cryptomite import BigNTT, NTT
+from cryptomite._cryptomite import (BigNTT, CrtNTT, GF2Conv, NTT,
+                                    available_gf2x_kernels,
+                                    available_ntt_kernels, get_num_threads,
+                                    gf2x_kernel, ntt_kernel,
+                                    set_num_threads as _set_num_threads)
 
 __all__ = ['is_prime', 'prime_facto', 'previous_prime', 'next_prime',
            'closest_prime', 'previous_na_set', 'next_na_set',
-           'closest_na_set', 'suggest_extractor', 'von_neumann']
+           'closest_na_set', 'suggest_extractor', 'von_neumann',
+           'plan_cache_info', 'clear_plan_cache', 'set_plan_cache_limit',
+           'engine_info', 'get_num_threads', 'set_num_threads']
 
 
 BitT = Literal[0, 1]
 BitsT = Sequence[BitT]
+# Bits as a sequence, or as any buffer-protocol object (e.g. a NumPy
+# array) holding one bit per item or eight bits per byte as given by
+# numpy.packbits.
+BitsLikeT = Union[BitsT, bytes, bytearray, memoryview]
+# One row of bits per block: a two-dimensional buffer-protocol object
+# (optionally packed along its last axis) or a sequence of BitsLikeT.
+BitRowsLikeT = Union[Sequence[BitsLikeT], memoryview]
 
 
 def log_2(n: int) -> int:
@@ -38,6 +53,219 @@ def log_2(n: int) -> int:
     return x
 
 
+_ENGINES = {'ntt': NTT, 'bigntt': BigNTT, 'crt': CrtNTT, 'gf2': GF2Conv}
+# Engines with transforms of size 3 * 2^l.
+_RADIX3_ENGINES = ('ntt', 'bigntt')
+
+
+class PlanCacheInfo(NamedTuple):
+    """
+    Statistics of the NTT plan cache, as returned by plan_cache_info.
+    """
+    hits: int
+    misses: int
+    nbytes: int
+    max_nbytes: int
+    plans: list[tuple[str, int] | tuple[str, int, int]]
+
+
+_plans: OrderedDict[tuple[str, int] | tuple[str, int, int],
+                    NTT | BigNTT | CrtNTT | GF2Conv] = OrderedDict()
+_plans_lock = Lock()
+_plans_stats = {'hits': 0, 'misses': 0, 'nbytes': 0,
+                'max_nbytes': 1 << 30}
+
+
+def _evict_plans(max_nbytes: int) -> None:
+    # Caller holds _plans_lock.
+    while _plans and _plans_stats['nbytes'] > max_nbytes:
+        _, plan = _plans.popitem(last=False)
+        _plans_stats['nbytes'] -= plan.nbytes
+
+
+def ntt_plan(l: int,
+             engine: str | None = None,
+             threes: int = 0) -> NTT | BigNTT | CrtNTT | GF2Conv:
+    """
+    Get a number theoretic transform of size 2^l (or 3 * 2^l) from the
+    plan cache, creating it on first use.
+
+    Plans are shared by the whole process and evicted least recently
+    used first once they hold more than the cache limit
+    (see set_plan_cache_limit).
+
+    Parameters
+    ----------
+    l : int
+        The base 2 logarithm of the size of the transform.
+    engine : str, optional
+        One of 'ntt', 'bigntt', 'crt' or 'gf2'. By default, the
+        transform uses a 32-bit prime ('ntt') up to l = 30, the furthest
+        it reaches, and beyond that two-dimensional transforms over two
+        32-bit primes combined by the Chinese remainder theorem ('crt'),
+        which are about twice as fast as a 64-bit prime ('bigntt').
+        'gf2' multiplies packed polynomials over GF(2) instead, for the
+        convolution extractors, which only need results mod 2.
+    threes : int, optional
+        1 for a transform of size 3 * 2^l, supported by the 'ntt' and
+        'bigntt' engines (default: 0).
+
+    Returns
+    -------
+    NTT, BigNTT, CrtNTT or GF2Conv
+        The transform.
+    """
+    if engine is None:
+        engine = 'crt' if l > 30 else 'ntt'
+    if engine not in _ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, '
+                         f'expected one of {sorted(_ENGINES)}.')
+    if threes and engine not in _RADIX3_ENGINES:
+        raise ValueError(f'Engine {engine!r} only has transforms of '
+                         'size 2^l.')
+    key = (engine, l, threes) if threes else (engine, l)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            _plans_stats['hits'] += 1
+            return plan
+        _plans_stats['misses'] += 1
+    # Build outside the lock, tables for large l take a while.
+    plan = _ENGINES[engine](l, threes) if threes else _ENGINES[engine](l)
+    with _plans_lock:
+        if key not in _plans and plan.nbytes <= _plans_stats['max_nbytes']:
+            _plans[key] = plan
+            _plans_stats['nbytes'] += plan.nbytes
+            _evict_plans(_plans_stats['max_nbytes'])
+        return _plans.get(key, plan)
+
+
+def conv_plan(n: int,
+              engine: str | None = None) -> NTT | BigNTT | CrtNTT | GF2Conv:
+    """
+    Get the shortest transform of at least n elements from the plan
+    cache, as needed by a convolution of n coefficients.
+
+    The 'ntt' and 'bigntt' engines have sizes 2^l and 3 * 2^l, so that
+    lengths just past a power of 2 are padded by at most a third rather
+    than doubled; the other engines have sizes 2^l.
+
+    Parameters
+    ----------
+    n : int
+        The least size of the transform.
+    engine : str, optional
+        As for ntt_plan; by default, 'ntt' for n up to 2^30 and 'crt'
+        beyond.
+
+    Returns
+    -------
+    NTT, BigNTT, CrtNTT or GF2Conv
+        The transform.
+    """
+    if engine is None:
+        engine = 'crt' if n > 1 << 30 else 'ntt'
+    l = max(1, (n - 1).bit_length())
+    if engine in _RADIX3_ENGINES and l > 2 and 3 << (l - 2) >= n:
+        return ntt_plan(l - 2, engine, 1)
+    return ntt_plan(l, engine)
+
+
+def plan_cache_info() -> PlanCacheInfo:
+    """
+    Report the state of the NTT plan cache.
+
+    Returns
+    -------
+    PlanCacheInfo
+        The cache hits and misses, the memory held by cached plans and
+        its limit (in bytes), and the cached (engine, l) pairs (with
+        threes appended for sizes 3 * 2^l) from least to most recently
+        used.
+    """
+    with _plans_lock:
+        return PlanCacheInfo(plans=list(_plans), **_plans_stats)
+
+
+def clear_plan_cache() -> None:
+    """
+    Drop all cached NTT plans and reset the cache statistics.
+    """
+    with _plans_lock:
+        _plans.clear()
+        _plans_stats.update(hits=0, misses=0, nbytes=0)
+
+
+def set_plan_cache_limit(max_nbytes: int) -> None:
+    """
+    Set the maximum memory held by cached NTT plans.
+
+    Parameters
+    ----------
+    max_nbytes : int
+        The limit in bytes (default: 1 GiB). Least recently used
+        plans are evicted until the cache fits. Plans larger than
+        the limit are never cached; 0 disables caching.
+    """
+    if max_nbytes < 0:
+        raise ValueError('The plan cache limit must be non-negative.')
+    with _plans_lock:
+        _plans_stats['max_nbytes'] = max_nbytes
+        _evict_plans(max_nbytes)
+
+
+def engine_info() -> dict:
+    """
+    Report how the native convolution engine runs on this machine.
+
+    Returns
+    -------
+    dict
+        ``ntt_kernel``: the instruction set of the NTT butterfly
+        kernels in use ('avx512', 'avx2', 'sse4.1' or 'scalar'),
+        chosen from CPUID when cryptomite is imported.
+        ``available_ntt_kernels``: the kernels this CPU supports,
+        best first.
+        ``gf2x_kernel``: the instruction set of the GF(2)[x]
+        multiplication kernels of the 'gf2' engine ('pclmul' or
+        'scalar').
+        ``available_gf2x_kernels``: the GF(2)[x] kernels this CPU
+        supports, best first.
+        ``num_threads``: the threads a single transform may use (see
+        `set_num_threads`).
+    """
+    return {
+        'ntt_kernel': ntt_kernel(),
+        'available_ntt_kernels': available_ntt_kernels(),
+        'gf2x_kernel': gf2x_kernel(),
+        'available_gf2x_kernels': available_gf2x_kernels(),
+        'num_threads': get_num_threads(),
+    }
+
+
+def set_num_threads(n: int | None) -> None:
+    """
+    Set the number of threads used by NTT convolutions.
+
+    Transforms of length 2^15 and above are split across threads, and
+    the two forward transforms of a convolution run concurrently.
+    Nested parallel work shares these threads, so at most `n` run at
+    once per call. The threads are started on first use and kept for
+    later calls; lowering `n` stops the ones no longer needed.
+
+    Parameters
+    ----------
+    n : int or None
+        The number of threads. None restores the default, which is
+        the ``CRYPTOMITE_NUM_THREADS`` environment variable if set,
+        else the number of hardware threads.
+    """
+    if n is not None and n < 1:
+        raise ValueError('The number of threads must be positive.')
+    _set_num_threads(n or 0)
+
+
 def conv(l: int, source1: Sequence[int], source2: Sequence[int]) -> list[int]:
     """
     Perform a cyclic convolution of size 2^l.
@@ -58,11 +286,7 @@ def conv(l: int, source1: Sequence[int], source2: Sequence[int]) -> list[int]:
     """
     L = 1 << l
     assert len(source1) == len(source2) == L
-    ntt = BigNTT(l) if l > 30 else NTT(l)
-    # ntt_source1 = ntt.ntt(source1, False)
-    # ntt_source2 = ntt.ntt(source2, False)
-    # mul_source = ntt.mul_vec(ntt_source1, ntt_source2)
-    # conv_output = ntt.ntt(mul_source, True)
+    ntt = ntt_plan(l)
     return ntt.conv(source1, source2)
 
 
@@ -128,7 +352,7 @@ def prime_facto(n: int) -> tuple[list[int], list[int]]:
 
 def previous_prime(k: int) -> int:
     """
-    Finds the largest prime number less than or equal to the given input.
+    Finds the largest prime number less than or equal to the input.
 
     Parameters
     ----------
@@ -153,7 +377,7 @@ def previous_prime(k: int) -> int:
 
 def next_prime(k: int) -> int:
     """
-    Finds the smallest prime number greater than or equal to the given input.
+    Finds the smallest prime number greater than or equal to the input.
 
     Parameters
     ----------
@@ -1,42 +1,15 @@
 #include "bigntt.h"
+#include "modarith.h"
+#include "parallel.h"
 
+#include <algorithm>
 #include <stdexcept>
 #include <vector>
 
-#define P ((9ull<<42) + 1)
-#define G 5 // primitive root mod P
-
-uint64_t add(uint64_t a, uint64_t b) {
-    uint64_t c = a + b;
-    if (c >= P) {
-        c -= P;
-    }
-
-    return c;
-}
-
-/**
- * Subtraction: a-b mod P
- *
- * @pre a,b < P
- */
-static uint64_t sub(uint64_t a, uint64_t b) {
-    uint64_t c = a - b;
-    if (a < b) {
-        c += P;
-    }
-
-    return c;
-}
+using mod64::P;
+using mod64::mul;
 
-uint64_t mul(uint64_t a, uint64_t b) {
-    // correct if a,b,P < 2^57
-    uint64_t c = (double)a * b / P;
-    int64_t ans = int64_t(a * b - c * P) % int64_t(P);
-    if (ans < 0)
-        ans += P;
-    return ans;
-}
+#define G 5 // primitive root mod P
 
 /**
  * Modular exponentiation: a^e mod P
@@ -67,20 +40,26 @@ static uint64_t reverse_bits(unsigned l, uint64_t x) {
     return y;
 }
 
-BigNTT::BigNTT(unsigned l) : L(1ll<<l) {
+BigNTT::BigNTT(unsigned l, unsigned threes) : L(threes ? 3ull << l : 1ull << l), N(1ull << l) {
     if (l < 1 || l > 40) {
         throw std::runtime_error("Must have 1 <= l <= 40.");
     }
+    if (threes > 1) {
+        throw std::invalid_argument("Transform length not supported by the prime.");
+    }
 
     Linv = modexp(L, P-2);
+    Linv_shoup = mod64::shoup(Linv);
 
-    uint64_t half_L = L/2;
+    uint64_t half_L = N/2;
 
     R = std::vector<uint64_t>(half_L);
     Rinv = std::vector<uint64_t>(half_L);
-    revbits = std::vector<uint64_t>(L);
+    R_shoup = std::vector<uint64_t>(half_L);
+    Rinv_shoup = std::vector<uint64_t>(half_L);
+    revbits = std::vector<uint64_t>(N);
 
-    uint64_t r = modexp(G, (P - 1) >> l); // primitive L'th root of unity
+    uint64_t r = modexp(G, (P - 1) >> l); // primitive N'th root of unity
 
     {
         {
@@ -101,46 +80,193 @@ BigNTT::BigNTT(unsigned l) : L(1ll<<l) {
         }
     }
 
-    for (uint64_t i = 0; i < L; i++) {
+    for (uint64_t i = 0; i < half_L; i++) {
+        R_shoup[i] = mod64::shoup(R[i]);
+        Rinv_shoup[i] = mod64::shoup(Rinv[i]);
+    }
+
+    for (uint64_t i = 0; i < N; i++) {
         revbits[i] = reverse_bits(l, i);
     }
 
+    if (L != N) {
+        uint64_t w = modexp(G, (P - 1) / L), winv = modexp(w, P - 2);
+        W = std::vector<uint64_t>(2 * N);
+        Winv = std::vector<uint64_t>(2 * N);
+        W_shoup = std::vector<uint64_t>(2 * N);
+        Winv_shoup = std::vector<uint64_t>(2 * N);
+        uint64_t t = 1, tinv = 1;
+        for (uint64_t k = 0; k < N; k++) {
+            W[k] = t;
+            W[N + k] = mul(t, t);
+            Winv[k] = tinv;
+            Winv[N + k] = mul(tinv, tinv);
+            t = mul(t, w);
+            tinv = mul(tinv, winv);
+        }
+        for (uint64_t i = 0; i < 2 * N; i++) {
+            W_shoup[i] = mod64::shoup(W[i]);
+            Winv_shoup[i] = mod64::shoup(Winv[i]);
+        }
+        // t = w^N now
+        omega = t;
+        omega_inv = tinv;
+        omega_shoup = mod64::shoup(omega);
+        omega_inv_shoup = mod64::shoup(omega_inv);
+    }
+}
+
+uint64_t BigNTT::nbytes() const {
+    return sizeof(uint64_t) * (R.size() + Rinv.size() + R_shoup.size()
+                               + Rinv_shoup.size() + revbits.size() + W.size()
+                               + Winv.size() + W_shoup.size() + Winv_shoup.size());
 }
 
-std::vector<uint64_t> BigNTT::ntt(const std::vector<uint64_t> &x, bool inverse) {
+/**
+ * n of Harvey's butterflies, keeping values in [0, 4P): (r[j], s[j]) with
+ * the twiddle factor U[(first + j) u]
+ */
+static void butterfly_range(uint64_t *r, uint64_t *s, const uint64_t *U, const uint64_t *U_shoup, uint64_t u, uint64_t first, uint64_t n) {
+    const uint64_t P2 = 2 * P;
+    for (uint64_t j = 0, v = first * u; j < n; j++, v += u) {
+        uint64_t a = r[j];
+        if (a >= P2) {
+            a -= P2;
+        }
+        uint64_t b = mod64::mul_shoup_lazy(s[j], U[v], U_shoup[v]);
+        r[j] = a + b;
+        s[j] = a - b + P2;
+    }
+}
+
+uint64_t BigNTT::chunks() const {
+    uint64_t T = 1;
+    unsigned budget = thread_budget();
+    while (2 * T <= budget && N / (2 * T) >= MIN_CHUNK) {
+        T *= 2;
+    }
+    return T;
+}
+
+void BigNTT::transform_pow2(const uint64_t *x, uint64_t stride, uint64_t *y, bool inverse,
+                            const CoefficientRanges *keep) const {
     const std::vector<uint64_t>& U = inverse ? Rinv : R;
+    const std::vector<uint64_t>& U_shoup = inverse ? Rinv_shoup : R_shoup;
 
-    std::vector<uint64_t> y(L, 0);
+    // Stages with half-length below `full` compute every butterfly, the
+    // later ones only those leading to the coefficients kept
+    uint64_t full = N;
+    if (keep) {
+        full = 1;
+        while (full < N && covers(ranges_mod(*keep, 2 * full), 2 * full)) {
+            full <<= 1;
+        }
+    }
 
-    // Bit inversion
-    for (uint64_t i = 0; i < L; i++) {
-        y[revbits[i]] = x[i];
+    // Stages with blocks up to the chunk length run chunk by chunk, the
+    // later ones split the butterflies of each stage evenly
+    uint64_t T = chunks(), chunk = N / T;
+    parallel_for(T, [&](size_t t) {
+        uint64_t begin = t * chunk, end = begin + chunk;
+
+        // Bit inversion
+        for (uint64_t i = begin; i < end; i++) {
+            y[i] = x[stride * revbits[i]];
+        }
+
+        for (uint64_t k = 1, u = N/2; k < std::min(chunk, full); k <<= 1, u >>= 1) {
+            for (uint64_t i = begin; i < end; i += 2 * k) {
+                butterfly_range(y + i, y + i + k, U.data(), U_shoup.data(), u, 0, k);
+            }
+        }
+    });
+    for (uint64_t k = chunk, u = T/2; k < full; k <<= 1, u >>= 1) {
+        parallel_for(T, [&](size_t t) {
+            uint64_t n = N / 2 / T, first = t * n;
+            uint64_t *r = y + first / k * 2 * k + first % k;
+            butterfly_range(r, r + k, U.data(), U_shoup.data(), u, first % k, n);
+        });
+    }
+    for (uint64_t k = full; k < N; k <<= 1) {
+        CoefficientRanges js = butterfly_ranges(ranges_mod(*keep, 2 * k), k);
+        uint64_t blocks = N / (2 * k), pieces = std::min(T, blocks), u = N / (2 * k);
+        parallel_for(pieces, [&](size_t t) {
+            for (uint64_t i = t * (blocks / pieces); i < (t + 1) * (blocks / pieces); i++) {
+                uint64_t *r = y + i * 2 * k;
+                for (const auto &j : js) {
+                    butterfly_range(r + j.first, r + k + j.first, U.data(), U_shoup.data(), u, j.first,
+                                    j.second - j.first);
+                }
+            }
+        });
     }
 
-    // Main loop
-    for (
-        uint64_t h = 2, k = 1, u = L/2;
-        h <= L;
-        k = h, h <<= 1, u >>= 1)
-    {
-        for (uint64_t i = 0; i < L; i += h) {
-            for (uint64_t j = 0, v = 0; j < k; j++, v += u) {
-                uint64_t r = i + j;
-                uint64_t s = r + k;
-                uint64_t a = y[r];
-                uint64_t b = mul(y[s], U[v]);
-                y[r] = add(a, b);
-                y[s] = sub(a, b);
+    auto finish = [&](uint64_t begin, uint64_t end) {
+        if (inverse) {
+            // Normalization, which also reduces fully
+            for (uint64_t i = begin; i < end; i++) {
+                y[i] = mod64::mul_shoup(y[i], Linv, Linv_shoup);
             }
+        } else {
+            for (uint64_t i = begin; i < end; i++) {
+                y[i] = mod64::reduce4(y[i]);
+            }
+        }
+    };
+    if (full < N) {
+        for (const auto &r : ranges_mod(*keep, N)) {
+            finish(r.first, r.second);
         }
+    } else {
+        parallel_for(T, [&](size_t t) {
+            finish(t * chunk, (t + 1) * chunk);
+        });
     }
+}
 
-    // Normalization for inverse
-    if (inverse) {
-        for (uint64_t i = 0; i < L; i++) {
-            y[i] = mul(Linv, y[i]);
+void BigNTT::transform(const uint64_t *x, uint64_t *y, bool inverse, const CoefficientRanges *keep) const {
+    if (L == N) {
+        transform_pow2(x, 1, y, inverse, keep);
+        return;
+    }
+
+    // Radix 3 decimation in time: with A_r the transform of x[r], x[r + 3],
+    // ..., y[k + qN] = A_0[k] + omega^q w^k A_1[k] + omega^2q w^2k A_2[k]
+    CoefficientRanges ks = keep ? ranges_mod(*keep, N) : CoefficientRanges{{0, N}};
+    for (uint64_t r = 0; r < 3; r++) {
+        transform_pow2(x + r, 3, y + r * N, inverse, keep ? &ks : nullptr);
+    }
+
+    const uint64_t *U = inverse ? Winv.data() : W.data();
+    const uint64_t *U_shoup = inverse ? Winv_shoup.data() : W_shoup.data();
+    uint64_t o = inverse ? omega_inv : omega, o_shoup = inverse ? omega_inv_shoup : omega_shoup;
+    auto butterflies = [&](uint64_t begin, uint64_t end) {
+        for (uint64_t k = begin; k < end; k++) {
+            uint64_t a0 = y[k];
+            uint64_t a1 = mod64::mul_shoup(y[k + N], U[k], U_shoup[k]);
+            uint64_t a2 = mod64::mul_shoup(y[k + 2 * N], U[N + k], U_shoup[N + k]);
+            // omega^2 = -1 - omega
+            uint64_t e = mod64::mul_shoup(mod64::sub(a1, a2), o, o_shoup);
+            y[k] = mod64::add(mod64::add(a0, a1), a2);
+            y[k + N] = mod64::add(mod64::sub(a0, a2), e);
+            y[k + 2 * N] = mod64::sub(mod64::sub(a0, a1), e);
+        }
+    };
+    if (keep) {
+        for (const auto &k : ks) {
+            butterflies(k.first, k.second);
         }
+        return;
     }
+    uint64_t T = chunks(), chunk = N / T;
+    parallel_for(T, [&](size_t t) {
+        butterflies(t * chunk, (t + 1) * chunk);
+    });
+}
+
+std::vector<uint64_t> BigNTT::ntt(const std::vector<uint64_t> &x, bool inverse) {
+    std::vector<uint64_t> y(L, 0);
+    transform(x.data(), y.data(), inverse);
     return y;
 }
 
@@ -153,6 +279,26 @@ std::vector<uint64_t> BigNTT::mul_vec(const std::vector<uint64_t> &a, const std:
 }
 
 std::vector<uint64_t> BigNTT::conv(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b) {
-    std::vector<uint64_t> c = mul_vec(ntt(a, false), ntt(b, false));
+    // The two forward transforms run concurrently, each on half the threads
+    std::vector<uint64_t> fa, fb;
+    auto forward = [&](size_t t) { (t ? fb : fa) = ntt(t ? b : a, false); };
+    if (L >= MIN_CHUNK) {
+        parallel_for(2, forward);
+    } else {
+        forward(0);
+        forward(1);
+    }
+    return ntt(mul_vec(fa, fb), true);
+}
+
+std::vector<uint64_t> BigNTT::conv_transformed(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b_hat) {
+    std::vector<uint64_t> c = mul_vec(ntt(a, false), b_hat);
     return ntt(c, true);
-}
\ No newline at end of file
+}
+
+std::vector<uint64_t> BigNTT::conv_transformed(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b_hat,
+                                               const CoefficientRanges &keep) {
+    std::vector<uint64_t> c = mul_vec(ntt(a, false), b_hat), y(L);
+    transform(c.data(), y.data(), true, &keep);
+    return y;
+}
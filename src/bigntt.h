@@ -1,37 +1,95 @@
 #pragma once
 
+#include "ranges.h"
+
 #include <cstdint>
 #include <vector>
 
+/**
+ * Number theoretic transforms and cyclic convolutions mod the 64-bit prime
+ * 9 * 2^42 + 1, of length L = 2^l for 1 <= l <= 40, or L = 3 * 2^l (one
+ * radix 3 step over three transforms of length 2^l, as in NTT).
+ */
 class BigNTT {
   private:
-    /** Sequence length (power of 2) */
-    uint64_t L;
+    /** Sequence length (2^l or 3 * 2^l), and its power of 2 part */
+    uint64_t L, N;
 
-    /** Inverse of L mod p */
-    uint64_t Linv;
+    /** Inverse of L mod p, and its Shoup quotient */
+    uint64_t Linv, Linv_shoup;
 
     /**
-     * Powers 1, r, r^2, ..., r^(L/2-1) mod p, where r is a primitive L'th
+     * Powers 1, r, r^2, ..., r^(N/2-1) mod p, where r is a primitive N'th
      * root of unity mod p
      */
     std::vector<uint64_t> R;
 
     /**
-     * Inverse powers 1, r^{-1}, r^{-2}, ..., r{-^(L/2-1)} mod p
+     * Inverse powers 1, r^{-1}, r^{-2}, ..., r{-^(N/2-1)} mod p
      */
     std::vector<uint64_t> Rinv;
 
+    /**
+     * Shoup quotients floor(w * 2^64 / p) of the entries w of R and Rinv
+     */
+    std::vector<uint64_t> R_shoup, Rinv_shoup;
+
+    /**
+     * Twiddle factors of the radix 3 step, W[k] = w^k and W[N + k] = w^2k
+     * for k < N, where w is a primitive L'th root of unity, their inverses,
+     * and the Shoup quotients of all of them; empty when L = N
+     */
+    std::vector<uint64_t> W, Winv, W_shoup, Winv_shoup;
+
+    /** The cube root of unity w^N, its inverse and their Shoup quotients */
+    uint64_t omega, omega_inv, omega_shoup, omega_inv_shoup;
+
     /**
      * Lookup table for bit reversals
      */
     std::vector<uint64_t> revbits;
 
+    /** Shortest piece of a transform worth handing to another thread */
+    static const uint64_t MIN_CHUNK = 1 << 14;
+
+    /** Number of pieces (a power of 2) a transform of length N is split into */
+    uint64_t chunks() const;
+
+    /** Transform of length N of x[0], x[stride], ..., scaled by 1/L if inverse */
+    void transform_pow2(const uint64_t *x, uint64_t stride, uint64_t *y, bool inverse,
+                        const CoefficientRanges *keep) const;
+
   public:
-    explicit BigNTT(unsigned l);
+    typedef uint64_t value_type;
+
+    /** Forward transforms, as taken by conv_transformed */
+    typedef std::vector<uint64_t> spectrum_type;
+
+    /** Transforms of length 3^threes * 2^l, for threes = 0 or 1 */
+    explicit BigNTT(unsigned l, unsigned threes = 0);
+
+    /** Sequence length */
+    uint64_t size() const { return L; }
+
+    /** Memory held by the precomputed tables, in bytes */
+    uint64_t nbytes() const;
+
+    /**
+     * Transform of x[0], ..., x[L - 1] into y[0], ..., y[L - 1]; x and y
+     * must not overlap. Given `keep`, only the outputs in those ranges are
+     * computed (as in NTT) and the others are left unspecified.
+     */
+    void transform(const uint64_t *x, uint64_t *y, bool inverse, const CoefficientRanges *keep = nullptr) const;
 
     std::vector<uint64_t> ntt(const std::vector<uint64_t> &x, bool inverse);
 
     std::vector<uint64_t> mul_vec(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b);
     std::vector<uint64_t> conv(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b);
+
+    /** Cyclic convolution of a and b, given the forward transform of b */
+    std::vector<uint64_t> conv_transformed(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b_hat);
+
+    /** As conv_transformed, computing only the coefficients in `keep` (see transform) */
+    std::vector<uint64_t> conv_transformed(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b_hat,
+                                           const CoefficientRanges &keep);
 };
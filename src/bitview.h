@@ -0,0 +1,64 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+
+/**
+ * Read-only view of a bit string held in memory owned by someone else
+ * (a NumPy array, a bytes object, ...).
+ *
+ * Bits are either unpacked, one item of `itemsize` bytes per bit where any
+ * non-zero item is a 1, or packed eight to a byte with the most significant
+ * bit first, which is the layout produced by `numpy.packbits`.
+ */
+struct BitView {
+    /** First byte of the first item */
+    const uint8_t *data = nullptr;
+
+    /** Number of bits */
+    size_t size = 0;
+
+    /** Size in bytes of one item (unpacked views only) */
+    size_t itemsize = 1;
+
+    /** Distance in bytes between consecutive items (or bytes, if packed) */
+    ptrdiff_t stride = 1;
+
+    /** Whether the bits are packed eight to a byte */
+    bool packed = false;
+
+    bool operator[](size_t i) const {
+        if (packed) {
+            return (data[ptrdiff_t(i >> 3) * stride] >> (7 - (i & 7))) & 1;
+        }
+        const uint8_t *p = data + ptrdiff_t(i) * stride;
+        if (itemsize == 1) {
+            return *p != 0;
+        }
+        for (size_t k = 0; k < itemsize; k++) {
+            if (p[k]) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /**
+     * Write bits [pos, pos + count) to out[0], ..., out[count - 1], or to
+     * out[0], out[-1], ..., out[-(count - 1)] if `reversed` is set.
+     */
+    template <class T>
+    void copy_to(size_t pos, size_t count, T *out, bool reversed = false) const {
+        ptrdiff_t step = reversed ? -1 : 1;
+        if (!packed && itemsize == 1 && stride == 1) {
+            const uint8_t *p = data + pos;
+            for (size_t i = 0; i < count; i++, out += step) {
+                *out = p[i] != 0;
+            }
+            return;
+        }
+        for (size_t i = 0; i < count; i++, out += step) {
+            *out = (*this)[pos + i];
+        }
+    }
+};
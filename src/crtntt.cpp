@@ -0,0 +1,259 @@
+#include "crtntt.h"
+#include "parallel.h"
+
+#include <algorithm>
+#include <stdexcept>
+
+/** Shortest piece of a row worth handing to another thread */
+static const uint64_t MIN_CHUNK = 1 << 14;
+
+static unsigned log2_exact(uint64_t n) {
+    unsigned l = 0;
+    while ((uint64_t(1) << l) < n) {
+        l++;
+    }
+    return l;
+}
+
+/** Number of pieces (a power of 2, at most `want`) to split n elements into */
+static uint64_t pieces(uint64_t n, uint64_t want) {
+    uint64_t p = 1;
+    while (2 * p <= want && n / (2 * p) >= MIN_CHUNK) {
+        p *= 2;
+    }
+    return p;
+}
+
+/** log2 of the length of the row transforms */
+static unsigned row_bits(unsigned l, unsigned row_l) {
+    if (l < 1 || l > 40) {
+        throw std::runtime_error("Must have 1 <= l <= 40.");
+    }
+    // Rows and the transform across them must both fit the primes
+    unsigned bits = std::min(l + 1, row_l);
+    if (row_l < 2 || row_l > mod32_b::MAX_L || l + 1 - bits > mod32_b::MAX_L) {
+        throw std::invalid_argument("Row length out of range.");
+    }
+    return bits;
+}
+
+CrtNTT::CrtNTT(unsigned l, unsigned row_l, unsigned primes)
+: L(uint64_t(1) << l), B(uint64_t(1) << (row_bits(l, row_l) - 1)), T(L / B),
+  primes(primes ? primes : (L < mod32::P ? 1 : 2)), rows1(row_bits(l, row_l)) {
+    if (this->primes > 2) {
+        throw std::invalid_argument("At most 2 primes are supported.");
+    }
+    tw1 = twiddles<mod32>();
+    if (this->primes == 2) {
+        rows2 = std::make_unique<BasicNTT<mod32_b>>(row_bits(l, row_l));
+        tw2 = twiddles<mod32_b>();
+    }
+
+    unsigned t = log2_exact(T);
+    revrows.resize(T);
+    for (uint64_t i = 0; i < T; i++) {
+        uint32_t r = 0;
+        for (unsigned b = 0; b < t; b++) {
+            r |= ((i >> b) & 1) << (t - 1 - b);
+        }
+        revrows[i] = r;
+    }
+
+    P1inv = mod32_b::to_mont(mod32_b::pow(mod32::P % mod32_b::P, mod32_b::P - 2));
+}
+
+template <class M>
+CrtNTT::Twiddles CrtNTT::twiddles() const {
+    Twiddles tw;
+    tw.W.resize(T);
+    tw.Winv.resize(T);
+    // r is a primitive T'th root of unity
+    uint32_t r = M::pow(M::G, (M::P - 1) / T), rinv = M::pow(r, M::P - 2);
+    for (uint64_t k = 1; k < T; k <<= 1) {
+        uint32_t w = M::pow(r, T / (2 * k)), winv = M::pow(rinv, T / (2 * k));
+        uint32_t t = 1, tinv = 1;
+        for (uint64_t j = 0; j < k; j++) {
+            tw.W[k + j] = M::to_mont(t);
+            tw.Winv[k + j] = M::to_mont(tinv);
+            t = M::mul(t, w);
+            tinv = M::mul(tinv, winv);
+        }
+    }
+    tw.Tinv = M::to_mont(M::pow(T % M::P, M::P - 2));
+    return tw;
+}
+
+uint64_t CrtNTT::nbytes() const {
+    uint64_t n = rows1.nbytes() + (rows2 ? rows2->nbytes() : 0);
+    return n + sizeof(uint32_t) * (tw1.W.size() + tw1.Winv.size() + tw2.W.size() + tw2.Winv.size() + revrows.size());
+}
+
+template <class M>
+void CrtNTT::across(uint32_t *y, const std::vector<uint32_t> &W, bool rev) const {
+    // Iterative decimation in time: slot i holds element rev(i) of the
+    // input, and ends up holding element i of the transform
+    if (T == 1) {
+        return;
+    }
+    const NttKernels &kernels = ntt_kernels<M>();
+    uint64_t row = 2 * B, pairs = T / 2;
+    uint64_t n = pieces(row, (thread_budget() + pairs - 1) / pairs), piece = row / n;
+    for (uint64_t k = 1; k < T; k <<= 1) {
+        parallel_for(pairs * n, [&](size_t task) {
+            uint64_t pair = task / n, first = task % n * piece;
+            uint64_t i = pair / k * 2 * k + pair % k;
+            uint64_t u = rev ? revrows[i] : i, v = rev ? revrows[i + k] : i + k;
+            kernels.butterfly_const(y + u * row + first, y + v * row + first, W[k + pair % k], piece);
+        });
+    }
+}
+
+template <class M>
+std::vector<uint32_t> CrtNTT::forward(const BasicNTT<M> &rows, const Twiddles &tw, const std::vector<uint64_t> &x) const {
+    uint64_t row = 2 * B;
+    std::vector<uint32_t> y(T * row);
+    // Row r goes to slot rev(r), ready for the transform across rows
+    parallel_for(T, [&](size_t r) {
+        std::vector<uint32_t> padded(row, 0);
+        for (uint64_t t = 0; t < B; t++) {
+            padded[t] = x[r * B + t] % M::P;
+        }
+        rows.transform(padded.data(), y.data() + revrows[r] * row, false);
+    });
+    across<M>(y.data(), tw.W, false);
+    return y;
+}
+
+template <class M>
+std::vector<uint32_t> CrtNTT::inverse(const BasicNTT<M> &rows, const Twiddles &tw, std::vector<uint32_t> &y,
+                                      const std::vector<bool> &kept) const {
+    uint64_t row = 2 * B;
+    // Row k of the product ends up in slot rev(k)
+    across<M>(y.data(), tw.Winv, true);
+    parallel_for(T, [&](size_t k) {
+        if (!kept[k] && !kept[(k + 1) % T]) {
+            return;
+        }
+        uint32_t *slot = y.data() + revrows[k] * row;
+        std::vector<uint32_t> linear(row);
+        rows.transform(slot, linear.data(), true);
+        std::copy(linear.begin(), linear.end(), slot);
+    });
+
+    // Row k is the linear product of length 2B starting at element kB,
+    // the products wrapping around past element L
+    std::vector<uint32_t> c(L);
+    parallel_for(T, [&](size_t k) {
+        if (!kept[k]) {
+            return;
+        }
+        const uint32_t *lo = y.data() + revrows[k] * row;
+        const uint32_t *hi = y.data() + revrows[(k + T - 1) % T] * row + B;
+        uint32_t *out = c.data() + k * B;
+        for (uint64_t t = 0; t < B; t++) {
+            out[t] = M::mul_mont(M::add(lo[t], hi[t]), tw.Tinv);
+        }
+    });
+    return c;
+}
+
+std::vector<bool> CrtNTT::kept_rows(const CoefficientRanges *keep) const {
+    std::vector<bool> kept(T, keep == nullptr);
+    if (keep) {
+        for (const auto &r : ranges_mod(*keep, L)) {
+            for (uint64_t k = r.first / B; k * B < r.second; k++) {
+                kept[k] = true;
+            }
+        }
+    }
+    return kept;
+}
+
+template <class M>
+void CrtNTT::mul_rows(std::vector<uint32_t> &a, const std::vector<uint32_t> &b) const {
+    const NttKernels &kernels = ntt_kernels<M>();
+    uint64_t n = pieces(a.size(), thread_budget()), piece = a.size() / n;
+    parallel_for(n, [&](size_t p) {
+        kernels.mul_vec(a.data() + p * piece, a.data() + p * piece, b.data() + p * piece, piece);
+    });
+}
+
+std::vector<uint64_t> CrtNTT::combine(const std::vector<uint32_t> &r1, const std::vector<uint32_t> &r2,
+                                      const std::vector<bool> &kept) const {
+    std::vector<uint64_t> c(L);
+    parallel_for(T, [&](size_t k) {
+        if (!kept[k]) {
+            return;
+        }
+        for (uint64_t i = k * B; i < (k + 1) * B; i++) {
+            if (primes == 1) {
+                c[i] = r1[i];
+            } else {
+                // c = r1 + P1 h, with h = (r2 - r1) / P1 mod P2
+                uint32_t h = mod32_b::mul_mont(mod32_b::sub(r2[i], r1[i]), P1inv);
+                c[i] = r1[i] + (uint64_t)mod32::P * h;
+            }
+        }
+    });
+    return c;
+}
+
+CrtNTT::spectrum_type CrtNTT::ntt(const std::vector<uint64_t> &x, bool inverse) const {
+    if (inverse) {
+        throw std::invalid_argument("CrtNTT only computes forward transforms.");
+    }
+    if (x.size() != L) {
+        throw std::invalid_argument("Input length does not match the transform length.");
+    }
+    spectrum_type y;
+    y.push_back(forward(rows1, tw1, x));
+    if (primes == 2) {
+        y.push_back(forward(*rows2, tw2, x));
+    }
+    return y;
+}
+
+std::vector<uint64_t> CrtNTT::conv_rows(const std::vector<uint64_t> &a, const spectrum_type &b_hat,
+                                        const std::vector<bool> &kept) const {
+    if (a.size() != L || b_hat.size() != primes) {
+        throw std::invalid_argument("Input length does not match the transform length.");
+    }
+    // One prime at a time, to hold a single transform
+    std::vector<uint32_t> y = forward(rows1, tw1, a);
+    mul_rows<mod32>(y, b_hat[0]);
+    std::vector<uint32_t> r1 = inverse(rows1, tw1, y, kept), r2;
+    if (primes == 2) {
+        y = forward(*rows2, tw2, a);
+        mul_rows<mod32_b>(y, b_hat[1]);
+        r2 = inverse(*rows2, tw2, y, kept);
+    }
+    return combine(r1, r2, kept);
+}
+
+std::vector<uint64_t> CrtNTT::conv_transformed(const std::vector<uint64_t> &a, const spectrum_type &b_hat) const {
+    return conv_rows(a, b_hat, kept_rows(nullptr));
+}
+
+std::vector<uint64_t> CrtNTT::conv_transformed(const std::vector<uint64_t> &a, const spectrum_type &b_hat,
+                                               const CoefficientRanges &keep) const {
+    return conv_rows(a, b_hat, kept_rows(&keep));
+}
+
+std::vector<uint64_t> CrtNTT::conv(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b) const {
+    if (a.size() != L || b.size() != L) {
+        throw std::invalid_argument("Input length does not match the transform length.");
+    }
+    std::vector<uint32_t> r1, r2;
+    std::vector<bool> kept = kept_rows(nullptr);
+    {
+        std::vector<uint32_t> ya = forward(rows1, tw1, a);
+        mul_rows<mod32>(ya, forward(rows1, tw1, b));
+        r1 = inverse(rows1, tw1, ya, kept);
+    }
+    if (primes == 2) {
+        std::vector<uint32_t> ya = forward(*rows2, tw2, a);
+        mul_rows<mod32_b>(ya, forward(*rows2, tw2, b));
+        r2 = inverse(*rows2, tw2, ya, kept);
+    }
+    return combine(r1, r2, kept);
+}
@@ -0,0 +1,122 @@
+#pragma once
+
+#include "modarith.h"
+#include "ntt.h"
+
+#include <cstdint>
+#include <memory>
+#include <vector>
+
+/**
+ * Cyclic convolutions of length L = 2^l, for l up to 40, from 32-bit
+ * transforms recombined by the Chinese remainder theorem: a faster
+ * replacement for BigNTT beyond the 2^30 reach of NTT.
+ *
+ * No 32-bit prime has roots of unity of order 2^31, so a sequence is cut
+ * into T = L / B rows of B elements, and transformed in two dimensions:
+ * along each row with a linear transform of length 2B (the row zero
+ * padded), and across the rows with a cyclic transform of length T. Both
+ * stay within the reach of the primes P1 = 3 * 2^30 + 1 and
+ * P2 = 13 * 2^28 + 1.
+ *
+ * Results are exact as long as the coefficients of the convolution are
+ * below the modulus: P1 when L < P1, where a single prime is used, and
+ * P1 * P2 (about 2^63) otherwise. Convolutions of bits always are.
+ */
+class CrtNTT {
+  private:
+    /** Sequence length, row length and number of rows */
+    uint64_t L, B, T;
+
+    /** Number of primes, 1 or 2 */
+    unsigned primes;
+
+    /** Transforms along the rows, of length 2B, mod P1 and P2 */
+    BasicNTT<mod32> rows1;
+    std::unique_ptr<BasicNTT<mod32_b>> rows2;
+
+    /**
+     * Twiddle factors across the rows, stage by stage as in NTT, for each
+     * prime, and the inverse of T (all in Montgomery form)
+     */
+    struct Twiddles {
+        std::vector<uint32_t> W, Winv;
+        uint32_t Tinv;
+    } tw1, tw2;
+
+    /** Bit reversal of the row indices */
+    std::vector<uint32_t> revrows;
+
+    /** P1^{-1} mod P2 (Montgomery form) */
+    uint32_t P1inv;
+
+    template <class M>
+    Twiddles twiddles() const;
+
+    /** Transform across the rows of y, where row i is stored in slot (rev ? revrows[i] : i) */
+    template <class M>
+    void across(uint32_t *y, const std::vector<uint32_t> &W, bool rev) const;
+
+    template <class M>
+    std::vector<uint32_t> forward(const BasicNTT<M> &rows, const Twiddles &tw, const std::vector<uint64_t> &x) const;
+
+    /** Inverse transform, computing the rows marked in `kept` (see kept_rows) */
+    template <class M>
+    std::vector<uint32_t> inverse(const BasicNTT<M> &rows, const Twiddles &tw, std::vector<uint32_t> &y,
+                                  const std::vector<bool> &kept) const;
+
+    /** Which rows of B coefficients hold one in `keep` (all if null) */
+    std::vector<bool> kept_rows(const CoefficientRanges *keep) const;
+
+    template <class M>
+    void mul_rows(std::vector<uint32_t> &a, const std::vector<uint32_t> &b) const;
+
+    /** The convolution from its residues mod P1 and P2, in the rows kept */
+    std::vector<uint64_t> combine(const std::vector<uint32_t> &r1, const std::vector<uint32_t> &r2,
+                                  const std::vector<bool> &kept) const;
+
+    /** Cyclic convolution of a and b given the transforms of b, in the rows kept */
+    std::vector<uint64_t> conv_rows(const std::vector<uint64_t> &a, const std::vector<std::vector<uint32_t>> &b_hat,
+                                    const std::vector<bool> &kept) const;
+
+  public:
+    typedef uint64_t value_type;
+
+    /** Forward transforms, one per prime, as taken by conv_transformed */
+    typedef std::vector<std::vector<uint32_t>> spectrum_type;
+
+    /**
+     * Convolutions of length 2^l, with rows of at most 2^(row_l - 1)
+     * elements (whose transforms precompute 12 * 2^row_l bytes per prime),
+     * using `primes` primes (0: as needed for convolutions of bits)
+     */
+    explicit CrtNTT(unsigned l, unsigned row_l = 22, unsigned primes = 0);
+
+    /** Sequence length */
+    uint64_t size() const { return L; }
+
+    /** Memory held by the precomputed tables, in bytes */
+    uint64_t nbytes() const;
+
+    /** Number of primes in use */
+    unsigned num_primes() const { return primes; }
+
+    /**
+     * Forward transform of x (L elements), in the two-dimensional layout
+     * taken by conv_transformed. Inverse transforms are only available
+     * through the convolutions.
+     */
+    spectrum_type ntt(const std::vector<uint64_t> &x, bool inverse) const;
+
+    std::vector<uint64_t> conv(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b) const;
+
+    /** Cyclic convolution of a and b, given the forward transform of b */
+    std::vector<uint64_t> conv_transformed(const std::vector<uint64_t> &a, const spectrum_type &b_hat) const;
+
+    /**
+     * As conv_transformed, computing only the coefficients in `keep`: the
+     * inverse transforms skip the rows that hold none of them
+     */
+    std::vector<uint64_t> conv_transformed(const std::vector<uint64_t> &a, const spectrum_type &b_hat,
+                                           const CoefficientRanges &keep) const;
+};
@@ -0,0 +1,364 @@
+#include "extractors.h"
+
+#include "bigntt.h"
+#include "crtntt.h"
+#include "gf2x.h"
+#include "ntt.h"
+#include "parallel.h"
+
+#include <algorithm>
+
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+static void check_length(const BitView &v, uint64_t expected, const char *what) {
+    if (v.size != expected) {
+        throw std::invalid_argument(
+            std::string(what) + " has " + std::to_string(v.size)
+            + " bits, expected " + std::to_string(expected) + ".");
+    }
+}
+
+uint64_t conv_seed_length(ConvKind kind, uint64_t n, uint64_t m) {
+    switch (kind) {
+        case ConvKind::toeplitz:
+            return n + m - 1;
+        case ConvKind::circulant:
+            return n + 1;
+        default:
+            return n;
+    }
+}
+
+template <class Engine>
+class TransformedSeedExtractor : public SeededExtractor {
+  private:
+    typedef typename Engine::value_type T;
+
+    Engine &ntt;
+
+    /** Cycle length of the circulant/dodis shifts */
+    uint64_t cycle;
+
+    /** Forward transform of the laid out seed */
+    typename Engine::spectrum_type y_hat;
+
+  public:
+    TransformedSeedExtractor(Engine &ntt, ConvKind kind, const BitView &y, uint64_t n, uint64_t m)
+    : SeededExtractor(kind, n, m), ntt(ntt), cycle(kind == ConvKind::circulant ? n + 1 : n) {
+        check_length(y, seed_length(), "Seed");
+        uint64_t L = ntt.size();
+        uint64_t required = kind == ConvKind::toeplitz ? n + m - 1 : 2 * cycle - 1;
+        if (m > n || L < required) {
+            throw std::invalid_argument("Transform too short for the extractor parameters.");
+        }
+
+        std::vector<T> b(L, 0);
+        if (kind == ConvKind::toeplitz) {
+            // b = y[:m] | 0...0 | y[m:]
+            y.copy_to(0, m, b.data());
+            y.copy_to(m, n - 1, b.data() + (L - (n - 1)));
+        } else {
+            // b = y | 0...0
+            y.copy_to(0, cycle, b.data());
+        }
+        y_hat = ntt.ntt(b, false);
+    }
+
+    std::vector<uint8_t> extract(const BitView &x) const override {
+        check_length(x, n, "Input");
+        uint64_t L = ntt.size();
+
+        std::vector<T> a(L, 0);
+        if (kind == ConvKind::toeplitz) {
+            // a = x | 0...0
+            x.copy_to(0, n, a.data());
+        } else if (n > 0) {
+            // a = x[0] | x[cycle-1] ... x[1] | 0...0, where x[n] = 0 for
+            // the circulant extractor
+            a[0] = x[0];
+            x.copy_to(1, n - 1, a.data() + (cycle - 1), true);
+        }
+
+        // Only the output coefficients are computed
+        CoefficientRanges keep = {{0, m}};
+        if (kind != ConvKind::toeplitz) {
+            keep.push_back({cycle, cycle + m});
+        }
+        std::vector<T> c = ntt.conv_transformed(a, y_hat, keep);
+        std::vector<uint8_t> out(m);
+        if (kind == ConvKind::toeplitz) {
+            for (uint64_t i = 0; i < m; i++) {
+                out[i] = c[i] & 1;
+            }
+        } else {
+            for (uint64_t i = 0; i < m; i++) {
+                out[i] = (c[i] ^ c[i + cycle]) & 1;
+            }
+        }
+        return out;
+    }
+};
+
+/**
+ * Set bits at, at + 1, ... (or at, at - 1, ... if `reversed` is set) of the
+ * packed polynomial w to bits [pos, pos + count) of v
+ */
+static void pack_words(const BitView &v, size_t pos, size_t count, uint64_t *w, size_t at, bool reversed = false) {
+    for (size_t i = 0; i < count; i++) {
+        if (v[pos + i]) {
+            size_t k = reversed ? at - i : at + i;
+            w[k >> 6] |= uint64_t(1) << (k & 63);
+        }
+    }
+}
+
+static bool coefficient(const std::vector<uint64_t> &w, uint64_t i) {
+    return (w[i >> 6] >> (i & 63)) & 1;
+}
+
+/**
+ * A convolution extractor computed from a product of packed polynomials
+ * over GF(2), the output bits being coefficients of the product of the
+ * input with the laid out seed.
+ */
+class PackedSeedExtractor : public SeededExtractor {
+  private:
+    const GF2Conv &engine;
+
+    /** Cycle length of the circulant/dodis shifts */
+    uint64_t cycle;
+
+    /**
+     * The seed as a polynomial: y[m], ..., y[n + m - 2], y[0], ..., y[m - 1]
+     * (toeplitz), whose product with x holds output bit i at degree
+     * n - 1 + i, or y[0], ..., y[cycle - 1] (circulant, dodis)
+     */
+    std::vector<uint64_t> seed;
+
+  public:
+    PackedSeedExtractor(const GF2Conv &engine, ConvKind kind, const BitView &y, uint64_t n, uint64_t m)
+    : SeededExtractor(kind, n, m), engine(engine), cycle(kind == ConvKind::circulant ? n + 1 : n) {
+        check_length(y, seed_length(), "Seed");
+        uint64_t required = kind == ConvKind::toeplitz ? n + m - 1 : 2 * cycle - 1;
+        if (m > n || engine.size() < required) {
+            throw std::invalid_argument("Transform too short for the extractor parameters.");
+        }
+        seed.assign((y.size + 63) / 64, 0);
+        if (kind == ConvKind::toeplitz && n > 0) {
+            pack_words(y, m, n - 1, seed.data(), 0);
+            pack_words(y, 0, m, seed.data(), n - 1);
+        } else if (kind != ConvKind::toeplitz) {
+            pack_words(y, 0, cycle, seed.data(), 0);
+        }
+    }
+
+    std::vector<uint8_t> extract(const BitView &x) const override {
+        check_length(x, n, "Input");
+        std::vector<uint8_t> out(m);
+        if (kind == ConvKind::toeplitz) {
+            std::vector<uint64_t> a((n + 63) / 64, 0);
+            pack_words(x, 0, n, a.data(), 0);
+            std::vector<uint64_t> c = engine.mul(a, seed);
+            for (uint64_t i = 0; i < m; i++) {
+                out[i] = coefficient(c, n - 1 + i);
+            }
+        } else {
+            // x[n - 1], ..., x[0] at degrees cycle - n, ..., cycle - 1:
+            // output bit i is coefficient i - 1 of the product mod
+            // x^cycle - 1
+            std::vector<uint64_t> a((cycle + 63) / 64, 0);
+            pack_words(x, 0, n, a.data(), cycle - 1, true);
+            std::vector<uint64_t> c = engine.mul(a, seed);
+            for (uint64_t i = 0; i < m; i++) {
+                uint64_t k = (i + cycle - 1) % cycle;
+                out[i] = coefficient(c, k) ^ coefficient(c, k + cycle);
+            }
+        }
+        return out;
+    }
+};
+
+/** The seeded extractor computed by each engine */
+template <class Engine>
+struct EngineExtractor {
+    typedef TransformedSeedExtractor<Engine> type;
+};
+
+template <>
+struct EngineExtractor<GF2Conv> {
+    typedef PackedSeedExtractor type;
+};
+
+template <class Engine>
+std::unique_ptr<SeededExtractor> make_seeded_extractor(Engine &ntt, ConvKind kind, const BitView &y, uint64_t n, uint64_t m) {
+    return std::make_unique<typename EngineExtractor<Engine>::type>(ntt, kind, y, n, m);
+}
+
+template <class Engine>
+std::vector<uint8_t> conv_extract(Engine &ntt, ConvKind kind, const BitView &x, const BitView &y, uint64_t n, uint64_t m) {
+    return typename EngineExtractor<Engine>::type(ntt, kind, y, n, m).extract(x);
+}
+
+template std::unique_ptr<SeededExtractor> make_seeded_extractor<NTT>(NTT &, ConvKind, const BitView &, uint64_t, uint64_t);
+template std::unique_ptr<SeededExtractor> make_seeded_extractor<BigNTT>(BigNTT &, ConvKind, const BitView &, uint64_t, uint64_t);
+template std::unique_ptr<SeededExtractor> make_seeded_extractor<CrtNTT>(CrtNTT &, ConvKind, const BitView &, uint64_t, uint64_t);
+template std::unique_ptr<SeededExtractor> make_seeded_extractor<GF2Conv>(GF2Conv &, ConvKind, const BitView &, uint64_t, uint64_t);
+template std::vector<uint8_t> conv_extract<NTT>(NTT &, ConvKind, const BitView &, const BitView &, uint64_t, uint64_t);
+template std::vector<uint8_t> conv_extract<BigNTT>(BigNTT &, ConvKind, const BitView &, const BitView &, uint64_t, uint64_t);
+template std::vector<uint8_t> conv_extract<CrtNTT>(CrtNTT &, ConvKind, const BitView &, const BitView &, uint64_t, uint64_t);
+template std::vector<uint8_t> conv_extract<GF2Conv>(GF2Conv &, ConvKind, const BitView &, const BitView &, uint64_t, uint64_t);
+
+/** Largest total size in bytes of the seed stretch transforms kept by a ToeplitzStream */
+static const uint64_t MAX_STRETCH_BYTES = uint64_t(1) << 28;
+
+/**
+ * Entry (i, j) of the Toeplitz matrix of the seed y, for d = i - j: row i
+ * is y[i], ..., y[0], y[n + m - 2], ..., y[m]
+ */
+static bool toeplitz_entry(const BitView &y, uint64_t n, uint64_t m, int64_t d) {
+    if (d >= 0) {
+        return d < (int64_t)m && y[d];
+    }
+    return d > -(int64_t)n && y[m + n - 1 + d];
+}
+
+/** The entries d0, ..., d0 + len - 1 of the Toeplitz matrix of y, zero padded to L */
+static std::vector<uint32_t> seed_stretch(const BitView &y, uint64_t n, uint64_t m, int64_t d0, uint64_t len,
+                                          uint64_t L) {
+    std::vector<uint32_t> stretch(L, 0);
+    for (uint64_t k = 0; k < len; k++) {
+        stretch[k] = toeplitz_entry(y, n, m, d0 + (int64_t)k);
+    }
+    return stretch;
+}
+
+/**
+ * Add to acc the product of columns [pos, pos + b) of the Toeplitz matrix
+ * of y with the b bits of x, one output tile of up to `tile` bits at a
+ * time, with ntt at least b + tile - 1 long. For full chunks (b = tile)
+ * and full tiles, the transform of the seed stretch is taken from
+ * stretch_hats if given (see ToeplitzStream).
+ */
+static void toeplitz_chunk(NTT &ntt, const BitView &y, uint64_t n, uint64_t m, const std::vector<uint32_t> &x,
+                           uint64_t pos, uint64_t tile, std::vector<uint8_t> &acc,
+                           const std::vector<std::vector<uint32_t>> *stretch_hats = nullptr) {
+    uint64_t L = ntt.size(), b = x.size();
+    std::vector<uint32_t> a(L, 0);
+    std::copy(x.begin(), x.end(), a.begin());
+    std::vector<uint32_t> x_hat = ntt.ntt(a, false);
+
+    // Output tile [i0, i0 + bo) gets sum_j x[pos + j] T(i - pos - j): the
+    // linear convolution of the chunk with the seed stretch starting at
+    // d = i0 - pos - (b - 1), read at b - 1, ..., b + bo - 2. Wrapped
+    // around products land below b - 1 as L >= b + bo - 1.
+    int64_t first = 1 - (int64_t)(n / tile * tile);
+    parallel_for((m + tile - 1) / tile, [&](size_t t) {
+        uint64_t i0 = t * tile, bo = std::min(tile, m - i0);
+        int64_t d0 = (int64_t)i0 - (int64_t)pos - (int64_t)(b - 1);
+        CoefficientRanges keep = {{b - 1, b + bo - 1}};
+        std::vector<uint32_t> c(L);
+        int64_t offset = d0 - first;
+        uint64_t k = offset >= 0 ? uint64_t(offset) / tile : 0;
+        if (stretch_hats && b == tile && bo == tile && offset >= 0 && uint64_t(offset) % tile == 0 &&
+            k < stretch_hats->size()) {
+            std::vector<uint32_t> prod(L);
+            ntt.mul_vec(prod.data(), x_hat.data(), (*stretch_hats)[k].data());
+            ntt.transform(prod.data(), c.data(), true, false, &keep);
+        } else {
+            c = ntt.conv_transformed(seed_stretch(y, n, m, d0, bo + b - 1, L), x_hat, keep);
+        }
+        for (uint64_t r = 0; r < bo; r++) {
+            acc[i0 + r] ^= c[r + b - 1] & 1;
+        }
+    });
+}
+
+ToeplitzStream::ToeplitzStream(NTT &ntt, const BitView &y, uint64_t n, uint64_t m, uint64_t chunk)
+: ntt(ntt), chunk(chunk), acc(m, 0), n(n), m(m) {
+    check_length(y, conv_seed_length(ConvKind::toeplitz, n, m), "Seed");
+    if (n == 0 || m > n || chunk == 0 || ntt.size() < 2 * chunk - 1) {
+        throw std::invalid_argument("Transform too short for the chunk size.");
+    }
+    seed_bits.assign((y.size + 7) / 8, 0);
+    for (size_t i = 0; i < y.size; i++) {
+        if (y[i]) {
+            seed_bits[i >> 3] |= 0x80 >> (i & 7);
+        }
+    }
+    seed.data = seed_bits.data();
+    seed.size = y.size;
+    seed.packed = true;
+    pending.reserve(std::min(chunk, n));
+
+    // Full chunk c and full tile t meet the stretch from d0 = (t - c)
+    // chunk - chunk + 1, the same from block to block: transform each once
+    uint64_t L = ntt.size(), stretches = m / chunk + n / chunk - 1;
+    if (m >= chunk && n >= chunk && stretches * L * sizeof(uint32_t) <= MAX_STRETCH_BYTES) {
+        int64_t first = 1 - (int64_t)(n / chunk * chunk);
+        stretch_hats.resize(stretches);
+        parallel_for(stretches, [&](size_t k) {
+            stretch_hats[k].resize(L);
+            std::vector<uint32_t> stretch = seed_stretch(seed, n, m, first + (int64_t)(k * chunk), 2 * chunk - 1, L);
+            ntt.transform(stretch.data(), stretch_hats[k].data(), false);
+        });
+    }
+}
+
+
+void ToeplitzStream::consume() {
+    toeplitz_chunk(ntt, seed, n, m, pending, pos, chunk, acc, &stretch_hats);
+    pos += pending.size();
+    pending.clear();
+}
+
+std::vector<uint8_t> toeplitz_extract_segmented(NTT &ntt, const BitView &x, const BitView &y, uint64_t n, uint64_t m,
+                                                uint64_t segment) {
+    check_length(x, n, "Input");
+    check_length(y, conv_seed_length(ConvKind::toeplitz, n, m), "Seed");
+    if (n == 0 || m > n || segment == 0 || ntt.size() < 2 * segment - 1) {
+        throw std::invalid_argument("Transform too short for the segment size.");
+    }
+    // Each worker sums the products of every workers'th segment into its
+    // own output bits
+    uint64_t segments = (n + segment - 1) / segment;
+    size_t workers = std::min<uint64_t>(segments, thread_budget());
+    std::vector<std::vector<uint8_t>> acc(workers, std::vector<uint8_t>(m, 0));
+    parallel_for(workers, [&](size_t w) {
+        std::vector<uint32_t> bits;
+        for (uint64_t s = w; s < segments; s += workers) {
+            uint64_t pos = s * segment;
+            bits.assign(std::min(segment, n - pos), 0);
+            x.copy_to(pos, bits.size(), bits.data());
+            toeplitz_chunk(ntt, y, n, m, bits, pos, segment, acc[w]);
+        }
+    });
+    for (size_t w = 1; w < workers; w++) {
+        for (uint64_t i = 0; i < m; i++) {
+            acc[0][i] ^= acc[w][i];
+        }
+    }
+    return acc[0];
+}
+
+std::vector<std::vector<uint8_t>> ToeplitzStream::update(const BitView &x) {
+    std::vector<std::vector<uint8_t>> out;
+    for (size_t i = 0; i < x.size;) {
+        // As many bits as the current chunk still takes, in one copy
+        uint64_t want = std::min(chunk, n - pos), held = pending.size();
+        uint64_t take = std::min<uint64_t>(want - held, x.size - i);
+        pending.resize(held + take);
+        x.copy_to(i, take, pending.data() + held);
+        i += take;
+        if (pending.size() == want) {
+            consume();
+            if (pos == n) {
+                out.push_back(acc);
+                std::fill(acc.begin(), acc.end(), 0);
+                pos = 0;
+            }
+        }
+    }
+    return out;
+}
@@ -0,0 +1,131 @@
+#pragma once
+
+#include "bitview.h"
+#include "ntt.h"
+
+#include <cstdint>
+#include <memory>
+#include <vector>
+
+/**
+ * The extractors computed from a single cyclic convolution.
+ *
+ * - toeplitz [For2024]: output bit i is the inner product mod 2 of the
+ *   n_1-bit input with row i of the Toeplitz matrix defined by the
+ *   (n_1 + m - 1)-bit seed.
+ * - circulant [For2024]: the n_1-bit input, right padded with a zero, and
+ *   an (n_1 + 1)-bit seed; output bit i is the inner product mod 2 of the
+ *   seed with the padded input cyclically shifted by i positions.
+ * - dodis [For2020]: as circulant, with an n-bit input and an n-bit seed.
+ */
+enum class ConvKind { toeplitz, circulant, dodis };
+
+/** Seed length of a convolution extractor with input length n and output length m */
+uint64_t conv_seed_length(ConvKind kind, uint64_t n, uint64_t m);
+
+/**
+ * A convolution extractor whose seed has been laid out and forward
+ * transformed once, so that each extraction needs one forward transform,
+ * one pointwise product and one inverse transform.
+ */
+class SeededExtractor {
+  public:
+    ConvKind kind;
+
+    /** Input length n_1 (toeplitz, circulant) or n (dodis), and output length */
+    uint64_t n, m;
+
+    SeededExtractor(ConvKind kind, uint64_t n, uint64_t m) : kind(kind), n(n), m(m) {}
+    virtual ~SeededExtractor() = default;
+
+    uint64_t seed_length() const { return conv_seed_length(kind, n, m); }
+
+    virtual std::vector<uint8_t> extract(const BitView &x) const = 0;
+};
+
+/**
+ * Prepare a seeded extractor. The transform `ntt` is referenced, not
+ * copied, and must be at least n_1 + m - 1 (toeplitz), 2 n_1 (circulant)
+ * or 2n - 1 (dodis) long. Engines are NTT, BigNTT, CrtNTT, or GF2Conv,
+ * which multiplies packed polynomials over GF(2) instead of transforming.
+ */
+template <class Engine>
+std::unique_ptr<SeededExtractor> make_seeded_extractor(Engine &ntt, ConvKind kind, const BitView &y, uint64_t n, uint64_t m);
+
+/** One-shot extraction, equivalent to make_seeded_extractor(...)->extract(x) */
+template <class Engine>
+std::vector<uint8_t> conv_extract(Engine &ntt, ConvKind kind, const BitView &x, const BitView &y, uint64_t n, uint64_t m);
+
+/**
+ * Toeplitz extraction [For2024] of a stream of n_1-bit blocks with a fixed
+ * (n_1 + m - 1)-bit seed.
+ *
+ * Input bits arrive in pieces of any length and are consumed `chunk` bits
+ * at a time. Each chunk is convolved with the matching stretch of the
+ * seed, one output tile of up to `chunk` bits at a time (overlap-save), and
+ * the result is added to the m output bits of its block. The transforms of
+ * the seed stretches are the same for every block, so they are computed
+ * once when they fit 256 MiB, leaving one forward transform per chunk and
+ * one (pruned) inverse transform per tile; otherwise each tile also
+ * transforms its stretch. Working memory is otherwise a few transforms of
+ * at least 2 chunk - 1 elements plus the packed seed and the output bits,
+ * whatever n_1. Every output bit depends on the whole block, so the output
+ * of a block is ready once its last bit arrives.
+ */
+class ToeplitzStream {
+  private:
+    NTT &ntt;
+    uint64_t chunk;
+
+    /** The seed, packed */
+    std::vector<uint8_t> seed_bits;
+    BitView seed;
+
+    /**
+     * Forward transforms of the seed stretches met by full chunks and full
+     * output tiles, the k-th starting at entry d = (k - n / chunk) chunk + 1
+     * of the matrix (see toeplitz_chunk in extractors.cpp); empty if they
+     * would take more than 256 MiB
+     */
+    std::vector<std::vector<uint32_t>> stretch_hats;
+
+    /** Bits of the current chunk not yet consumed */
+    std::vector<uint32_t> pending;
+
+    /** Position in the current block of the first pending bit */
+    uint64_t pos = 0;
+
+    /** Output bits of the current block, summed over its consumed chunks */
+    std::vector<uint8_t> acc;
+
+    /** Add the contribution of the pending chunk to the output */
+    void consume();
+
+  public:
+    /** Input length n_1 and output length */
+    uint64_t n, m;
+
+    /**
+     * The transform `ntt` is referenced, not copied, and must be at least
+     * 2 chunk - 1 long. The seed is copied.
+     */
+    ToeplitzStream(NTT &ntt, const BitView &y, uint64_t n, uint64_t m, uint64_t chunk);
+
+    /** Consume the bits of x, returning the output of each block completed by them */
+    std::vector<std::vector<uint8_t>> update(const BitView &x);
+
+    /** Number of bits of the current, incomplete block consumed so far */
+    uint64_t buffered() const { return pos + pending.size(); }
+};
+
+/**
+ * Toeplitz extraction [For2024] of an n_1-bit input cut into segments of
+ * `segment` bits, the product of each segment with its columns of the
+ * matrix computed as in ToeplitzStream and the products summed mod 2.
+ * Segments are spread over the threads, each summing into its own output
+ * bits, so working memory is a few transforms of at least 2 segment - 1
+ * elements and m bits per thread, whatever n_1. The input and the seed
+ * are read in place.
+ */
+std::vector<uint8_t> toeplitz_extract_segmented(NTT &ntt, const BitView &x, const BitView &y, uint64_t n, uint64_t m,
+                                                uint64_t segment);
@@ -0,0 +1,150 @@
+#include "gf2k.h"
+#include "irreducible_poly.h"
+
+#include <algorithm>
+#include <stdexcept>
+
+GF2k::GF2k(int k, const Gf2xKernels &kernels) : kernels(kernels), k(k), words((k + 63) / 64) {
+    if (k < 1 || k >= 64 * MAX_WORDS) {
+        throw std::runtime_error("Must have 1 <= k < 256.");
+    }
+    for (int c : minweight_primpoly_coeffs[k]) {
+        if (c < k) {
+            taps.push_back(c);
+        }
+    }
+    top_mask = k % 64 ? (uint64_t(1) << (k % 64)) - 1 : ~uint64_t(0);
+
+    if (k <= TABLE_MAX) {
+        // The powers of x run through every non-zero element
+        uint32_t order = (uint32_t(1) << k) - 1, a = 1;
+        log_table.assign(order + 1, 0);
+        exp_table.resize(2 * order);
+        for (uint32_t i = 0; i < order; i++) {
+            exp_table[i] = exp_table[i + order] = a;
+            log_table[a] = i;
+            a <<= 1;
+            if (a >> k) {
+                a ^= uint32_t(1) << k;
+                for (int t : taps) {
+                    a ^= uint32_t(1) << t;
+                }
+            }
+        }
+    }
+}
+
+uint64_t GF2k::reduce1(uint64_t lo, uint64_t hi) const {
+    // x^k = sum of x^t over the taps: fold the bits from x^k on down until
+    // none are left. The product has degree < 2k - 1, so they fit a word.
+    while (true) {
+        uint64_t h = k == 64 ? hi : (lo >> k) | (hi << (64 - k));
+        if (!h) {
+            return lo;
+        }
+        lo &= top_mask;
+        hi = 0;
+        for (int t : taps) {
+            lo ^= h << t;
+            if (t) {
+                hi ^= h >> (64 - t);
+            }
+        }
+    }
+}
+
+void GF2k::reduce(uint64_t *c, uint64_t *p) const {
+    int n = 2 * words, q = k / 64, r = k % 64;
+    uint64_t h[2 * MAX_WORDS];
+    while (true) {
+        bool any = false;
+        for (int i = 0; i < n; i++) {
+            uint64_t w = i + q < n ? p[i + q] >> r : 0;
+            if (r && i + q + 1 < n) {
+                w |= p[i + q + 1] << (64 - r);
+            }
+            h[i] = w;
+            any |= w != 0;
+        }
+        if (!any) {
+            break;
+        }
+        p[q] &= (uint64_t(1) << r) - 1;
+        std::fill(p + q + 1, p + n, 0);
+        for (int t : taps) {
+            int tq = t / 64, tr = t % 64;
+            for (int i = 0; i + tq < n; i++) {
+                p[i + tq] ^= h[i] << tr;
+                if (tr && i + tq + 1 < n) {
+                    p[i + tq + 1] ^= h[i] >> (64 - tr);
+                }
+            }
+        }
+    }
+    std::copy(p, p + words, c);
+}
+
+void GF2k::mul(uint64_t *c, const uint64_t *a, const uint64_t *b) const {
+    if (words == 1) {
+        c[0] = mul(a[0], b[0]);
+        return;
+    }
+    uint64_t p[2 * MAX_WORDS];
+    kernels.mul_basecase(p, a, b, words);
+    reduce(c, p);
+}
+
+GF2k::element GF2k::horner(const uint64_t *coeffs, size_t n, const element &x) const {
+    element r{};
+    if (words == 1) {
+        uint64_t acc = 0;
+        for (size_t j = n; j-- > 0;) {
+            acc = mul(acc, x[0]) ^ coeffs[j];
+        }
+        r[0] = acc;
+        return r;
+    }
+    for (size_t j = n; j-- > 0;) {
+        mul(r.data(), r.data(), x.data());
+        for (int w = 0; w < words; w++) {
+            r[w] ^= coeffs[j * words + w];
+        }
+    }
+    return r;
+}
+
+void GF2k::horner_many(const uint64_t *coeffs, size_t n, const element *points, size_t count, element *values) const {
+    if (tabulated()) {
+        for (size_t i = 0; i < count; i++) {
+            values[i] = horner(coeffs, n, points[i]);
+        }
+        return;
+    }
+    size_t w = words;
+    uint64_t acc[BLOCK * MAX_WORDS], xs[BLOCK * MAX_WORDS], prod[2 * BLOCK * MAX_WORDS];
+    for (size_t first = 0; first < count; first += BLOCK) {
+        size_t b = std::min(BLOCK, count - first);
+        for (size_t i = 0; i < b; i++) {
+            std::copy(points[first + i].begin(), points[first + i].begin() + w, xs + i * w);
+        }
+        std::fill(acc, acc + b * w, 0);
+        for (size_t j = n; j-- > 0;) {
+            kernels.mul_pairs(prod, acc, xs, w, b);
+            const uint64_t *c = coeffs + j * w;
+            for (size_t i = 0; i < b; i++) {
+                if (w == 1) {
+                    acc[i] = reduce1(prod[2 * i], prod[2 * i + 1]) ^ c[0];
+                    continue;
+                }
+                reduce(acc + i * w, prod + 2 * w * i);
+                for (size_t t = 0; t < w; t++) {
+                    acc[i * w + t] ^= c[t];
+                }
+            }
+        }
+        for (size_t i = 0; i < b; i++) {
+            values[first + i] = element{};
+            std::copy(acc + i * w, acc + (i + 1) * w, values[first + i].begin());
+        }
+    }
+}
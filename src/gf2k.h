@@ -0,0 +1,84 @@
+#pragma once
+
+#include "gf2x.h"
+
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+/**
+ * Arithmetic in GF(2^k) for 1 <= k < 256 on packed words: bit i % 64 of
+ * word i / 64 is the coefficient of x^i, and an element takes
+ * ceil(k / 64) words. The field is the one of GF2Poly(k) (trevisan.h),
+ * defined by the primitive polynomial of least weight from
+ * irreducible_poly.h, so both give the same results.
+ *
+ * Fields of up to TABLE_MAX bits multiply through log and exp tables (x
+ * generates the multiplicative group), larger ones by a carry-less product
+ * (the base case of the Gf2xKernels, see gf2x.h) reduced by the few terms
+ * of the modulus.
+ */
+class GF2k {
+  public:
+    static const int MAX_WORDS = 4;
+    static const int TABLE_MAX = 16;
+
+    /** Points evaluated together by horner_many */
+    static constexpr size_t BLOCK = 16;
+
+    /** An element, its words past `words` zero */
+    typedef std::array<uint64_t, MAX_WORDS> element;
+
+  private:
+    /** Exponents of the terms of the modulus below x^k, highest first */
+    std::vector<int> taps;
+
+    /** Mask of the bits of the top word of an element */
+    uint64_t top_mask;
+
+    /** log_table[a] = log_x(a) for a != 0; exp_table[i] = x^i for i < 2 (2^k - 1) */
+    std::vector<uint32_t> log_table, exp_table;
+
+    const Gf2xKernels &kernels;
+
+    /** The product p of 2 words (of degree < 2k - 1) mod the modulus */
+    uint64_t reduce1(uint64_t lo, uint64_t hi) const;
+
+    /** The product p of 2 * words words (of degree < 2k - 1) mod the modulus, into c */
+    void reduce(uint64_t *c, uint64_t *p) const;
+
+  public:
+    int k, words;
+
+    explicit GF2k(int k, const Gf2xKernels &kernels = gf2x_kernels());
+
+    /** Whether products go through the log and exp tables */
+    bool tabulated() const { return !exp_table.empty(); }
+
+    /** Product of single word elements (k <= 64) */
+    uint64_t mul(uint64_t a, uint64_t b) const {
+        if (tabulated()) {
+            return a && b ? exp_table[log_table[a] + log_table[b]] : 0;
+        }
+        uint64_t p[2];
+        kernels.mul_basecase(p, &a, &b, 1);
+        return reduce1(p[0], p[1]);
+    }
+
+    /** c = a b, of `words` words each; c may be a or b */
+    void mul(uint64_t *c, const uint64_t *a, const uint64_t *b) const;
+
+    /**
+     * r = sum_j coeffs[j] x^j by Horner's method, for n coefficients of
+     * `words` words each, stored one after the other
+     */
+    element horner(const uint64_t *coeffs, size_t n, const element &x) const;
+
+    /**
+     * values[i] = horner(coeffs, n, points[i]) for i < count. Blocks of
+     * points are evaluated together, one pass over the coefficients per
+     * block, their products independent of each other.
+     */
+    void horner_many(const uint64_t *coeffs, size_t n, const element *points, size_t count, element *values) const;
+};
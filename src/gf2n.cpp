@@ -0,0 +1,322 @@
+#include "gf2n.h"
+#include "parallel.h"
+
+#include <algorithm>
+#include <stdexcept>
+#include <utility>
+
+/** Degree of the irreducible polynomials sieved out by find_trinomial */
+static const int SIEVE_DEGREE = 14;
+
+/** Steps of Rabin's test between two looks at the deadline */
+static const uint64_t DEADLINE_STEPS = 256;
+
+/** Results of the tests that can give up at a deadline */
+enum Verdict : char { NO, YES, GAVE_UP };
+
+static bool past(Deadline deadline, uint64_t step) {
+    return step % DEADLINE_STEPS == 0 && deadline != Deadline::max() && std::chrono::steady_clock::now() > deadline;
+}
+
+/** The 32 bits of w at the even bits of a word: the square of w */
+static uint64_t spread(uint32_t w) {
+    uint64_t x = w;
+    x = (x | (x << 16)) & 0x0000FFFF0000FFFFull;
+    x = (x | (x << 8)) & 0x00FF00FF00FF00FFull;
+    x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0Full;
+    x = (x | (x << 2)) & 0x3333333333333333ull;
+    x = (x | (x << 1)) & 0x5555555555555555ull;
+    return x;
+}
+
+GF2n::GF2n(uint64_t n, uint64_t s, const Gf2xKernels &kernels)
+: kernels(kernels), n(n), s(s), words((n + 63) / 64) {
+    if (s == 0 || s >= n) {
+        throw std::invalid_argument("Trinomials x^n + x^s + 1 must have 0 < s < n.");
+    }
+}
+
+std::vector<uint64_t> GF2n::element(const BitView &v, size_t pos, size_t count) const {
+    std::vector<uint64_t> q((std::max<uint64_t>(count, n) + 63) / 64, 0);
+    for (size_t i = 0; i < count; i++) {
+        if (v[pos + i]) {
+            q[i >> 6] |= uint64_t(1) << (i & 63);
+        }
+    }
+    reduce(q.data(), std::max<uint64_t>(count, n), q.data());
+    q.resize(words);
+    return q;
+}
+
+void GF2n::add(uint64_t *c, const uint64_t *a, const uint64_t *b) const {
+    for (size_t i = 0; i < words; i++) {
+        c[i] = a[i] ^ b[i];
+    }
+}
+
+void GF2n::reduce(uint64_t *q, uint64_t len, uint64_t *c) const {
+    size_t qw = (len + 63) / 64, hq = n / 64, hr = n % 64, sq = s / 64, sr = s % 64;
+    std::vector<uint64_t> h;
+    // x^n = x^s + 1: fold bits n, n + 1, ... down onto bits 0 and s until
+    // none are left, the degree dropping by n - s each time
+    while (len > n) {
+        uint64_t e = len - n;
+        size_t hw = (e + 63) / 64;
+        h.resize(hw);
+        for (size_t j = 0; j < hw; j++) {
+            uint64_t w = q[hq + j] >> hr;
+            if (hr && hq + j + 1 < qw) {
+                w |= q[hq + j + 1] << (64 - hr);
+            }
+            h[j] = w;
+        }
+        q[hq] &= (uint64_t(1) << hr) - 1;
+        std::fill(q + hq + 1, q + qw, 0);
+
+        for (size_t j = 0; j < hw; j++) {
+            q[j] ^= h[j];
+            q[sq + j] ^= h[j] << sr;
+            if (sr && sq + j + 1 < qw) {
+                q[sq + j + 1] ^= h[j] >> (64 - sr);
+            }
+        }
+        len = std::max(n, e + s);
+    }
+    if (c != q) {
+        std::copy(q, q + words, c);
+    }
+}
+
+void GF2n::mul(uint64_t *c, const uint64_t *a, const uint64_t *b) const {
+    std::vector<uint64_t> p(2 * words);
+    gf2x_mul(p.data(), a, words, b, words, kernels);
+    reduce(p.data(), 2 * n - 1, c);
+}
+
+void GF2n::sqr(uint64_t *c, const uint64_t *a) const {
+    std::vector<uint64_t> p(2 * words);
+    if (&kernels != &gf2x_scalar_kernels()) {
+        // A carry-less product of each word by itself spreads it faster
+        kernels.mul_pairs(p.data(), a, a, 1, words);
+    } else {
+        for (size_t i = 0; i < words; i++) {
+            p[2 * i] = spread(uint32_t(a[i]));
+            p[2 * i + 1] = spread(uint32_t(a[i] >> 32));
+        }
+    }
+    reduce(p.data(), 2 * n - 1, c);
+}
+
+/** Degree of the polynomial g != 0 of a single word */
+static int small_degree(uint64_t g) {
+    int d = 63;
+    while (!(g >> d)) {
+        d--;
+    }
+    return d;
+}
+
+/** g mod h for polynomials of a single word */
+static uint64_t small_mod(uint64_t g, uint64_t h) {
+    int dh = small_degree(h);
+    while (g && small_degree(g) >= dh) {
+        g ^= h << (small_degree(g) - dh);
+    }
+    return g;
+}
+
+static bool is_prime(uint64_t n) {
+    for (uint64_t p = 2; p * p <= n; p++) {
+        if (n % p == 0) {
+            return false;
+        }
+    }
+    return n > 1;
+}
+
+/**
+ * Whether Swan's theorem gives x^n + x^s + 1 an even number of
+ * irreducible factors, so that it is reducible
+ */
+static bool swan_reducible(uint64_t n, uint64_t s) {
+    if (n % 2 == 0 && s % 2 == 0) {
+        // The square of x^(n/2) + x^(s/2) + 1
+        return true;
+    }
+    if (n % 2 == 1 && s % 2 == 1) {
+        // x^n + x^(n-s) + 1, the reciprocal, has as many factors
+        s = n - s;
+    }
+    if (n % 2 == 0) {
+        return n != 2 * s && (n / 2 * s) % 4 <= 1;
+    }
+    bool pm3 = n % 8 == 3 || n % 8 == 5;
+    return (2 * n) % s == 0 ? !pm3 : pm3;
+}
+
+/** Degree of the polynomial of the first `words` words of a, or -1 if they are zero */
+static int64_t degree(const std::vector<uint64_t> &a, size_t words) {
+    for (size_t i = words; i-- > 0;) {
+        if (a[i]) {
+            return int64_t(64 * i) + small_degree(a[i]);
+        }
+    }
+    return -1;
+}
+
+/** Whether the packed polynomials a and b have no common factor but 1 */
+static Verdict coprime(std::vector<uint64_t> a, std::vector<uint64_t> b, Deadline deadline) {
+    // Euclid's algorithm, taking one shifted copy of b off a at a time
+    int64_t da = degree(a, a.size()), db = degree(b, b.size());
+    if (da < db) {
+        std::swap(a, b);
+        std::swap(da, db);
+    }
+    uint64_t step = 0;
+    while (db >= 0) {
+        while (da >= db) {
+            if (past(deadline, ++step)) {
+                return GAVE_UP;
+            }
+            uint64_t shift = da - db, q = shift / 64, r = shift % 64;
+            for (size_t j = 0; j <= size_t(db / 64); j++) {
+                a[j + q] ^= b[j] << r;
+                if (r && j + q + 1 < a.size()) {
+                    a[j + q + 1] ^= b[j] >> (64 - r);
+                }
+            }
+            da = degree(a, da / 64 + 1);
+        }
+        std::swap(a, b);
+        std::swap(da, db);
+    }
+    return da == 0 ? YES : NO;
+}
+
+/** Rabin's test of x^n + x^s + 1 */
+static Verdict rabin_irreducible(uint64_t n, uint64_t s, Deadline deadline) {
+    GF2n field(n, s);
+    std::vector<uint64_t> f(n / 64 + 1, 0), x(field.words, 0), a;
+    f[0] ^= 1;
+    f[s / 64] ^= uint64_t(1) << (s % 64);
+    f[n / 64] ^= uint64_t(1) << (n % 64);
+    x[0] = 2;
+    a = x;
+    for (uint64_t i = 1; i <= n; i++) {
+        if (past(deadline, i)) {
+            return GAVE_UP;
+        }
+        field.sqr(a.data(), a.data());
+        if (n % i == 0 && is_prime(n / i)) {
+            // The factors of degree dividing i are those of x^(2^i) - x
+            std::vector<uint64_t> d = a;
+            d[0] ^= 2;
+            Verdict v = coprime(d, f, deadline);
+            if (v != YES) {
+                return v;
+            }
+        }
+    }
+    return a == x ? YES : NO;
+}
+
+bool trinomial_is_irreducible(uint64_t n, uint64_t s) {
+    if (s == 0 || s >= n) {
+        throw std::invalid_argument("Trinomials x^n + x^s + 1 must have 0 < s < n.");
+    }
+    return !swan_reducible(n, s) && rabin_irreducible(n, s, Deadline::max()) == YES;
+}
+
+/** The irreducible polynomials of degree 2 to max_degree, by trial division */
+static std::vector<uint64_t> small_irreducibles(int max_degree) {
+    std::vector<uint64_t> found = {3};
+    for (uint64_t g = 5; g >> (max_degree + 1) == 0; g += 2) {
+        bool irreducible = true;
+        for (uint64_t h : found) {
+            if (2 * small_degree(h) > small_degree(g)) {
+                break;
+            }
+            if (!small_mod(g, h)) {
+                irreducible = false;
+                break;
+            }
+        }
+        if (irreducible) {
+            found.push_back(g);
+        }
+    }
+    // x + 1 never divides a trinomial
+    found.erase(found.begin());
+    return found;
+}
+
+/**
+ * Clear candidate[s] for the s < candidate.size() with x^n + x^s + 1 divisible by an
+ * irreducible polynomial of degree at most SIEVE_DEGREE (and n / 2)
+ */
+static void sieve_small_factors(uint64_t n, std::vector<bool> &candidate) {
+    uint64_t half = candidate.size() - 1;
+    std::vector<uint64_t> powers;
+    for (uint64_t g : small_irreducibles(int(std::min<uint64_t>(SIEVE_DEGREE, n / 2)))) {
+        // The powers x^r mod g, for r below the order of x
+        int d = small_degree(g);
+        powers.assign(1, 1);
+        for (uint64_t a = 2; a != 1;) {
+            powers.push_back(a);
+            a <<= 1;
+            if (a >> d) {
+                a ^= g;
+            }
+        }
+        // g divides x^n + x^s + 1 when x^s = x^n + 1 mod g, which holds for
+        // s in an arithmetic progression of difference the order
+        uint64_t order = powers.size(), target = powers[n % order] ^ 1;
+        auto r = std::find(powers.begin(), powers.end(), target);
+        if (r == powers.end()) {
+            continue;
+        }
+        for (uint64_t s = r - powers.begin(); s <= half; s += order) {
+            candidate[s] = false;
+        }
+    }
+}
+
+uint64_t find_trinomial(uint64_t n, uint64_t first, uint64_t last, Deadline deadline, uint64_t *searched) {
+    last = last ? std::min(last, n / 2) : n / 2;
+    first = std::max<uint64_t>(first, 1);
+    uint64_t settled;
+    if (!searched) {
+        searched = &settled;
+    }
+    *searched = std::max(first - 1, last);
+    std::vector<bool> candidate(last + 1, false);
+    for (uint64_t s = first; s <= last; s++) {
+        candidate[s] = !swan_reducible(n, s);
+    }
+    sieve_small_factors(n, candidate);
+    std::vector<uint64_t> order;
+    for (uint64_t s = 1; s <= last; s++) {
+        if (candidate[s]) {
+            order.push_back(s);
+        }
+    }
+
+    // As many candidates at a time as there are threads, lowest first
+    size_t batch = std::max(1u, thread_budget());
+    for (size_t i = 0; i < order.size(); i += batch) {
+        size_t b = std::min(batch, order.size() - i);
+        std::vector<Verdict> irreducible(b);
+        parallel_for(b, [&](size_t j) { irreducible[j] = rabin_irreducible(n, order[i + j], deadline); });
+        for (size_t j = 0; j < b; j++) {
+            if (irreducible[j] == YES) {
+                *searched = order[i + j];
+                return order[i + j];
+            }
+            if (irreducible[j] == GAVE_UP) {
+                *searched = order[i + j] - 1;
+                return 0;
+            }
+        }
+    }
+    return 0;
+}
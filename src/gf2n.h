@@ -0,0 +1,77 @@
+#pragma once
+
+#include "bitview.h"
+#include "gf2x.h"
+
+#include <chrono>
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+/**
+ * Arithmetic in GF(2^n) = GF(2)[x] / (x^n + x^s + 1), 0 < s < n, on packed
+ * words: bit i % 64 of word i / 64 is the coefficient of x^i, and an
+ * element takes ceil(n / 64) words. Products are packed GF(2)[x] products
+ * (gf2x.h) and squares only spread the bits apart; both are reduced by the
+ * trinomial with a few shifts and XORs per word.
+ *
+ * The trinomial is not checked to be irreducible (see
+ * trinomial_is_irreducible): if it is not, this is the ring of polynomials
+ * mod the trinomial.
+ */
+class GF2n {
+  private:
+    const Gf2xKernels &kernels;
+
+  public:
+    uint64_t n, s;
+    size_t words;
+
+    GF2n(uint64_t n, uint64_t s, const Gf2xKernels &kernels = gf2x_kernels());
+
+    /** The element of bits [pos, pos + count) of v, reduced if count > n */
+    std::vector<uint64_t> element(const BitView &v, size_t pos, size_t count) const;
+
+    /** c = a + b; c may be a or b */
+    void add(uint64_t *c, const uint64_t *a, const uint64_t *b) const;
+
+    /** c = a b; c may be a or b */
+    void mul(uint64_t *c, const uint64_t *a, const uint64_t *b) const;
+
+    /** c = a^2; c may be a */
+    void sqr(uint64_t *c, const uint64_t *a) const;
+
+    /**
+     * c = q mod the trinomial, for q of len >= n bits (ceil(len / 64)
+     * words); q is overwritten, and c may be q
+     */
+    void reduce(uint64_t *q, uint64_t len, uint64_t *c) const;
+};
+
+/**
+ * Whether x^n + x^s + 1 is irreducible over GF(2), for 0 < s < n. Swan's
+ * theorem first rules out the trinomials with an even number of factors;
+ * the others go through Rabin's test, x^(2^n) = x mod the trinomial and
+ * gcd(x^(2^(n/p)) - x, trinomial) = 1 for each prime p dividing n, the
+ * powers taken by n squarings in GF2n. Takes O(n^2 / 64) word operations.
+ */
+bool trinomial_is_irreducible(uint64_t n, uint64_t s);
+
+/** The time after which find_trinomial gives up */
+typedef std::chrono::steady_clock::time_point Deadline;
+
+/**
+ * The least s in [first, last] with x^n + x^s + 1 irreducible, or 0 if
+ * there is none. last = 0 stands for n / 2, which bounds the least s of
+ * every n, x^n + x^(n-s) + 1 being irreducible with x^n + x^s + 1. The
+ * candidates are sieved by Swan's theorem and by the irreducible
+ * polynomials of degree up to 14 before Rabin's test, which runs on
+ * several candidates at once on the threads of parallel.h.
+ *
+ * Past the deadline, Rabin's tests stop within a few hundred squarings and
+ * 0 is returned. *searched, if given, is set to the largest s up to which
+ * every candidate was settled: last (or the s found) unless the search
+ * gave up, first - 1 if it settled none.
+ */
+uint64_t find_trinomial(uint64_t n, uint64_t first = 1, uint64_t last = 0, Deadline deadline = Deadline::max(),
+                        uint64_t *searched = nullptr);
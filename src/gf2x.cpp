@@ -0,0 +1,223 @@
+#include "gf2x.h"
+#include "parallel.h"
+#include "simd_target.h"
+
+#include <algorithm>
+#include <stdexcept>
+#include <utility>
+
+/** Products of at most this many words are computed by schoolbook multiplication */
+static const size_t KARATSUBA_MIN = 16;
+
+/** Karatsuba products of at least this many words compute their three halves concurrently */
+static const size_t PARALLEL_MIN = 1 << 11;
+
+/** Scratch words needed by karatsuba() on n words */
+static size_t scratch_words(size_t n) {
+    return 4 * n + 256;
+}
+
+/**
+ * The product of a with every 64-bit word w is taken four bits of a at a
+ * time from a table of the 16 multiples of w of degree < 4.
+ */
+static void scalar_mul_basecase(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n) {
+    std::fill(c, c + 2 * n, 0);
+    for (size_t j = 0; j < n; j++) {
+        uint64_t w = b[j], u[16];
+        u[0] = 0;
+        for (int t = 1; t < 16; t++) {
+            u[t] = t & 1 ? u[t - 1] ^ w : u[t >> 1] << 1;
+        }
+        for (size_t i = 0; i < n; i++) {
+            uint64_t x = a[i], lo = u[x & 15], hi = 0;
+            for (int s = 4; s < 64; s += 4) {
+                uint64_t t = u[(x >> s) & 15];
+                lo ^= t << s;
+                hi ^= t >> (64 - s);
+            }
+            // The table drops the top bits of w shifted out by bits 1-3 of
+            // each window: add them back to the high word
+            for (int k = 1; k < 4; k++) {
+                uint64_t bits = (x & (0x1111111111111111ull << k)) >> k;
+                for (int e = 0; e < k; e++) {
+                    hi ^= (bits << e) & (0 - ((w >> (64 - k + e)) & 1));
+                }
+            }
+            c[i + j] ^= lo;
+            c[i + j + 1] ^= hi;
+        }
+    }
+}
+
+static void scalar_mul_pairs(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n, size_t count) {
+    for (size_t i = 0; i < count; i++) {
+        scalar_mul_basecase(c + 2 * n * i, a + n * i, b + n * i, n);
+    }
+}
+
+namespace scalar {
+    static const Gf2xKernels kernels = {"scalar", scalar_mul_basecase, scalar_mul_pairs};
+}
+
+#ifdef SIMD_X86
+
+SIMD_BEGIN_TARGET("pclmul")
+namespace pclmul {
+    /** Column by column, so that each output word is written once */
+    static void mul_basecase(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n) {
+        uint64_t carry = 0;
+        for (size_t k = 0; k + 1 < 2 * n; k++) {
+            __m128i acc = _mm_setzero_si128();
+            size_t first = k < n ? 0 : k - n + 1, last = k < n ? k : n - 1;
+            for (size_t i = first; i <= last; i++) {
+                __m128i p = _mm_clmulepi64_si128(_mm_cvtsi64_si128(a[i]), _mm_cvtsi64_si128(b[k - i]), 0);
+                acc = _mm_xor_si128(acc, p);
+            }
+            c[k] = carry ^ (uint64_t)_mm_cvtsi128_si64(acc);
+            carry = (uint64_t)_mm_cvtsi128_si64(_mm_unpackhi_epi64(acc, acc));
+        }
+        c[2 * n - 1] = carry;
+    }
+
+    static void mul_pairs(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n, size_t count) {
+        if (n == 1) {
+            for (size_t i = 0; i < count; i++) {
+                __m128i p = _mm_clmulepi64_si128(_mm_cvtsi64_si128(a[i]), _mm_cvtsi64_si128(b[i]), 0);
+                _mm_storeu_si128((__m128i *)(c + 2 * i), p);
+            }
+            return;
+        }
+        for (size_t i = 0; i < count; i++) {
+            mul_basecase(c + 2 * n * i, a + n * i, b + n * i, n);
+        }
+    }
+
+    static const Gf2xKernels kernels = {"pclmul", mul_basecase, mul_pairs};
+}
+SIMD_END_TARGET
+
+#endif // SIMD_X86
+
+const Gf2xKernels &gf2x_scalar_kernels() {
+    return scalar::kernels;
+}
+
+std::vector<const Gf2xKernels *> available_gf2x_kernels() {
+    std::vector<const Gf2xKernels *> available;
+#ifdef SIMD_X86
+    if (has_pclmul()) {
+        available.push_back(&pclmul::kernels);
+    }
+#endif
+    available.push_back(&scalar::kernels);
+    return available;
+}
+
+/** Chosen once, when the library is loaded */
+static const Gf2xKernels &best_kernels = *available_gf2x_kernels().front();
+
+const Gf2xKernels &gf2x_kernels() {
+    return best_kernels;
+}
+
+/**
+ * c[0, 2n) = a[0, n) * b[0, n), with scratch_words(n) words of scratch.
+ * With h = ceil(n / 2) and a = a0 + x^64h a1 (likewise b),
+ * a b = a0 b0 + x^64h ((a0 + a1)(b0 + b1) + a0 b0 + a1 b1) + x^128h a1 b1.
+ */
+static void karatsuba(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n, uint64_t *scratch,
+                      const Gf2xKernels &kernels) {
+    if (n <= KARATSUBA_MIN) {
+        kernels.mul_basecase(c, a, b, n);
+        return;
+    }
+    size_t h = (n + 1) / 2, n1 = n - h;
+    uint64_t *sa = scratch, *sb = scratch + h, *mid = scratch + 2 * h, *rest = scratch + 4 * h;
+    for (size_t i = 0; i < h; i++) {
+        sa[i] = a[i] ^ (i < n1 ? a[h + i] : 0);
+        sb[i] = b[i] ^ (i < n1 ? b[h + i] : 0);
+    }
+    if (n >= PARALLEL_MIN && thread_budget() > 1) {
+        std::vector<uint64_t> more(2 * scratch_words(h));
+        parallel_for(3, [&](size_t t) {
+            if (t == 0) {
+                karatsuba(c, a, b, h, rest, kernels);
+            } else if (t == 1) {
+                karatsuba(c + 2 * h, a + h, b + h, n1, more.data(), kernels);
+            } else {
+                karatsuba(mid, sa, sb, h, more.data() + scratch_words(h), kernels);
+            }
+        });
+    } else {
+        karatsuba(c, a, b, h, rest, kernels);
+        karatsuba(c + 2 * h, a + h, b + h, n1, rest, kernels);
+        karatsuba(mid, sa, sb, h, rest, kernels);
+    }
+    for (size_t i = 0; i < 2 * h; i++) {
+        mid[i] ^= c[i];
+    }
+    for (size_t i = 0; i < 2 * n1; i++) {
+        mid[i] ^= c[2 * h + i];
+    }
+    for (size_t i = 0; i < 2 * h; i++) {
+        c[h + i] ^= mid[i];
+    }
+}
+
+void gf2x_mul(uint64_t *c, const uint64_t *a, size_t na, const uint64_t *b, size_t nb,
+              const Gf2xKernels &kernels) {
+    if (na < nb) {
+        std::swap(a, b);
+        std::swap(na, nb);
+    }
+    std::fill(c, c + na + nb, 0);
+    if (nb == 0) {
+        return;
+    }
+    // Balanced nb x nb products, one per slice of a
+    std::vector<uint64_t> prod(2 * nb), scratch(scratch_words(nb));
+    for (size_t first = 0; first < na; first += nb) {
+        size_t len = std::min(nb, na - first);
+        if (len == nb) {
+            karatsuba(prod.data(), a + first, b, nb, scratch.data(), kernels);
+        } else {
+            gf2x_mul(prod.data(), b, nb, a + first, len, kernels);
+        }
+        for (size_t i = 0; i < nb + len; i++) {
+            c[first + i] ^= prod[i];
+        }
+    }
+}
+
+GF2Conv::GF2Conv(unsigned l, const Gf2xKernels &kernels) : L(uint64_t(1) << l), kernels(kernels) {
+    if (l < 1 || l > 40) {
+        throw std::runtime_error("Must have 1 <= l <= 40.");
+    }
+}
+
+std::vector<uint64_t> GF2Conv::mul(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b) const {
+    std::vector<uint64_t> c(a.size() + b.size());
+    gf2x_mul(c.data(), a.data(), a.size(), b.data(), b.size(), kernels);
+    return c;
+}
+
+std::vector<uint32_t> GF2Conv::conv(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) const {
+    if (a.size() != L || b.size() != L) {
+        throw std::invalid_argument("Input length does not match the transform length.");
+    }
+    size_t words = (L + 63) / 64;
+    std::vector<uint64_t> pa(words, 0), pb(words, 0);
+    for (uint64_t i = 0; i < L; i++) {
+        pa[i >> 6] |= uint64_t(a[i] & 1) << (i & 63);
+        pb[i >> 6] |= uint64_t(b[i] & 1) << (i & 63);
+    }
+    std::vector<uint64_t> c = mul(pa, pb);
+    // Coefficient i + L wraps around to i
+    std::vector<uint32_t> out(L);
+    for (uint64_t i = 0; i < L; i++) {
+        uint64_t j = i + L;
+        out[i] = ((c[i >> 6] >> (i & 63)) ^ (c[j >> 6] >> (j & 63))) & 1;
+    }
+    return out;
+}
@@ -0,0 +1,84 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+/*
+ * Polynomials over GF(2), packed 64 coefficients to a word: coefficient i
+ * is bit i % 64 of word i / 64.
+ */
+
+/**
+ * Kernels of the GF(2)[x] multiplication, one set per instruction set.
+ * Every set computes exactly the same products as the scalar one.
+ */
+struct Gf2xKernels {
+    /** Instruction set: "pclmul" or "scalar" */
+    const char *name;
+
+    /** c[0, 2n) = a[0, n) * b[0, n), by schoolbook multiplication */
+    void (*mul_basecase)(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n);
+
+    /**
+     * The `count` products of pairs of n-word operands stored one after the
+     * other: c[2ni, 2n(i + 1)) = a[ni, n(i + 1)) * b[ni, n(i + 1)). The
+     * products are independent, so that they overlap in the pipeline.
+     */
+    void (*mul_pairs)(uint64_t *c, const uint64_t *a, const uint64_t *b, size_t n, size_t count);
+};
+
+/** The scalar kernels, the reference for the carry-less multiply ones */
+const Gf2xKernels &gf2x_scalar_kernels();
+
+/** The kernels used by default: the best set supported by the CPU */
+const Gf2xKernels &gf2x_kernels();
+
+/** All kernel sets supported by the CPU (and the build), best first */
+std::vector<const Gf2xKernels *> available_gf2x_kernels();
+
+/**
+ * c[0, na + nb) = a[0, na) * b[0, nb), by Karatsuba multiplication down to
+ * the kernels' schoolbook base case. Large products are split across
+ * threads.
+ */
+void gf2x_mul(uint64_t *c, const uint64_t *a, size_t na, const uint64_t *b, size_t nb,
+              const Gf2xKernels &kernels = gf2x_kernels());
+
+/**
+ * Convolutions mod 2 of length L = 2^l on packed words, the engine of the
+ * convolution extractors that only need each coefficient mod 2: 32 times
+ * less memory than a transform of one bit per 32-bit element, and no
+ * transform tables. Its interface follows NTT (see extractors.h).
+ */
+class GF2Conv {
+  private:
+    uint64_t L;
+    const Gf2xKernels &kernels;
+
+  public:
+    explicit GF2Conv(unsigned l, const Gf2xKernels &kernels = gf2x_kernels());
+
+    /** Sequence length */
+    uint64_t size() const { return L; }
+
+    /** Memory held by precomputed tables, in bytes: none */
+    uint64_t nbytes() const { return 0; }
+
+    /** Instruction set of the kernels in use */
+    const char *kernel_name() const { return kernels.name; }
+
+    /** The kernels in use */
+    const Gf2xKernels &kernel_set() const { return kernels; }
+
+    /** Product of packed polynomials with na and nb words, na + nb words long */
+    std::vector<uint64_t> mul(const std::vector<uint64_t> &a, const std::vector<uint64_t> &b) const;
+
+    /** c[0, na + nb) = a[0, na) * b[0, nb); c must not overlap a or b */
+    void mul(uint64_t *c, const uint64_t *a, size_t na, const uint64_t *b, size_t nb) const {
+        gf2x_mul(c, a, na, b, nb, kernels);
+    }
+
+    /** Cyclic convolution mod 2 of a and b (L elements, one bit each) */
+    std::vector<uint32_t> conv(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) const;
+};
@@ -0,0 +1,223 @@
+#pragma once
+
+#include <cstdint>
+
+#if defined(_MSC_VER) && !defined(__clang__)
+#include <intrin.h>
+#endif
+
+/**
+ * High 64 bits of the 128-bit product a*b
+ */
+static inline uint64_t mulhi64(uint64_t a, uint64_t b) {
+#if defined(__SIZEOF_INT128__)
+    return (uint64_t)(((unsigned __int128)a * b) >> 64);
+#elif defined(_MSC_VER) && defined(_M_X64)
+    return __umulh(a, b);
+#else
+    uint64_t a_lo = (uint32_t)a, a_hi = a >> 32;
+    uint64_t b_lo = (uint32_t)b, b_hi = b >> 32;
+    uint64_t lo_lo = a_lo * b_lo, hi_lo = a_hi * b_lo;
+    uint64_t lo_hi = a_lo * b_hi, hi_hi = a_hi * b_hi;
+    uint64_t cross = (lo_lo >> 32) + (uint32_t)hi_lo + lo_hi;
+    return hi_hi + (hi_lo >> 32) + (cross >> 32);
+#endif
+}
+
+/**
+ * Inverse of an odd number modulo 2^64, by Newton iteration
+ */
+static constexpr uint64_t inverse_mod_2_64(uint64_t p) {
+    uint64_t x = p; // correct to 3 bits
+    for (int i = 0; i < 5; i++) {
+        x *= 2 - p * x;
+    }
+    return x;
+}
+
+/**
+ * 2^e mod p
+ */
+static constexpr uint64_t pow2_mod(unsigned e, uint64_t p) {
+    uint64_t r = 1;
+    for (unsigned i = 0; i < e; i++) {
+        r <<= 1;
+        if (r >= p) {
+            r -= p;
+        }
+    }
+    return r;
+}
+
+/**
+ * Arithmetic modulo a 32-bit NTT prime P = c * 2^MAX_L + 1 > 2^31, with
+ * primitive root G.
+ *
+ * Products use Montgomery reduction, with fixed operands (twiddle factors,
+ * 1/L) stored in Montgomery form so that multiplying by them takes a single
+ * reduction and no extra table. Since P is larger than 2^31, values are
+ * kept fully reduced: the lazy range [0, 2P) used with smaller primes does
+ * not fit in 32 bits.
+ */
+template <uint32_t Prime, uint32_t Root, unsigned MaxL>
+struct Mod32 {
+    static constexpr uint32_t P = Prime;
+
+    /** Primitive root mod P */
+    static constexpr uint32_t G = Root;
+
+    /** Largest l such that 2^l divides P - 1, the longest transform */
+    static constexpr unsigned MAX_L = MaxL;
+
+    /** Whether 3 divides (P - 1) / 2^MAX_L, allowing transforms of length 3 * 2^l */
+    static constexpr bool RADIX3 = ((P - 1) >> MaxL) % 3 == 0;
+
+    /** P^{-1} mod 2^32 */
+    static constexpr uint32_t PINV = (uint32_t)inverse_mod_2_64(P);
+
+    /** 2^64 mod P, converts out of the Montgomery domain */
+    static constexpr uint32_t R2 = (uint32_t)pow2_mod(64, P);
+
+    /** a + b mod P, for a, b < P */
+    static inline uint32_t add(uint32_t a, uint32_t b) {
+        uint64_t c = (uint64_t)a + b;
+        uint64_t d = c - P;
+        uint64_t e = d >> 32; // low bits all set if c < P, else 0
+        return (c & e) | (d & ~e);
+    }
+
+    /** a - b mod P, for a, b < P */
+    static inline uint32_t sub(uint32_t a, uint32_t b) {
+        uint64_t c = (uint64_t)a - b;
+        uint64_t d = c + P;
+        uint64_t e = c >> 32; // low bits all set if a < b, else 0
+        return (c & ~e) | (d & e);
+    }
+
+    /** Montgomery reduction: T * 2^{-32} mod P, for T < P * 2^32 */
+    static inline uint32_t redc(uint64_t T) {
+        uint32_t m = (uint32_t)T * PINV;
+        // T and m * P agree on the low 32 bits
+        int64_t t = (int64_t)(T >> 32) - (int64_t)(((uint64_t)m * P) >> 32);
+        return t + (P & (t >> 63));
+    }
+
+    /** Montgomery form a * 2^32 mod P, for a < P */
+    static inline uint32_t to_mont(uint32_t a) {
+        return redc((uint64_t)a * R2);
+    }
+
+    /** a * w mod P, for any a, given w_mont = to_mont(w) */
+    static inline uint32_t mul_mont(uint32_t a, uint32_t w_mont) {
+        return redc((uint64_t)a * w_mont);
+    }
+
+    /** a * b mod P, for a, b < P */
+    static inline uint32_t mul(uint32_t a, uint32_t b) {
+        return mul_mont(a, to_mont(b));
+    }
+
+    /** a^e mod P */
+    static uint32_t pow(uint32_t a, uint64_t e) {
+        // e is not secret, no need to make constant time
+        uint32_t r = 1;
+        while (e) {
+            if (e & 1) {
+                r = mul(r, a);
+            }
+            e >>= 1;
+            a = mul(a, a);
+        }
+        return r;
+    }
+};
+
+/** The prime of the 32-bit NTT, 3 * 2^30 + 1 */
+typedef Mod32<(3u << 30) + 1, 5, 30> mod32;
+
+/**
+ * A second prime, 13 * 2^28 + 1, for results that do not fit below the
+ * first one (see CrtNTT)
+ */
+typedef Mod32<(13u << 28) + 1, 3, 28> mod32_b;
+
+/**
+ * Arithmetic modulo the 64-bit NTT prime P = 9 * 2^42 + 1.
+ *
+ * Multiplications by a fixed operand w (twiddle factors, 1/L) use Shoup's
+ * method with the precomputed quotient w' = floor(w * 2^64 / P), general
+ * products Montgomery reduction. Since 4P < 2^48, transform butterflies
+ * keep values lazily reduced in [0, 4P) (Harvey's butterflies) and only
+ * reduce fully at the end of a transform.
+ */
+namespace mod64 {
+    constexpr uint64_t P = (9ull << 42) + 1;
+
+    /** P^{-1} mod 2^64 */
+    constexpr uint64_t PINV = inverse_mod_2_64(P);
+
+    /** 2^128 mod P, converts out of the Montgomery domain */
+    constexpr uint64_t R2 = pow2_mod(128, P);
+
+    static inline uint64_t add(uint64_t a, uint64_t b) {
+        uint64_t c = a + b;
+        return c >= P ? c - P : c;
+    }
+
+    static inline uint64_t sub(uint64_t a, uint64_t b) {
+        return a >= b ? a - b : a + (P - b);
+    }
+
+    /** Reduce a lazily reduced value in [0, 4P) to [0, P) */
+    static inline uint64_t reduce4(uint64_t a) {
+        if (a >= 2 * P) {
+            a -= 2 * P;
+        }
+        return a >= P ? a - P : a;
+    }
+
+    /** Shoup quotient floor(w * 2^64 / P), for w < P */
+    static inline uint64_t shoup(uint64_t w) {
+#if defined(__SIZEOF_INT128__)
+        return (uint64_t)(((unsigned __int128)w << 64) / P);
+#else
+        // long division, one quotient bit at a time
+        uint64_t q = 0, r = w;
+        for (int i = 0; i < 64; i++) {
+            r <<= 1;
+            q <<= 1;
+            if (r >= P) {
+                r -= P;
+                q |= 1;
+            }
+        }
+        return q;
+#endif
+    }
+
+    /** a * w mod P in the lazy range [0, 2P), for any a, given w_shoup = shoup(w) */
+    static inline uint64_t mul_shoup_lazy(uint64_t a, uint64_t w, uint64_t w_shoup) {
+        uint64_t q = mulhi64(a, w_shoup);
+        return a * w - q * P;
+    }
+
+    /** a * w mod P, for any a, given w_shoup = shoup(w) */
+    static inline uint64_t mul_shoup(uint64_t a, uint64_t w, uint64_t w_shoup) {
+        uint64_t r = mul_shoup_lazy(a, w, w_shoup);
+        return r >= P ? r - P : r;
+    }
+
+    /** Montgomery reduction of the 128-bit value hi * 2^64 + lo < P * 2^64 */
+    static inline uint64_t redc(uint64_t hi, uint64_t lo) {
+        uint64_t m = lo * PINV;
+        // hi * 2^64 + lo and m * P agree on the low 64 bits
+        uint64_t mp_hi = mulhi64(m, P);
+        return hi >= mp_hi ? hi - mp_hi : hi + (P - mp_hi);
+    }
+
+    /** a * b mod P, for a, b < P */
+    static inline uint64_t mul(uint64_t a, uint64_t b) {
+        uint64_t t = redc(mulhi64(a, b), a * b);
+        return redc(mulhi64(t, R2), t * R2);
+    }
+}
@@ -1,55 +1,14 @@
 #include "ntt.h"
+#include "modarith.h"
+#include "parallel.h"
+#include "scratch.h"
 
+#include <algorithm>
 #include <stdexcept>
+#include <string>
+#include <utility>
 #include <vector>
-#include <future>
 
-#define P ((3u<<30) + 1)
-#define G 5 // primitive root mod P
-
-uint32_t add(uint32_t a, uint32_t b) {
-    uint64_t c = a;
-    c += b;
-    uint64_t d = c - P;
-    uint64_t e = d >> 32;
-    // return d if d >= 0 else c
-    return (c&e) | (d&~e);
-}
-
-/**
- * Subtraction: a-b mod P
- *
- * @pre a,b < P
- */
-static uint32_t sub(uint32_t a, uint32_t b) {
-    uint64_t c = a;
-    c -= b;
-    uint64_t d = c + P;
-    uint64_t e = c >> 32;
-    // return c if c >= 0 else d
-    return (c&~e) | (d&e);
-}
-
-uint32_t mul(uint32_t a, uint32_t b) {
-    uint64_t n = a; n*= b;
-    return n % P;
-}
-
-/**
- * Modular exponentiation: a^e mod P
- */
-static uint32_t modexp(uint32_t a, uint32_t e) {
-    // e is not secret, no need to make constant time
-    uint32_t r = 1;
-    while (e) {
-        if (e&1) {
-            r = mul(r, a);
-        }
-        e >>= 1;
-        a = mul(a, a);
-    }
-    return r;
-}
 
 /**
  * Reverse the bits of x (an l-bit number)
@@ -64,27 +23,40 @@ static uint32_t reverse_bits(unsigned l, uint32_t x) {
     return y;
 }
 
-NTT::NTT(unsigned l) : L(1<<l) {
-    if (l < 1 || l > 30) {
-        throw std::runtime_error("Must have 1 <= l <= 30.");
+template <class M>
+BasicNTT<M>::BasicNTT(unsigned l, const NttKernels &kernels) : BasicNTT(l, 0, kernels) {}
+
+template <class M>
+BasicNTT<M>::BasicNTT(unsigned l, unsigned threes, const NttKernels &kernels)
+: L(threes ? 3u << l : 1u << l), N(1u << l), kernels(&kernels) {
+    if (l < 1 || l > M::MAX_L) {
+        throw std::runtime_error("Must have 1 <= l <= " + std::to_string(M::MAX_L) + ".");
     }
+    if (threes > (M::RADIX3 ? 1 : 0)) {
+        throw std::invalid_argument("Transform length not supported by the prime.");
+    }
+    if (kernels.P != M::P) {
+        throw std::invalid_argument("NTT kernels for another prime.");
+    }
+    const uint32_t P = M::P;
 
-    Linv = modexp(L, P-2);
+    Linv = M::to_mont(M::pow(L, P-2));
 
-    uint32_t half_L = L/2;
+    uint32_t half_L = N/2;
 
-    R = std::vector<uint32_t>(half_L);
-    Rinv = std::vector<uint32_t>(half_L);
-    revbits = std::vector<uint32_t>(L);
+    std::vector<uint32_t> powers(half_L), inverse_powers(half_L);
+    R = std::vector<uint32_t>(N);
+    Rinv = std::vector<uint32_t>(N);
+    revbits = std::vector<uint32_t>(N);
 
-    uint32_t r = modexp(G, (P - 1) >> l); // primitive L'th root of unity
+    uint32_t r = M::pow(M::G, (P - 1) >> l); // primitive N'th root of unity
 
     {
         {
             uint64_t t = 1;
             for (uint32_t i = 0; i < half_L; i++) {
-                R[i] = t;
-                t = mul(t, r);
+                powers[i] = t;
+                t = M::mul(t, r);
             }
         }
 
@@ -92,108 +64,384 @@ NTT::NTT(unsigned l) : L(1<<l) {
             // r^(L/2) = -1
             uint32_t t = P - 1;
             for (uint32_t i = 1; i <= half_L; i++) {
-                t = mul(t, r);
-                Rinv[half_L - i] = t;
+                t = M::mul(t, r);
+                inverse_powers[half_L - i] = t;
             }
         }
     }
 
-    for (uint32_t i = 0; i < L; i++) {
+    // Stage with half-length k uses the powers of r^(N/2k)
+    for (uint32_t k = 1, u = half_L; k < N; k <<= 1, u >>= 1) {
+        for (uint32_t j = 0; j < k; j++) {
+            R[k + j] = M::to_mont(powers[j * u]);
+            Rinv[k + j] = M::to_mont(inverse_powers[j * u]);
+        }
+    }
+
+    for (uint32_t i = 0; i < N; i++) {
         revbits[i] = reverse_bits(l, i);
     }
 
+    if (L != N) {
+        uint32_t w = M::pow(M::G, (P - 1) / L), winv = M::pow(w, P - 2);
+        W = std::vector<uint32_t>(2 * N);
+        Winv = std::vector<uint32_t>(2 * N);
+        uint32_t t = 1, tinv = 1;
+        for (uint32_t k = 0; k < N; k++) {
+            W[k] = M::to_mont(t);
+            W[N + k] = M::to_mont(M::mul(t, t));
+            Winv[k] = M::to_mont(tinv);
+            Winv[N + k] = M::to_mont(M::mul(tinv, tinv));
+            t = M::mul(t, w);
+            tinv = M::mul(tinv, winv);
+        }
+        // t = w^N now
+        omega = M::to_mont(t);
+        omega_inv = M::to_mont(tinv);
+    }
+}
+
+template <class M>
+uint64_t BasicNTT<M>::nbytes() const {
+    return sizeof(uint32_t) * (R.size() + Rinv.size() + revbits.size() + W.size() + Winv.size());
+}
+
+/**
+ * Bit inversion of x[0], x[stride], ... into y[begin:end], fused with the
+ * first two stages (whose twiddle factors are 1, 1 and w). Without
+ * revbits, x is already in bit reversed order, and may be y.
+ */
+template <class M>
+static void first_stages(uint32_t *y, const uint32_t *x, uint32_t stride, const uint32_t *revbits, uint32_t begin, uint32_t end, uint32_t w, bool plusone) {
+    for (uint32_t i = begin; i < end; i += 4) {
+        uint32_t x0, x1, x2, x3;
+        if (revbits) {
+            x0 = x[stride * revbits[i]], x1 = x[stride * revbits[i+1]];
+            x2 = x[stride * revbits[i+2]], x3 = x[stride * revbits[i+3]];
+        } else {
+            x0 = x[i], x1 = x[i+1], x2 = x[i+2], x3 = x[i+3];
+        }
+        if (i == 0) {
+            x0 ^= plusone;
+        }
+        uint32_t a0 = M::add(x0, x1), a1 = M::sub(x0, x1);
+        uint32_t a2 = M::add(x2, x3), a3 = M::mul_mont(M::sub(x2, x3), w);
+        y[i] = M::add(a0, a2);
+        y[i+1] = M::add(a1, a3);
+        y[i+2] = M::sub(a0, a2);
+        y[i+3] = M::sub(a1, a3);
+    }
+}
+
+template <class M>
+uint32_t BasicNTT<M>::chunks() const {
+    uint32_t T = 1;
+    unsigned budget = thread_budget();
+    while (2 * T <= budget && N / (2 * T) >= MIN_CHUNK) {
+        T *= 2;
+    }
+    return T;
 }
 
-std::vector<uint32_t> NTT::ntt(const std::vector<uint32_t> &x, bool inverse, bool plusone) {
+template <class M>
+void BasicNTT<M>::transform_pow2(const uint32_t *x, uint32_t stride, uint32_t *y, bool inverse, bool plusone,
+                                 const CoefficientRanges *keep) const {
     const std::vector<uint32_t>& U = inverse ? Rinv : R;
-    std::vector<uint32_t> y(L, 0);
 
-    // Bit inversion
-    y[0] = x[0] ^ plusone;
-    for (uint32_t i = 1; i < L; i++) {
-        y[revbits[i]] = x[i];
+    // Stages with half-length below `full` compute every butterfly, the
+    // later ones only those leading to the coefficients kept
+    uint32_t full = N;
+    if (keep) {
+        full = 4;
+        while (full < N && covers(ranges_mod(*keep, 2 * full), 2 * full)) {
+            full <<= 1;
+        }
     }
 
-    // Main loop
-    for (
-        uint32_t h = 2, k = 1, u = L/2;
-        h <= L;
-        k = h, h <<= 1, u >>= 1)
-    {
-        for (uint32_t i = 0; i < L; i += h) {
-            for (uint32_t j = 0, v = 0; j < k; j++, v += u) {
-                uint32_t r = i + j;
-                uint32_t s = r + k;
-                uint32_t a = y[r];
-                uint32_t b = mul(y[s], U[v]);
-                y[r] = add(a, b);
-                y[s] = sub(a, b);
+    uint32_t T = chunks();
+    const uint32_t *order = revbits.data();
+    if (x == y && N > 2) {
+        // In place, the input is put in bit reversed order first
+        order = nullptr;
+        uint32_t chunk = N / T;
+        parallel_for(T, [&](size_t t) {
+            for (uint32_t i = t * chunk; i < (t + 1) * chunk; i++) {
+                uint32_t j = revbits[i];
+                if (i < j) {
+                    std::swap(y[i], y[j]);
+                }
+            }
+        });
+    }
+    if (N == 2) {
+        uint32_t a = x[0] ^ plusone, b = x[stride];
+        y[0] = M::add(a, b);
+        y[1] = M::sub(a, b);
+    } else if (T == 1) {
+        first_stages<M>(y, x, stride, order, 0, N, U[3], plusone);
+        for (uint32_t i = 0; i < N; i += full) {
+            kernels->butterflies(y + i, full, U.data(), 4);
+        }
+    } else {
+        // Stages with blocks up to the chunk length run chunk by chunk,
+        // the later ones split the butterflies of each stage evenly
+        uint32_t chunk = N / T, block = std::min(chunk, full);
+        parallel_for(T, [&](size_t t) {
+            uint32_t *c = y + t * chunk;
+            first_stages<M>(y, x, stride, order, t * chunk, (t + 1) * chunk, U[3], plusone);
+            for (uint32_t i = 0; i < chunk; i += block) {
+                kernels->butterflies(c + i, block, U.data(), 4);
             }
+        });
+        for (uint32_t k = chunk; k < full; k <<= 1) {
+            parallel_for(T, [&](size_t t) {
+                uint32_t n = N / 2 / T, first = t * n;
+                uint32_t *r = y + first / k * 2 * k + first % k;
+                kernels->butterfly_range(r, r + k, U.data() + k + first % k, n);
+            });
         }
     }
 
+    for (uint32_t k = std::max(full, 2u); k < N; k <<= 1) {
+        CoefficientRanges js = butterfly_ranges(ranges_mod(*keep, 2 * k), k);
+        uint32_t blocks = N / (2 * k), pieces = std::min(T, blocks);
+        parallel_for(pieces, [&](size_t t) {
+            for (uint32_t i = t * (blocks / pieces); i < (t + 1) * (blocks / pieces); i++) {
+                uint32_t *r = y + i * 2 * k;
+                for (const auto &j : js) {
+                    kernels->butterfly_range(r + j.first, r + k + j.first, U.data() + k + j.first, j.second - j.first);
+                }
+            }
+        });
+    }
+
     // Normalization for inverse
-    if (inverse) {
-        for (uint32_t i = 0; i < L; i++) {
-            y[i] = mul(Linv, y[i]);
+    if (inverse && full < N) {
+        for (const auto &r : ranges_mod(*keep, N)) {
+            kernels->scale(y + r.first, r.second - r.first, Linv);
         }
+    } else if (inverse) {
+        uint32_t chunk = N / T;
+        parallel_for(T, [&](size_t t) {
+            kernels->scale(y + t * chunk, chunk, Linv);
+        });
     }
-    return y;
 }
 
-std::vector<uint32_t> NTT::mul_vec(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) {
-    std::vector<uint32_t> c(a.size());
-    for (uint32_t i = 0; i < a.size(); i++) {
-        c[i] = mul(a[i], b[i]);
+template <class M>
+void BasicNTT<M>::transform(const uint32_t *x, uint32_t *y, bool inverse, bool plusone,
+                            const CoefficientRanges *keep) const {
+    if (L == N) {
+        transform_pow2(x, 1, y, inverse, plusone, keep);
+        return;
     }
-    return c;
+
+    // Radix 3 decimation in time: with A_r the transform of x[r], x[r + 3],
+    // ..., y[k + qN] = A_0[k] + omega^q w^k A_1[k] + omega^2q w^2k A_2[k]
+    CoefficientRanges ks;
+    if (keep) {
+        ks = ranges_mod(*keep, N);
+    }
+    for (uint32_t r = 0; r < 3; r++) {
+        transform_pow2(x + r, 3, y + r * N, inverse, plusone && r == 0, keep ? &ks : nullptr);
+    }
+
+    const uint32_t *U = inverse ? Winv.data() : W.data();
+    uint32_t o = inverse ? omega_inv : omega;
+    if (keep) {
+        for (const auto &k : ks) {
+            uint32_t n = k.second - k.first;
+            kernels->butterfly3(y + k.first, y + N + k.first, y + 2 * N + k.first, U + k.first, U + N + k.first, o, n);
+        }
+        return;
+    }
+    uint32_t T = chunks(), chunk = N / T;
+    parallel_for(T, [&](size_t t) {
+        uint32_t k = t * chunk;
+        kernels->butterfly3(y + k, y + N + k, y + 2 * N + k, U + k, U + N + k, o, chunk);
+    });
 }
 
-std::vector<uint32_t> NTT::conv(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) {
-    std::vector<uint32_t> c = mul_vec(ntt(a, false), ntt(b, false));
-    return ntt(c, true);
+template <class M>
+void BasicNTT<M>::transform_inplace(uint32_t *x, bool inverse, bool plusone) const {
+    if (L == N) {
+        transform_pow2(x, 1, x, inverse, plusone, nullptr);
+        return;
+    }
+    // The radix 3 step reads each third of the output from all of the input
+    Scratch scratch;
+    uint32_t *copy = scratch.get(L);
+    std::copy(x, x + L, copy);
+    transform(copy, x, inverse, plusone);
 }
 
-std::vector<uint32_t> NTT::conv_and_reduce(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b, uint32_t r, uint32_t s) {
-    auto call_ntt = [this](const std::vector<uint32_t> &x, bool inverse){ return ntt(x, inverse); };
-    std::future<std::vector<uint32_t>> ntt_a = std::async(std::launch::async, call_ntt, a, false);
-    std::future<std::vector<uint32_t>> ntt_b = std::async(std::launch::async, call_ntt, b, false);
-    auto finish_and_reduce = [this](const std::vector<uint32_t> &x, const std::vector<uint32_t> &y, uint32_t r, uint32_t s){
-        auto out = ntt(mul_vec(x, y), true);
-        for(int32_t i = r-1; i >= 0; --i) {
-            auto red = out[r+i] % 2;
-            out[i] = (out[i] % 2) ^ red;
-            out[s+i] = (out[s+i] % 2) ^ red;
-            out[r+i] = 0;
-        }
-        return out;
-    };
+template <class M>
+void BasicNTT<M>::mul_vec(uint32_t *c, const uint32_t *a, const uint32_t *b) const {
+    uint32_t T = chunks(), chunk = L / T;
+    parallel_for(T, [&](size_t t) {
+        kernels->mul_vec(c + t * chunk, a + t * chunk, b + t * chunk, chunk);
+    });
+}
+
+/**
+ * The reduction mod x^r + x^s + 1 (s < r) of a product of degree < 2r - 1,
+ * its coefficients mod 2
+ */
+static void reduce_trinomial(uint32_t *c, uint32_t r, uint32_t s) {
+    for (int32_t i = r - 1; i >= 0; --i) {
+        uint32_t red = c[r + i] % 2;
+        c[i] = (c[i] % 2) ^ red;
+        c[s + i] = (c[s + i] % 2) ^ red;
+        c[r + i] = 0;
+    }
+}
 
-    std::future<std::vector<uint32_t>> conv = std::async(std::launch::async, finish_and_reduce, ntt_a.get(), ntt_b.get(), r, s);
-    return conv.get();
+template <class M>
+void BasicNTT<M>::conv(const uint32_t *a, const uint32_t *b, uint32_t *c) const {
+    Scratch scratch;
+    uint32_t *fa = scratch.get(L), *fb = scratch.get(L);
+    // The two forward transforms run concurrently, each on half the threads
+    auto forward = [&](size_t t) { transform(t ? b : a, t ? fb : fa, false); };
+    if (L >= MIN_CHUNK) {
+        parallel_for(2, forward);
+    } else {
+        forward(0);
+        forward(1);
+    }
+    mul_vec(fa, fa, fb);
+    transform(fa, c, true);
 }
 
-std::pair<std::vector<uint32_t>, std::vector<uint32_t>> NTT::raz_iteration(const std::vector<uint32_t> &product, const std::vector<uint32_t> &delta, uint32_t r, uint32_t s) {
-    auto call_ntt = [this](const std::vector<uint32_t> &x, bool inverse, bool plusone = false){ return ntt(x, inverse, plusone); };
-    std::future<std::vector<uint32_t>> ntt_delta = std::async(std::launch::async, call_ntt, delta, false, false);
-    std::future<std::vector<uint32_t>> ntt_delta_p1 = std::async(std::launch::async, call_ntt, delta, false, true);
-    std::future<std::vector<uint32_t>> ntt_product = std::async(std::launch::async, call_ntt, product, false, false);
+template <class M>
+void BasicNTT<M>::conv_transformed(const uint32_t *a, const uint32_t *b_hat, uint32_t *c,
+                                   const CoefficientRanges *keep) const {
+    Scratch scratch;
+    uint32_t *fa = scratch.get(L);
+    transform(a, fa, false);
+    mul_vec(fa, fa, b_hat);
+    transform(fa, c, true, false, keep);
+}
 
+template <class M>
+void BasicNTT<M>::conv_and_reduce(const uint32_t *a, const uint32_t *b, uint32_t *c, uint32_t r, uint32_t s) const {
+    conv(a, b, c);
+    reduce_trinomial(c, r, s);
+}
 
-    auto finish_and_reduce = [this](const std::vector<uint32_t> &x, const std::vector<uint32_t> &y, uint32_t r, uint32_t s){
-        auto out = ntt(mul_vec(x, y), true);
-        for(int32_t i = r-1; i >= 0; --i) {
-            auto red = out[r+i] % 2;
-            out[i] = (out[i] % 2) ^ red;
-            out[s+i] = (out[s+i] % 2) ^ red;
-            out[r+i] = 0;
+template <class M>
+void BasicNTT<M>::raz_iteration(uint32_t *product, uint32_t *delta, uint32_t r, uint32_t s) const {
+    Scratch scratch;
+    uint32_t *fd = scratch.get(L), *fd1 = scratch.get(L);
+    // The three forward transforms, then the two products, run concurrently
+    auto forward = [&](size_t t) {
+        if (t == 0) {
+            transform_inplace(product, false);
+        } else {
+            transform(delta, t == 1 ? fd1 : fd, false, t == 1);
+        }
+    };
+    auto finish = [&](size_t t) {
+        if (t == 0) {
+            mul_vec(product, product, fd1);
+            transform_inplace(product, true);
+            reduce_trinomial(product, r, s);
+        } else {
+            mul_vec(fd, fd, fd);
+            transform(fd, delta, true);
+            reduce_trinomial(delta, r, s);
         }
-        return out;
     };
-    std::future<std::vector<uint32_t>> new_product = std::async(std::launch::async, finish_and_reduce, ntt_product.get(), ntt_delta_p1.get(), r, s);
+    if (L >= MIN_CHUNK) {
+        parallel_for(3, forward);
+        parallel_for(2, finish);
+    } else {
+        for (size_t t = 0; t < 3; t++) {
+            forward(t);
+        }
+        finish(0);
+        finish(1);
+    }
+}
 
-    auto ndelta = ntt_delta.get();
-    std::future<std::vector<uint32_t>> new_delta = std::async(std::launch::async, finish_and_reduce, ndelta, ndelta, r, s);
+/** Check that a vector argument holds a whole sequence */
+static void check_size(const std::vector<uint32_t> &x, uint64_t L) {
+    if (x.size() != L) {
+        throw std::invalid_argument("Input length does not match the transform length.");
+    }
+}
 
-    return {new_product.get(), new_delta.get()};
+/** Check that products of degree < 2r - 1 fit in L coefficients */
+static void check_trinomial(uint32_t r, uint32_t s, uint64_t L) {
+    if (s >= r || 2 * (uint64_t)r > L) {
+        throw std::invalid_argument("Transform too short for the extractor parameters.");
+    }
 }
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::ntt(const std::vector<uint32_t> &x, bool inverse, bool plusone) {
+    std::vector<uint32_t> y(L, 0);
+    transform(x.data(), y.data(), inverse, plusone);
+    return y;
+}
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::mul_vec(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) {
+    std::vector<uint32_t> c(a.size());
+    size_t T = a.size() == L ? chunks() : 1, chunk = a.size() / T;
+    parallel_for(T, [&](size_t t) {
+        size_t n = t + 1 == T ? a.size() - t * chunk : chunk;
+        kernels->mul_vec(c.data() + t * chunk, a.data() + t * chunk, b.data() + t * chunk, n);
+    });
+    return c;
+}
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::conv(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b) {
+    check_size(a, L);
+    check_size(b, L);
+    std::vector<uint32_t> c(L);
+    conv(a.data(), b.data(), c.data());
+    return c;
+}
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::conv_transformed(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b_hat) {
+    check_size(a, L);
+    check_size(b_hat, L);
+    std::vector<uint32_t> c(L);
+    conv_transformed(a.data(), b_hat.data(), c.data());
+    return c;
+}
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::conv_transformed(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b_hat,
+                                                    const CoefficientRanges &keep) {
+    check_size(a, L);
+    check_size(b_hat, L);
+    std::vector<uint32_t> c(L);
+    conv_transformed(a.data(), b_hat.data(), c.data(), &keep);
+    return c;
+}
+
+template <class M>
+std::vector<uint32_t> BasicNTT<M>::conv_and_reduce(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b, uint32_t r, uint32_t s) {
+    check_size(a, L);
+    check_trinomial(r, s, L);
+    check_size(b, L);
+    std::vector<uint32_t> c(L);
+    conv_and_reduce(a.data(), b.data(), c.data(), r, s);
+    return c;
+}
+
+template <class M>
+std::pair<std::vector<uint32_t>, std::vector<uint32_t>> BasicNTT<M>::raz_iteration(const std::vector<uint32_t> &product, const std::vector<uint32_t> &delta, uint32_t r, uint32_t s) {
+    check_size(product, L);
+    check_trinomial(r, s, L);
+    check_size(delta, L);
+    std::pair<std::vector<uint32_t>, std::vector<uint32_t>> out(product, delta);
+    raz_iteration(out.first.data(), out.second.data(), r, s);
+    return out;
+}
+
+template class BasicNTT<mod32>;
+template class BasicNTT<mod32_b>;
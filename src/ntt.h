@@ -1,39 +1,141 @@
 #pragma once
 
+#include "modarith.h"
+#include "ntt_simd.h"
+#include "ranges.h"
+
 #include <cstdint>
 #include <vector>
 
-class NTT {
+/**
+ * Number theoretic transforms and cyclic convolutions of length L = 2^l mod
+ * a 32-bit prime M (mod32 or mod32_b), for 1 <= l <= M::MAX_L, or of length
+ * L = 3 * 2^l when 3 divides P - 1 (mod32 only). The latter take one radix 3
+ * step over three transforms of length 2^l, so that convolutions need not
+ * be padded up to the next power of 2.
+ */
+template <class M>
+class BasicNTT {
   private:
-    /** Sequence length (power of 2) */
-    uint32_t L;
+    /** Sequence length (2^l or 3 * 2^l), and its power of 2 part */
+    uint32_t L, N;
 
-    /** Inverse of L mod p */
+    /** Inverse of L mod p (Montgomery form) */
     uint32_t Linv;
 
     /**
-     * Powers 1, r, r^2, ..., r^(L/2-1) mod p, where r is a primitive L'th
-     * root of unity mod p
+     * Twiddle factors stage by stage: R[k + j] = r^(j N/2k) mod p for the
+     * stage with half-length k, where r is a primitive N'th root of unity
+     * mod p (Montgomery form, R[0] unused)
      */
     std::vector<uint32_t> R;
 
     /**
-     * Inverse powers 1, r^{-1}, r^{-2}, ..., r{-^(L/2-1)} mod p
+     * Inverse twiddle factors Rinv[k + j] = r^(-j N/2k) mod p (Montgomery form)
      */
     std::vector<uint32_t> Rinv;
 
+    /**
+     * Twiddle factors of the radix 3 step, W[k] = w^k and W[N + k] = w^2k
+     * for k < N, where w is a primitive L'th root of unity, and the cube
+     * root of unity w^N (Montgomery form); empty when L = N
+     */
+    std::vector<uint32_t> W, Winv;
+    uint32_t omega, omega_inv;
+
     /**
      * Lookup table for bit reversals
      */
     std::vector<uint32_t> revbits;
 
+    /** Butterfly, product and scaling kernels */
+    const NttKernels *kernels;
+
+    /** Shortest piece of a transform worth handing to another thread */
+    static const uint32_t MIN_CHUNK = 1 << 14;
+
+    /** Number of pieces (a power of 2) a transform of length N is split into */
+    uint32_t chunks() const;
+
+    /** Transform of length N of x[0], x[stride], ..., scaled by 1/L if inverse */
+    void transform_pow2(const uint32_t *x, uint32_t stride, uint32_t *y, bool inverse, bool plusone,
+                        const CoefficientRanges *keep) const;
+
   public:
-    explicit NTT(unsigned l);
+    typedef uint32_t value_type;
+
+    /** Forward transforms, as taken by conv_transformed */
+    typedef std::vector<uint32_t> spectrum_type;
+
+    explicit BasicNTT(unsigned l, const NttKernels &kernels = ntt_kernels<M>());
+
+    /** Transforms of length 3^threes * 2^l, for threes = 0 or 1 */
+    BasicNTT(unsigned l, unsigned threes, const NttKernels &kernels = ntt_kernels<M>());
+
+    /** Sequence length */
+    uint64_t size() const { return L; }
+
+    /** Memory held by the precomputed tables, in bytes */
+    uint64_t nbytes() const;
+
+    /** Instruction set of the kernels in use */
+    const char *kernel_name() const { return kernels->name; }
+
+    /**
+     * Transform of x[0], ..., x[L - 1] (plus one to x[0] if `plusone` is
+     * set) into y[0], ..., y[L - 1]; x and y must not overlap. Given
+     * `keep`, only the outputs in those ranges are computed, the last
+     * stages skipping the butterflies that lead to none of them, and the
+     * others are left unspecified.
+     */
+    void transform(const uint32_t *x, uint32_t *y, bool inverse, bool plusone = false,
+                   const CoefficientRanges *keep = nullptr) const;
+
+    /** As transform, in place */
+    void transform_inplace(uint32_t *x, bool inverse, bool plusone = false) const;
+
+    /** c[i] = a[i] b[i] for i < L; c may be a or b */
+    void mul_vec(uint32_t *c, const uint32_t *a, const uint32_t *b) const;
+
+    /*
+     * Convolutions on L-element arrays, into c (which may be a or b). Their
+     * transforms are kept in scratch buffers (see scratch.h), so they make
+     * no allocation once warm; the vector functions below call them.
+     */
+
+    /** Cyclic convolution of a and b */
+    void conv(const uint32_t *a, const uint32_t *b, uint32_t *c) const;
+
+    /** Cyclic convolution of a and b, given the forward transform of b (see transform for `keep`) */
+    void conv_transformed(const uint32_t *a, const uint32_t *b_hat, uint32_t *c,
+                          const CoefficientRanges *keep = nullptr) const;
+
+    /**
+     * Product of a and b mod 2 in GF(2^r) = GF(2)[x] / (x^r + x^s + 1), for
+     * a and b of degree < r; the coefficients from r on end up 0
+     */
+    void conv_and_reduce(const uint32_t *a, const uint32_t *b, uint32_t *c, uint32_t r, uint32_t s) const;
+
+    /**
+     * One step of the Raz extractor in GF(2^r) (see conv_and_reduce), in
+     * place: product becomes product * (delta + 1) and delta becomes delta^2
+     */
+    void raz_iteration(uint32_t *product, uint32_t *delta, uint32_t r, uint32_t s) const;
 
     std::vector<uint32_t> ntt(const std::vector<uint32_t> &x, bool inverse, bool plusone = false);
 
     std::vector<uint32_t> mul_vec(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b);
     std::vector<uint32_t> conv(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b);
+
+    /** Cyclic convolution of a and b, given the forward transform of b */
+    std::vector<uint32_t> conv_transformed(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b_hat);
+
+    /** As conv_transformed, computing only the coefficients in `keep` (see transform) */
+    std::vector<uint32_t> conv_transformed(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b_hat,
+                                           const CoefficientRanges &keep);
     std::vector<uint32_t> conv_and_reduce(const std::vector<uint32_t> &a, const std::vector<uint32_t> &b, uint32_t r, uint32_t s);
     std::pair<std::vector<uint32_t>, std::vector<uint32_t>> raz_iteration(const std::vector<uint32_t> &product, const std::vector<uint32_t> &delta, uint32_t r, uint32_t s);
 };
+
+/** The transform mod 3 * 2^30 + 1 */
+typedef BasicNTT<mod32> NTT;
@@ -0,0 +1,244 @@
+#include "ntt_simd.h"
+#include "modarith.h"
+#include "simd_target.h"
+
+template <class M>
+static void scalar_butterfly_range(uint32_t *r, uint32_t *s, const uint32_t *w, size_t n) {
+    for (size_t j = 0; j < n; j++) {
+        uint32_t a = r[j];
+        uint32_t b = M::mul_mont(s[j], w[j]);
+        r[j] = M::add(a, b);
+        s[j] = M::sub(a, b);
+    }
+}
+
+template <class M>
+static void scalar_butterfly_const(uint32_t *r, uint32_t *s, uint32_t w, size_t n) {
+    for (size_t j = 0; j < n; j++) {
+        uint32_t a = r[j];
+        uint32_t b = M::mul_mont(s[j], w);
+        r[j] = M::add(a, b);
+        s[j] = M::sub(a, b);
+    }
+}
+
+template <class M>
+static void scalar_butterfly3(uint32_t *x, uint32_t *y, uint32_t *z, const uint32_t *v, const uint32_t *w,
+                              uint32_t omega, size_t n) {
+    for (size_t j = 0; j < n; j++) {
+        uint32_t a = x[j], b = M::mul_mont(y[j], v[j]), c = M::mul_mont(z[j], w[j]);
+        // omega^2 = -1 - omega
+        uint32_t e = M::mul_mont(M::sub(b, c), omega);
+        x[j] = M::add(M::add(a, b), c);
+        y[j] = M::add(M::sub(a, c), e);
+        z[j] = M::sub(M::sub(a, b), e);
+    }
+}
+
+/**
+ * One butterfly stage with half-length k
+ */
+template <class M>
+static void scalar_stage(uint32_t *y, size_t L, const uint32_t *W, size_t k) {
+    for (size_t i = 0; i < L; i += 2 * k) {
+        scalar_butterfly_range<M>(y + i, y + i + k, W + k, k);
+    }
+}
+
+namespace scalar {
+    template <class M>
+    static void butterflies(uint32_t *y, size_t L, const uint32_t *W, size_t k) {
+        for (; k < L; k <<= 1) {
+            scalar_stage<M>(y, L, W, k);
+        }
+    }
+
+    template <class M>
+    static void mul_vec(uint32_t *c, const uint32_t *a, const uint32_t *b, size_t n) {
+        for (size_t i = 0; i < n; i++) {
+            c[i] = M::mul(a[i], b[i]);
+        }
+    }
+
+    template <class M>
+    static void scale(uint32_t *y, size_t n, uint32_t w_mont) {
+        for (size_t i = 0; i < n; i++) {
+            y[i] = M::mul_mont(y[i], w_mont);
+        }
+    }
+
+    template <class M>
+    static const NttKernels kernels = {"scalar", M::P, butterflies<M>, scalar_butterfly_range<M>,
+                                       scalar_butterfly_const<M>, scalar_butterfly3<M>, mul_vec<M>, scale<M>};
+}
+
+#ifdef SIMD_X86
+
+/*
+ * Each Vec<M> implements the functions of the prime M lane-wise. A Montgomery product
+ * needs the high halves of 32x32-bit products, which are computed with
+ * widening multiplies of the even and of the odd lanes. As P > 2^31, sums
+ * and differences do not fit in 32 bits: they are computed as differences
+ * with a borrow correction, a + b = a - (P - b).
+ */
+
+SIMD_BEGIN_TARGET("sse4.1")
+namespace sse41 {
+    template <class M>
+    struct Vec {
+        typedef __m128i type;
+        static constexpr size_t width = 4;
+
+        static type load(const uint32_t *p) { return _mm_loadu_si128((const __m128i *)p); }
+        static void store(uint32_t *p, type a) { _mm_storeu_si128((__m128i *)p, a); }
+        static type set1(uint32_t a) { return _mm_set1_epi32((int)a); }
+
+        static type sub(type a, type b) {
+            type no_borrow = _mm_cmpeq_epi32(_mm_max_epu32(a, b), a);
+            return _mm_add_epi32(_mm_sub_epi32(a, b), _mm_andnot_si128(no_borrow, set1(M::P)));
+        }
+
+        static type add(type a, type b) {
+            return sub(a, _mm_sub_epi32(set1(M::P), b));
+        }
+
+        static type mul_mont(type a, type w) {
+            const type pinv = set1(M::PINV), p = set1(M::P);
+            type t_even = _mm_mul_epu32(a, w);
+            type t_odd = _mm_mul_epu32(_mm_srli_epi64(a, 32), _mm_srli_epi64(w, 32));
+            type mp_even = _mm_mul_epu32(_mm_mul_epu32(t_even, pinv), p);
+            type mp_odd = _mm_mul_epu32(_mm_mul_epu32(t_odd, pinv), p);
+            type t_hi = _mm_blend_epi16(_mm_srli_epi64(t_even, 32), t_odd, 0xcc);
+            type mp_hi = _mm_blend_epi16(_mm_srli_epi64(mp_even, 32), mp_odd, 0xcc);
+            return sub(t_hi, mp_hi);
+        }
+    };
+
+#include "ntt_simd_impl.h"
+
+    template <class M>
+    static const NttKernels kernels = {"sse4.1", M::P, butterflies<M>, butterfly_range<M>,
+                                       butterfly_const<M>, butterfly3<M>, mul_vec<M>, scale<M>};
+}
+SIMD_END_TARGET
+
+SIMD_BEGIN_TARGET("avx2")
+namespace avx2 {
+    template <class M>
+    struct Vec {
+        typedef __m256i type;
+        static constexpr size_t width = 8;
+
+        static type load(const uint32_t *p) { return _mm256_loadu_si256((const __m256i *)p); }
+        static void store(uint32_t *p, type a) { _mm256_storeu_si256((__m256i *)p, a); }
+        static type set1(uint32_t a) { return _mm256_set1_epi32((int)a); }
+
+        static type sub(type a, type b) {
+            type no_borrow = _mm256_cmpeq_epi32(_mm256_max_epu32(a, b), a);
+            return _mm256_add_epi32(_mm256_sub_epi32(a, b), _mm256_andnot_si256(no_borrow, set1(M::P)));
+        }
+
+        static type add(type a, type b) {
+            return sub(a, _mm256_sub_epi32(set1(M::P), b));
+        }
+
+        static type mul_mont(type a, type w) {
+            const type pinv = set1(M::PINV), p = set1(M::P);
+            type t_even = _mm256_mul_epu32(a, w);
+            type t_odd = _mm256_mul_epu32(_mm256_srli_epi64(a, 32), _mm256_srli_epi64(w, 32));
+            type mp_even = _mm256_mul_epu32(_mm256_mul_epu32(t_even, pinv), p);
+            type mp_odd = _mm256_mul_epu32(_mm256_mul_epu32(t_odd, pinv), p);
+            type t_hi = _mm256_blend_epi32(_mm256_srli_epi64(t_even, 32), t_odd, 0xaa);
+            type mp_hi = _mm256_blend_epi32(_mm256_srli_epi64(mp_even, 32), mp_odd, 0xaa);
+            return sub(t_hi, mp_hi);
+        }
+    };
+
+#include "ntt_simd_impl.h"
+
+    template <class M>
+    static const NttKernels kernels = {"avx2", M::P, butterflies<M>, butterfly_range<M>,
+                                       butterfly_const<M>, butterfly3<M>, mul_vec<M>, scale<M>};
+}
+SIMD_END_TARGET
+
+SIMD_BEGIN_TARGET("avx512f")
+namespace avx512 {
+    template <class M>
+    struct Vec {
+        typedef __m512i type;
+        static constexpr size_t width = 16;
+
+        static type load(const uint32_t *p) { return _mm512_loadu_si512((const void *)p); }
+        static void store(uint32_t *p, type a) { _mm512_storeu_si512((void *)p, a); }
+        static type set1(uint32_t a) { return _mm512_set1_epi32((int)a); }
+
+        static type sub(type a, type b) {
+            type d = _mm512_sub_epi32(a, b);
+            return _mm512_mask_add_epi32(d, _mm512_cmplt_epu32_mask(a, b), d, set1(M::P));
+        }
+
+        static type add(type a, type b) {
+            return sub(a, _mm512_sub_epi32(set1(M::P), b));
+        }
+
+        static type mul_mont(type a, type w) {
+            const type pinv = set1(M::PINV), p = set1(M::P);
+            type t_even = _mm512_mul_epu32(a, w);
+            type t_odd = _mm512_mul_epu32(_mm512_srli_epi64(a, 32), _mm512_srli_epi64(w, 32));
+            type mp_even = _mm512_mul_epu32(_mm512_mul_epu32(t_even, pinv), p);
+            type mp_odd = _mm512_mul_epu32(_mm512_mul_epu32(t_odd, pinv), p);
+            type t_hi = _mm512_mask_blend_epi32(0xaaaa, _mm512_srli_epi64(t_even, 32), t_odd);
+            type mp_hi = _mm512_mask_blend_epi32(0xaaaa, _mm512_srli_epi64(mp_even, 32), mp_odd);
+            return sub(t_hi, mp_hi);
+        }
+    };
+
+#include "ntt_simd_impl.h"
+
+    template <class M>
+    static const NttKernels kernels = {"avx512", M::P, butterflies<M>, butterfly_range<M>,
+                                       butterfly_const<M>, butterfly3<M>, mul_vec<M>, scale<M>};
+}
+SIMD_END_TARGET
+
+#endif // SIMD_X86
+
+template <class M>
+const NttKernels &ntt_scalar_kernels() {
+    return scalar::kernels<M>;
+}
+
+template <class M>
+std::vector<const NttKernels *> available_ntt_kernels() {
+    std::vector<const NttKernels *> available;
+#ifdef SIMD_X86
+    if (has_avx512f()) {
+        available.push_back(&avx512::kernels<M>);
+    }
+    if (has_avx2()) {
+        available.push_back(&avx2::kernels<M>);
+    }
+    if (has_sse41()) {
+        available.push_back(&sse41::kernels<M>);
+    }
+#endif
+    available.push_back(&scalar::kernels<M>);
+    return available;
+}
+
+/** Chosen once, when the library is loaded */
+template <class M>
+static const NttKernels &best_kernels = *available_ntt_kernels<M>().front();
+
+template <class M>
+const NttKernels &ntt_kernels() {
+    return best_kernels<M>;
+}
+
+template const NttKernels &ntt_scalar_kernels<mod32>();
+template const NttKernels &ntt_scalar_kernels<mod32_b>();
+template const NttKernels &ntt_kernels<mod32>();
+template const NttKernels &ntt_kernels<mod32_b>();
+template std::vector<const NttKernels *> available_ntt_kernels<mod32>();
+template std::vector<const NttKernels *> available_ntt_kernels<mod32_b>();
@@ -0,0 +1,67 @@
+#pragma once
+
+#include "modarith.h"
+
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+/**
+ * Kernels of a 32-bit NTT (arithmetic mod a Mod32 prime P), one set per
+ * instruction set and prime. All kernels produce fully reduced results, so
+ * every set computes exactly the same values as the scalar one.
+ */
+struct NttKernels {
+    /** Instruction set: "avx512", "avx2", "sse4.1" or "scalar" */
+    const char *name;
+
+    /** The prime */
+    uint32_t P;
+
+    /**
+     * Butterfly stages with half-length k, 2k, ..., L/2 of an in-place
+     * transform of y (bit reversed, length L). Twiddle factors are stored
+     * stage by stage, in Montgomery form: W[k + j] is the j-th twiddle of
+     * the stage with half-length k.
+     */
+    void (*butterflies)(uint32_t *y, size_t L, const uint32_t *W, size_t k);
+
+    /**
+     * n butterflies (r[j], s[j]) <- (r[j] + w[j] s[j], r[j] - w[j] s[j]),
+     * with the twiddle factors w in Montgomery form
+     */
+    void (*butterfly_range)(uint32_t *r, uint32_t *s, const uint32_t *w, size_t n);
+
+    /** As butterfly_range, with the same twiddle factor w for all n butterflies */
+    void (*butterfly_const)(uint32_t *r, uint32_t *s, uint32_t w, size_t n);
+
+    /**
+     * n radix 3 butterflies (x[j], y[j], z[j]) <- (a + b + c,
+     * a + omega b + omega^2 c, a + omega^2 b + omega c), where a = x[j],
+     * b = v[j] y[j] and c = w[j] z[j], with the twiddle factors v and w and
+     * the cube root of unity omega in Montgomery form
+     */
+    void (*butterfly3)(uint32_t *x, uint32_t *y, uint32_t *z, const uint32_t *v, const uint32_t *w,
+                       uint32_t omega, size_t n);
+
+    /** c[i] = a[i] * b[i] mod P, for i < n */
+    void (*mul_vec)(uint32_t *c, const uint32_t *a, const uint32_t *b, size_t n);
+
+    /** y[i] = y[i] * w mod P, for i < n, given w_mont in Montgomery form */
+    void (*scale)(uint32_t *y, size_t n, uint32_t w_mont);
+};
+
+/**
+ * The scalar kernels, the reference for the vectorised ones. Kernels exist
+ * for the primes mod32 and mod32_b.
+ */
+template <class M = mod32>
+const NttKernels &ntt_scalar_kernels();
+
+/** The kernels used by default: the best set supported by the CPU */
+template <class M = mod32>
+const NttKernels &ntt_kernels();
+
+/** All kernel sets supported by the CPU (and the build), best first */
+template <class M = mod32>
+std::vector<const NttKernels *> available_ntt_kernels();
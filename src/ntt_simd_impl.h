@@ -0,0 +1,95 @@
+// Vectorised NTT kernels, generic over the vector type `Vec<M>` for the
+// prime M.
+//
+// This file is included by ntt_simd.cpp once per instruction set, inside a
+// namespace that defines `Vec` and with the matching target options in
+// effect; it is not a standalone header.
+//
+// Vec<M> provides: width (lanes of 32 bits), type, load, store, set1, add,
+// sub and mul_mont, with the semantics of the functions of M.
+
+template <class M>
+static void butterfly_range(uint32_t *r, uint32_t *s, const uint32_t *w, size_t n) {
+    typedef Vec<M> V;
+    size_t j = 0;
+    for (; j + V::width <= n; j += V::width) {
+        typename V::type a = V::load(r + j);
+        typename V::type b = V::mul_mont(V::load(s + j), V::load(w + j));
+        V::store(r + j, V::add(a, b));
+        V::store(s + j, V::sub(a, b));
+    }
+    scalar_butterfly_range<M>(r + j, s + j, w + j, n - j);
+}
+
+template <class M>
+static void butterfly_const(uint32_t *r, uint32_t *s, uint32_t w, size_t n) {
+    typedef Vec<M> V;
+    const typename V::type wv = V::set1(w);
+    size_t j = 0;
+    for (; j + V::width <= n; j += V::width) {
+        typename V::type a = V::load(r + j);
+        typename V::type b = V::mul_mont(V::load(s + j), wv);
+        V::store(r + j, V::add(a, b));
+        V::store(s + j, V::sub(a, b));
+    }
+    scalar_butterfly_const<M>(r + j, s + j, w, n - j);
+}
+
+template <class M>
+static void butterfly3(uint32_t *x, uint32_t *y, uint32_t *z, const uint32_t *v, const uint32_t *w,
+                       uint32_t omega, size_t n) {
+    typedef Vec<M> V;
+    const typename V::type ov = V::set1(omega);
+    size_t j = 0;
+    for (; j + V::width <= n; j += V::width) {
+        typename V::type a = V::load(x + j);
+        typename V::type b = V::mul_mont(V::load(y + j), V::load(v + j));
+        typename V::type c = V::mul_mont(V::load(z + j), V::load(w + j));
+        typename V::type e = V::mul_mont(V::sub(b, c), ov);
+        V::store(x + j, V::add(V::add(a, b), c));
+        V::store(y + j, V::add(V::sub(a, c), e));
+        V::store(z + j, V::sub(V::sub(a, b), e));
+    }
+    scalar_butterfly3<M>(x + j, y + j, z + j, v + j, w + j, omega, n - j);
+}
+
+template <class M>
+static void butterflies(uint32_t *y, size_t L, const uint32_t *W, size_t k) {
+    typedef Vec<M> V;
+    // Stages whose blocks are narrower than a vector
+    for (; k < L && k < V::width; k <<= 1) {
+        scalar_stage<M>(y, L, W, k);
+    }
+    for (; k < L; k <<= 1) {
+        for (size_t i = 0; i < L; i += 2 * k) {
+            butterfly_range<M>(y + i, y + i + k, W + k, k);
+        }
+    }
+}
+
+template <class M>
+static void mul_vec(uint32_t *c, const uint32_t *a, const uint32_t *b, size_t n) {
+    typedef Vec<M> V;
+    const typename V::type r2 = V::set1(M::R2);
+    size_t i = 0;
+    for (; i + V::width <= n; i += V::width) {
+        typename V::type b_mont = V::mul_mont(V::load(b + i), r2);
+        V::store(c + i, V::mul_mont(V::load(a + i), b_mont));
+    }
+    for (; i < n; i++) {
+        c[i] = M::mul(a[i], b[i]);
+    }
+}
+
+template <class M>
+static void scale(uint32_t *y, size_t n, uint32_t w_mont) {
+    typedef Vec<M> V;
+    const typename V::type w = V::set1(w_mont);
+    size_t i = 0;
+    for (; i + V::width <= n; i += V::width) {
+        V::store(y + i, V::mul_mont(V::load(y + i), w));
+    }
+    for (; i < n; i++) {
+        y[i] = M::mul_mont(y[i], w_mont);
+    }
+}
@@ -0,0 +1,234 @@
+#include "parallel.h"
+
+#include <algorithm>
+#include <atomic>
+#include <condition_variable>
+#include <cstdlib>
+#include <deque>
+#include <exception>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+#ifndef _WIN32
+#include <unistd.h>
+#endif
+
+static unsigned default_num_threads() {
+    const char *env = std::getenv("CRYPTOMITE_NUM_THREADS");
+    if (env) {
+        long n = std::strtol(env, nullptr, 10);
+        if (n > 0) {
+            return n;
+        }
+    }
+    return std::max(1u, std::thread::hardware_concurrency());
+}
+
+static std::atomic<unsigned> num_threads{default_num_threads()};
+
+/** Threads of the enclosing parallel section (0 outside any) */
+static thread_local unsigned section_budget = 0;
+
+unsigned get_num_threads() {
+    return num_threads;
+}
+
+namespace {
+
+/** A running parallel_for, split into one share per worker */
+struct Section {
+    const std::function<void(size_t)> &f;
+    size_t n;
+    unsigned workers, budget;
+
+    /** Shares being run by pool threads (guarded by the pool lock) */
+    unsigned running = 0;
+    std::condition_variable finished;
+
+    std::exception_ptr error;
+    std::mutex error_lock;
+
+    Section(const std::function<void(size_t)> &f, size_t n, unsigned workers, unsigned budget)
+    : f(f), n(n), workers(workers), budget(budget) {}
+
+    /** Run share w: tasks w, w + workers, ... with its part of the budget */
+    void run(unsigned w) {
+        unsigned outer = section_budget;
+        section_budget = budget / workers + (w < budget % workers);
+        try {
+            for (size_t i = w; i < n; i += workers) {
+                f(i);
+            }
+        } catch (...) {
+            std::lock_guard<std::mutex> guard(error_lock);
+            if (!error) {
+                error = std::current_exception();
+            }
+        }
+        section_budget = outer;
+    }
+};
+
+/**
+ * Threads kept alive between parallel sections, so that sections pay for
+ * a queue push rather than a thread creation. The pool grows to the
+ * threads sections ask for, up to get_num_threads() - 1 (the thread
+ * calling parallel_for works too), and shrinks with set_num_threads.
+ *
+ * A share waits in the queue until a pool thread takes it. The caller
+ * takes back and runs the shares still waiting once it is done with its
+ * own, so that sections nested in the shares of other sections (which
+ * run on pool threads) never wait for a pool thread to become free.
+ */
+class ThreadPool {
+  private:
+    std::mutex lock;
+    std::condition_variable wake;
+    std::deque<std::pair<Section *, unsigned>> queue;
+    std::vector<std::thread> threads;
+
+    /** Threads past this many exit once idle */
+    size_t target = 0;
+
+    void work(size_t index) {
+        pool_thread = true;
+        std::unique_lock<std::mutex> guard(lock);
+        while (true) {
+            wake.wait(guard, [&] { return index >= target || !queue.empty(); });
+            if (index >= target) {
+                return;
+            }
+            auto share = queue.front();
+            queue.pop_front();
+            share.first->running++;
+            guard.unlock();
+            share.first->run(share.second);
+            guard.lock();
+            if (--share.first->running == 0) {
+                share.first->finished.notify_all();
+            }
+        }
+    }
+
+  public:
+    /** Whether the calling thread belongs to a pool */
+    static thread_local bool pool_thread;
+
+    /** Start threads until there are n */
+    void grow(size_t n) {
+        std::lock_guard<std::mutex> guard(lock);
+        target = std::max(target, n);
+        while (threads.size() < target) {
+            threads.emplace_back(&ThreadPool::work, this, threads.size());
+        }
+    }
+
+    /** Stop threads until there are at most n, once they are idle */
+    void shrink(size_t n) {
+        std::vector<std::thread> stopped;
+        {
+            std::lock_guard<std::mutex> guard(lock);
+            if (n >= threads.size()) {
+                return;
+            }
+            target = n;
+            stopped.assign(std::make_move_iterator(threads.begin() + n), std::make_move_iterator(threads.end()));
+            threads.resize(n);
+        }
+        wake.notify_all();
+        for (std::thread &t : stopped) {
+            t.join();
+        }
+    }
+
+    /** Run the section: shares 1, 2, ... on the pool, share 0 on the calling thread */
+    void run(Section &section) {
+        {
+            std::lock_guard<std::mutex> guard(lock);
+            for (unsigned w = 1; w < section.workers; w++) {
+                queue.emplace_back(&section, w);
+            }
+        }
+        wake.notify_all();
+        section.run(0);
+
+        std::vector<unsigned> left;
+        std::unique_lock<std::mutex> guard(lock);
+        for (auto it = queue.begin(); it != queue.end();) {
+            if (it->first == &section) {
+                left.push_back(it->second);
+                it = queue.erase(it);
+            } else {
+                ++it;
+            }
+        }
+        guard.unlock();
+        for (unsigned w : left) {
+            section.run(w);
+        }
+        guard.lock();
+        section.finished.wait(guard, [&] { return section.running == 0; });
+    }
+};
+
+thread_local bool ThreadPool::pool_thread = false;
+
+#ifndef _WIN32
+static pid_t pool_pid = 0;
+#endif
+
+/**
+ * The pool of the process. It is never destroyed, so that no thread is
+ * joined while the process exits (or the module is unloaded). A process
+ * forked from one using the pool gets a new pool: the threads of the old
+ * one were not forked.
+ */
+ThreadPool &pool() {
+    static std::mutex pool_lock;
+    static ThreadPool *instance = nullptr;
+    std::lock_guard<std::mutex> guard(pool_lock);
+#ifndef _WIN32
+    if (instance && pool_pid != getpid()) {
+        instance = nullptr;
+    }
+    pool_pid = getpid();
+#endif
+    if (!instance) {
+        instance = new ThreadPool;
+    }
+    return *instance;
+}
+
+} // namespace
+
+void set_num_threads(unsigned n) {
+    num_threads = n ? n : default_num_threads();
+    // Threads of the pool cannot join themselves
+    if (!ThreadPool::pool_thread) {
+        pool().shrink(num_threads - 1);
+    }
+}
+
+unsigned thread_budget() {
+    return section_budget ? section_budget : get_num_threads();
+}
+
+void parallel_for_threads(size_t n, const std::function<void(size_t)> &f) {
+    unsigned budget = thread_budget();
+    unsigned workers = (unsigned)std::min<size_t>(budget, n);
+    if (workers <= 1) {
+        for (size_t i = 0; i < n; i++) {
+            f(i);
+        }
+        return;
+    }
+
+    Section section(f, n, workers, budget);
+    ThreadPool &threads = pool();
+    threads.grow(std::min<size_t>(workers - 1, get_num_threads() - 1));
+    threads.run(section);
+    if (section.error) {
+        std::rethrow_exception(section.error);
+    }
+}
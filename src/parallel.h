@@ -0,0 +1,46 @@
+#pragma once
+
+#include <cstddef>
+#include <functional>
+
+/**
+ * Number of threads that parallel sections may use: the value given to
+ * set_num_threads, else the CRYPTOMITE_NUM_THREADS environment variable,
+ * else the number of hardware threads.
+ */
+unsigned get_num_threads();
+
+/**
+ * Set the number of threads used by parallel sections (0 restores the
+ * default). Idle threads of the pool beyond the new number are stopped.
+ */
+void set_num_threads(unsigned n);
+
+/**
+ * Threads available to a parallel section started by the calling thread:
+ * get_num_threads() outside any section, and a share of the threads of
+ * the enclosing section inside one.
+ */
+unsigned thread_budget();
+
+/** parallel_for on more than one thread */
+void parallel_for_threads(size_t n, const std::function<void(size_t)> &f);
+
+/**
+ * Run f(0), ..., f(n - 1) on up to thread_budget() threads, the calling
+ * thread included, and wait for all of them. The other threads come from
+ * a pool created on first use and kept for later sections. Nested sections split the
+ * threads of the section they run in, so the total stays bounded.
+ * The first exception thrown by f is rethrown. Sections that get a single
+ * thread call f in a loop, without wrapping it in a std::function.
+ */
+template <class F>
+void parallel_for(size_t n, const F &f) {
+    if (n <= 1 || thread_budget() <= 1) {
+        for (size_t i = 0; i < n; i++) {
+            f(i);
+        }
+        return;
+    }
+    parallel_for_threads(n, f);
+}
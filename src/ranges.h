@@ -0,0 +1,71 @@
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <utility>
+#include <vector>
+
+/**
+ * Half-open ranges [begin, end) of coefficients of a cyclic convolution:
+ * the only ones an output-pruned transform computes
+ */
+typedef std::vector<std::pair<uint64_t, uint64_t>> CoefficientRanges;
+
+/** Sort and merge overlapping or adjacent ranges */
+inline CoefficientRanges merge_ranges(CoefficientRanges ranges) {
+    std::sort(ranges.begin(), ranges.end());
+    CoefficientRanges merged;
+    for (const auto &r : ranges) {
+        if (r.first >= r.second) {
+            continue;
+        }
+        if (!merged.empty() && r.first <= merged.back().second) {
+            merged.back().second = std::max(merged.back().second, r.second);
+        } else {
+            merged.push_back(r);
+        }
+    }
+    return merged;
+}
+
+/**
+ * The offsets in [0, period) congruent mod period to a coefficient in
+ * `ranges`, as sorted disjoint ranges
+ */
+inline CoefficientRanges ranges_mod(const CoefficientRanges &ranges, uint64_t period) {
+    CoefficientRanges offsets;
+    for (const auto &r : ranges) {
+        if (r.first >= r.second) {
+            continue;
+        }
+        if (r.second - r.first >= period) {
+            return {{0, period}};
+        }
+        uint64_t begin = r.first % period, end = begin + (r.second - r.first);
+        if (end <= period) {
+            offsets.push_back({begin, end});
+        } else {
+            offsets.push_back({begin, period});
+            offsets.push_back({0, end - period});
+        }
+    }
+    return merge_ranges(offsets);
+}
+
+/** Whether the offsets (from ranges_mod) are all of [0, period) */
+inline bool covers(const CoefficientRanges &offsets, uint64_t period) {
+    return offsets.size() == 1 && offsets[0].first == 0 && offsets[0].second == period;
+}
+
+/**
+ * The butterflies j < k of a stage with half-length k that have an output,
+ * j or j + k, among the offsets (from ranges_mod with period 2k)
+ */
+inline CoefficientRanges butterfly_ranges(const CoefficientRanges &offsets, uint64_t k) {
+    CoefficientRanges js;
+    for (const auto &r : offsets) {
+        js.push_back({r.first, std::min(r.second, k)});
+        js.push_back({std::max(r.first, k) - k, r.second > k ? r.second - k : 0});
+    }
+    return merge_ranges(js);
+}
@@ -0,0 +1,77 @@
+#include "raz.h"
+#include "gf2n.h"
+
+#include <algorithm>
+#include <stdexcept>
+
+static void check_raz(const BitView &x, const BitView &y, uint64_t n, uint64_t s, uint64_t m, uint64_t L) {
+    if (x.size < 2 * n || y.size == 0 || y.size > n) {
+        throw std::invalid_argument("Raz inputs must have at least 2n and between 1 and n bits.");
+    }
+    if (m > n || s >= n || L < 2 * n) {
+        throw std::invalid_argument("Transform too short for the extractor parameters.");
+    }
+}
+
+std::vector<uint8_t> raz_extract(NTT &ntt, const BitView &x, const BitView &y, uint64_t n, uint64_t s, uint64_t m) {
+    uint64_t L = ntt.size();
+    check_raz(x, y, n, s, m, L);
+
+    // Product in GF(2^n), as polynomials with coefficients 0 or 1
+    auto gf_mul = [&](const std::vector<uint32_t> &a, const std::vector<uint32_t> &b, std::vector<uint32_t> &c) {
+        ntt.conv_and_reduce(a.data(), b.data(), c.data(), n, s);
+        for (uint32_t &e : c) {
+            e &= 1;
+        }
+    };
+
+    std::vector<uint32_t> x1(L, 0), x2(L, 0), y_pad(L, 0);
+    x.copy_to(0, n, x1.data());
+    x.copy_to(n, std::min<uint64_t>(x.size - n, L), x2.data());
+    y.copy_to(0, y.size, y_pad.data());
+
+    // product = delta + 1, then product * (delta^(2^i) + 1) for i < log2(L),
+    // in place
+    std::vector<uint32_t> delta(L), product(L);
+    gf_mul(y_pad, x1, delta);
+    product = delta;
+    product[0] ^= 1;
+    gf_mul(delta, delta, delta);
+    for (uint64_t i = 2; i < L; i <<= 1) {
+        ntt.raz_iteration(product.data(), delta.data(), n, s);
+    }
+
+    gf_mul(product, x2, x1);
+    return std::vector<uint8_t>(x1.begin(), x1.begin() + m);
+}
+
+std::vector<uint8_t> raz_extract(const GF2Conv &gf2, const BitView &x, const BitView &y, uint64_t n, uint64_t s, uint64_t m) {
+    uint64_t L = gf2.size();
+    check_raz(x, y, n, s, m, L);
+    GF2n field(n, s, gf2.kernel_set());
+    size_t words = field.words;
+
+    // The second half of x may be longer than n bits, and is then reduced
+    std::vector<uint64_t> x1 = field.element(x, 0, n), x2 = field.element(x, n, x.size - n);
+    std::vector<uint64_t> seed = field.element(y, 0, y.size);
+
+    // product = delta + 1, then product * (delta^(2^i) + 1) for i < log2(L)
+    std::vector<uint64_t> delta(words), product(words);
+    field.mul(delta.data(), seed.data(), x1.data());
+    product = delta;
+    product[0] ^= 1;
+    field.sqr(delta.data(), delta.data());
+    for (uint64_t i = 2; i < L; i <<= 1) {
+        // product (delta + 1) = product delta + product
+        field.mul(x1.data(), product.data(), delta.data());
+        field.add(product.data(), product.data(), x1.data());
+        field.sqr(delta.data(), delta.data());
+    }
+
+    field.mul(x1.data(), product.data(), x2.data());
+    std::vector<uint8_t> out(m);
+    for (uint64_t i = 0; i < m; i++) {
+        out[i] = (x1[i >> 6] >> (i & 63)) & 1;
+    }
+    return out;
+}
@@ -0,0 +1,25 @@
+#pragma once
+
+#include "bitview.h"
+#include "gf2x.h"
+#include "ntt.h"
+
+#include <cstdint>
+#include <vector>
+
+/**
+ * The Raz extractor [Raz2005] as constructed in [Fore2025], over GF(2^n)
+ * defined by the irreducible trinomial x^n + x^s + 1.
+ *
+ * x is the first input (at least 2n bits, the bits after the first n form
+ * the second half), y the second input (1 to n bits, zero padded to n).
+ * The transform must have length 2^(ceil(log2 n) + 1).
+ */
+std::vector<uint8_t> raz_extract(NTT &ntt, const BitView &x, const BitView &y, uint64_t n, uint64_t s, uint64_t m);
+
+/**
+ * As above, with the field elements packed 64 bits to a word (see GF2n in
+ * gf2n.h), multiplied with the kernels of `gf2`. Only the length of `gf2`
+ * is used otherwise, for the number of iterations.
+ */
+std::vector<uint8_t> raz_extract(const GF2Conv &gf2, const BitView &x, const BitView &y, uint64_t n, uint64_t s, uint64_t m);
@@ -0,0 +1,46 @@
+#include "scratch.h"
+
+#include <memory>
+#include <vector>
+
+namespace {
+    struct Buffer {
+        std::unique_ptr<uint32_t[]> data;
+        size_t size = 0;
+    };
+
+    /** Buffers of a thread, those below `top` in use */
+    struct Arena {
+        std::vector<Buffer> buffers;
+        size_t top = 0;
+    };
+}
+
+static thread_local Arena arena;
+
+Scratch::Scratch() : first(arena.top) {}
+
+Scratch::~Scratch() {
+    arena.top = first;
+    if (first == 0) {
+        for (Buffer &b : arena.buffers) {
+            if (b.size > KEEP_MAX) {
+                b.data.reset();
+                b.size = 0;
+            }
+        }
+    }
+}
+
+uint32_t *Scratch::get(size_t n) {
+    if (arena.top == arena.buffers.size()) {
+        arena.buffers.emplace_back();
+    }
+    Buffer &b = arena.buffers[arena.top++];
+    if (b.size < n) {
+        // Left uninitialised: the caller overwrites it
+        b.data.reset(new uint32_t[n]);
+        b.size = n;
+    }
+    return b.data.get();
+}
@@ -0,0 +1,30 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+
+/**
+ * Scratch buffers from an arena of the calling thread, reused from call to
+ * call so that code running the same transforms over and over allocates
+ * nothing once warm. A Scratch takes its buffers above those of the
+ * Scratch objects alive on the thread (the ones of the functions calling
+ * it), and gives them back when destroyed. Buffers of more than KEEP_MAX
+ * elements are freed when the outermost Scratch is destroyed, rather than
+ * held by the thread.
+ */
+class Scratch {
+  private:
+    /** Depth in the arena of the first buffer taken */
+    size_t first;
+
+  public:
+    static const size_t KEEP_MAX = size_t(1) << 22;
+
+    Scratch();
+    ~Scratch();
+    Scratch(const Scratch &) = delete;
+    Scratch &operator=(const Scratch &) = delete;
+
+    /** A buffer of at least n elements, of unspecified contents, until the Scratch is destroyed */
+    uint32_t *get(size_t n);
+};
@@ -0,0 +1,57 @@
+#pragma once
+
+/*
+ * Vectorised kernels are compiled for their instruction set with function
+ * target attributes, so that the library itself needs no special compiler
+ * flags and runs on any x86-64 CPU; the set used is picked at run time from
+ * CPUID.
+ */
+#if defined(__x86_64__) || defined(_M_X64)
+#define SIMD_X86 1
+#include <immintrin.h>
+#if defined(_MSC_VER) && !defined(__clang__)
+#include <intrin.h>
+#endif
+#endif
+
+#define SIMD_PRAGMA(...) _Pragma(#__VA_ARGS__)
+#if defined(__clang__)
+#define SIMD_BEGIN_TARGET(isa) SIMD_PRAGMA(clang attribute push(__attribute__((target(isa))), apply_to = function))
+#define SIMD_END_TARGET SIMD_PRAGMA(clang attribute pop)
+#elif defined(__GNUC__)
+#define SIMD_BEGIN_TARGET(isa) SIMD_PRAGMA(GCC push_options) SIMD_PRAGMA(GCC target(isa))
+#define SIMD_END_TARGET SIMD_PRAGMA(GCC pop_options)
+#else
+#define SIMD_BEGIN_TARGET(isa)
+#define SIMD_END_TARGET
+#endif
+
+#ifdef SIMD_X86
+#if defined(_MSC_VER) && !defined(__clang__)
+inline bool cpuid_bit(int leaf, int reg, int bit) {
+    int info[4];
+    __cpuid(info, 0);
+    if (info[0] < leaf) {
+        return false;
+    }
+    __cpuidex(info, leaf, 0);
+    return (info[reg] >> bit) & 1;
+}
+
+/** Whether the OS saves the register state given by the XCR0 mask */
+inline bool os_saves(unsigned long long mask) {
+    // OSXSAVE
+    return cpuid_bit(1, 2, 27) && (_xgetbv(0) & mask) == mask;
+}
+
+inline bool has_sse41() { return cpuid_bit(1, 2, 19); }
+inline bool has_pclmul() { return cpuid_bit(1, 2, 1); }
+inline bool has_avx2() { return os_saves(0x6) && cpuid_bit(7, 1, 5); }
+inline bool has_avx512f() { return os_saves(0xe6) && cpuid_bit(7, 1, 16); }
+#else
+inline bool has_sse41() { return __builtin_cpu_supports("sse4.1"); }
+inline bool has_pclmul() { return __builtin_cpu_supports("pclmul"); }
+inline bool has_avx2() { return __builtin_cpu_supports("avx2"); }
+inline bool has_avx512f() { return __builtin_cpu_supports("avx512f"); }
+#endif
+#endif // SIMD_X86
@@ -1,11 +1,14 @@
 #include "irreducible_poly.h"
+#include "parallel.h"
 #include "trevisan.h"
 
 #include <algorithm>
 #include <bitset>
 #include <cmath>
 #include <iostream>
+#include <map>
 #include <set>
+#include <tuple>
 
 using namespace std;
 
@@ -70,19 +73,19 @@ HRWeakDesign::HRWeakDesign(int m, int log_t) : log_t(log_t), field(log_t), m(m)
 }
 
 // Returns the ith subset of the HR weak design
-vector<uint64_t> HRWeakDesign::get_s(int i) {
+vector<uint64_t> HRWeakDesign::get_s(int i) const {
     if (i < 0 || i >= m) {
         cerr << "Index: " << i << ", HR weak design size: " << m << endl;
         throw runtime_error("Index out of bounds for HR weak design.");
     }
 
-    auto alphas = vector<poly_bits>(c);
+    auto alphas = vector<uint64_t>(c);
     for (int j = 0; j < c; j++) {
-        alphas[j] = poly_bits((i >> j*log_t) & mask);
+        alphas[j] = (i >> j*log_t) & mask;
     }
     auto s = vector<uint64_t>(t);
     for (int a = 0; a < t; a++) {
-        uint64_t b = field.horner_method(alphas, a).to_ullong();
+        uint64_t b = field.horner(alphas.data(), c, {uint64_t(a)})[0];
         uint64_t pair = (a << log_t) + b;
         s[a] = pair;
     }
@@ -120,8 +123,7 @@ BlockWeakDesign::BlockWeakDesign(int m, int log_t)
     // base = HRWeakDesign(max(ms[0], t), log_t);
 }
 
-// Returns the ith subset of the block weak design.
-vector<uint64_t> BlockWeakDesign::get_s(int i) {
+int BlockWeakDesign::block(int i) const {
     if (i < 0 || i >= m) {
         cerr << "Index: " << i << ", block weak design size: " << m << endl;
         throw runtime_error("Index out of bounds for block weak design.");
@@ -137,7 +139,12 @@ vector<uint64_t> BlockWeakDesign::get_s(int i) {
         }
         step >>= 1;
     }
+    return ind;
+}
 
+// Returns the ith subset of the block weak design.
+vector<uint64_t> BlockWeakDesign::get_s(int i) const {
+    int ind = block(i);
     int base_i = i - sum_ms[ind];
     int base_inc = ind * t * t;
     vector<uint64_t> base_s = base.get_s(base_i);
@@ -149,41 +156,89 @@ vector<uint64_t> BlockWeakDesign::get_s(int i) {
     return s;
 }
 
+void BlockWeakDesign::get_s(const WeakDesignTable &table, int i, uint32_t *s) const {
+    int ind = block(i);
+    const uint16_t *b = table.row(i - sum_ms[ind]);
+    // b < t even if the table was read from a corrupt file
+    uint32_t base_inc = ind * t * t, mask = t - 1;
+    for (int a = 0; a < table.width; a++) {
+        s[a] = base_inc + a * t + (b[a] & mask);
+    }
+}
+
+shared_ptr<const WeakDesignTable> BlockWeakDesign::shared_table(const BlockWeakDesign &wd, int width) {
+    // The design only depends on m and t
+    static mutex lock;
+    static map<tuple<int, int, int>, weak_ptr<const WeakDesignTable>> tables;
+    lock_guard<mutex> guard(lock);
+    auto &cached = tables[make_tuple(wd.m, wd.t, width)];
+    auto table = cached.lock();
+    if (!table) {
+        table = make_shared<const WeakDesignTable>(wd, width);
+        cached = table;
+    }
+    return table;
+}
+
+WeakDesignTable::WeakDesignTable(const BlockWeakDesign &wd, int width) : rows(wd.base_size()), width(width) {
+    if (width < 0 || width > wd.t) {
+        throw runtime_error("Weak design tables hold at most t indices per subset.");
+    }
+    owned.resize(size_t(rows) * width);
+    parallel_for(rows, [&](size_t i) {
+        auto s = wd.base.get_s(i);
+        for (int a = 0; a < width; a++) {
+            owned[i * width + a] = s[a] % wd.t;
+        }
+    });
+    data = owned.data();
+}
+
+WeakDesignTable::WeakDesignTable(const uint16_t *data, int rows, int width) : data(data), rows(rows), width(width) {}
+
 RSHExtractor::RSHExtractor(int n, int l) : field(l), n(n), l(l) {
     s = (n + l - 1) / l;
 }
 
-poly_bits RSHExtractor::reed_solomon_step(const vector<bool> &r_input, const vector<bool> &alpha_bits) {
+vector<uint64_t> RSHExtractor::coefficients(const vector<bool> &r_input) const {
     // reverse bits to do conversion using big-endian convention
     // Example: 0101 -> 5 instead of 0101 -> 10
-    // the coefficients of RS are reversed
-    auto coeffs = vector<poly_bits>(s);
+    // the coefficients of RS are reversed; bits past the input are 0
+    int words = field.words;
+    auto coeffs = vector<uint64_t>(s * words);
     for (size_t i = 0; i < s; i++) {
-        for (size_t j = 0; j < l; j++) {
-            coeffs[s - i - 1][j] = r_input[i*l + j];
+        uint64_t *coeff = coeffs.data() + (s - i - 1) * words;
+        for (size_t j = 0; j < l && i*l + j < r_input.size(); j++) {
+            coeff[j / 64] |= uint64_t(r_input[i*l + j]) << (j % 64);
         }
     }
+    return coeffs;
+}
 
-    auto alpha = poly_bits();
+GF2k::element RSHExtractor::reed_solomon_step(const vector<uint64_t> &coeffs, const vector<bool> &alpha_bits) const {
+    auto alpha = GF2k::element();
     for (size_t i = 0; i < alpha_bits.size(); i++) {
-        alpha[i] = alpha_bits[i];
+        alpha[i / 64] |= uint64_t(alpha_bits[i]) << (i % 64);
     }
-    poly_bits r = field.horner_method(coeffs, alpha);
-    return r;
+    return field.horner(coeffs.data(), s, alpha);
+}
+
+GF2k::element RSHExtractor::reed_solomon_step(const vector<bool> &r_input, const vector<bool> &alpha_bits) const {
+    return reed_solomon_step(coefficients(r_input), alpha_bits);
 }
 
-bool RSHExtractor::hadamard_step(poly_bits r_bits, vector<bool> beta) {
+bool RSHExtractor::hadamard_step(const GF2k::element &r_bits, const vector<bool> &beta) {
     bool b = 0;
-    for (size_t i = 0; i < r_bits.size(); i++) {
-        bool r_bit = r_bits[i], beta_bit = beta[i];
+    for (size_t i = 0; i < beta.size(); i++) {
+        bool r_bit = (r_bits[i / 64] >> (i % 64)) & 1, beta_bit = beta[i];
         b ^= r_bit & beta_bit;
     }
     return b;
 }
 
-bool RSHExtractor::extract(vector<bool> &r_input, const vector<bool> &r_seed) {
-    if (r_input.size() != n && r_input.size() != s*l) {
-        cerr << "Actual: " << r_input.size() << " Expected: " << n << endl;
+bool RSHExtractor::extract(const vector<uint64_t> &coeffs, const vector<bool> &r_seed) const {
+    if (coeffs.size() != s * field.words) {
+        cerr << "Actual: " << coeffs.size() << " Expected: " << s * field.words << endl;
         throw runtime_error("Input length doesn't match extractor parameters");
     }
     if (r_seed.size() != 2*l) {
@@ -195,17 +250,66 @@ bool RSHExtractor::extract(vector<bool> &r_input, const vector<bool> &r_seed) {
     auto alpha_bits = vector<bool>(r_seed.begin(), r_seed.begin() + l);
     auto beta_bits = vector<bool>(r_seed.begin() + l, r_seed.end());
 
-    // right pad input bits with zeros
-    while (r_input.size() < s*l) {
-        r_input.push_back(0);
-    }
-    poly_bits r = reed_solomon_step(r_input, alpha_bits);
+    GF2k::element r = reed_solomon_step(coeffs, alpha_bits);
 
     // extract the bits of r
     bool b = hadamard_step(r, beta_bits);
     return b;
 }
 
+vector<uint8_t> RSHExtractor::extract_many(const vector<uint64_t> &coeffs, const vector<GF2k::element> &alphas,
+                                           const vector<GF2k::element> &betas) const {
+    if (coeffs.size() != s * field.words) {
+        cerr << "Actual: " << coeffs.size() << " Expected: " << s * field.words << endl;
+        throw runtime_error("Input length doesn't match extractor parameters");
+    }
+
+    // Each distinct alpha is evaluated once
+    auto order = vector<uint32_t>(alphas.size());
+    for (size_t i = 0; i < order.size(); i++) {
+        order[i] = i;
+    }
+    sort(order.begin(), order.end(), [&](uint32_t a, uint32_t b) { return alphas[a] < alphas[b]; });
+    auto points = vector<GF2k::element>();
+    auto point_of = vector<uint32_t>(alphas.size());
+    for (uint32_t i : order) {
+        if (points.empty() || points.back() != alphas[i]) {
+            points.push_back(alphas[i]);
+        }
+        point_of[i] = points.size() - 1;
+    }
+
+    auto values = vector<GF2k::element>(points.size());
+    const size_t piece = 256;
+    parallel_for((points.size() + piece - 1) / piece, [&](size_t p) {
+        size_t first = p * piece, count = min(piece, points.size() - first);
+        field.horner_many(coeffs.data(), s, points.data() + first, count, values.data() + first);
+    });
+
+    // hadamard_step, a word at a time
+    auto bits = vector<uint8_t>(alphas.size());
+    for (size_t i = 0; i < bits.size(); i++) {
+        const GF2k::element &r = values[point_of[i]];
+        uint64_t b = 0;
+        for (int w = 0; w < field.words; w++) {
+            b ^= r[w] & betas[i][w];
+        }
+        for (int shift = 32; shift; shift >>= 1) {
+            b ^= b >> shift;
+        }
+        bits[i] = b & 1;
+    }
+    return bits;
+}
+
+bool RSHExtractor::extract(const vector<bool> &r_input, const vector<bool> &r_seed) const {
+    if (r_input.size() != n && r_input.size() != s*l) {
+        cerr << "Actual: " << r_input.size() << " Expected: " << n << endl;
+        throw runtime_error("Input length doesn't match extractor parameters");
+    }
+    return extract(coefficients(r_input), r_seed);
+}
+
 TrevisanConfig::TrevisanConfig(int n, int k, double max_eps) : n(n) {
     double r = BlockWeakDesign::r;
     // choose largest m s.t. m*eps <= max_eps
@@ -238,42 +342,95 @@ int Trevisan::get_seed_length() const {
     return wd.d;
 }
 
-void Trevisan::load_source(const vector<bool> &source_inp, const vector<bool> &source_seed) {
-    if (source_inp.size() != n) {
-        cerr << "Actual: " << source_inp.size() << " Expected: " << n << endl;
+shared_ptr<const WeakDesignTable> Trevisan::design_table() {
+    lock_guard<mutex> guard(design_lock);
+    if (!table) {
+        table = BlockWeakDesign::shared_table(wd, 2 * l);
+    }
+    return table;
+}
+
+void Trevisan::set_design_table(shared_ptr<const WeakDesignTable> design) {
+    if (design->rows != wd.base_size() || design->width != 2 * l) {
+        cerr << "Actual: " << design->rows << " x " << design->width
+             << " Expected: " << wd.base_size() << " x " << 2 * l << endl;
+        throw runtime_error("Weak design table doesn't match extractor parameters");
+    }
+    lock_guard<mutex> guard(design_lock);
+    table = move(design);
+}
+
+void Trevisan::check_source(const vector<bool> &inp, const vector<bool> &seed) const {
+    if (inp.size() != n) {
+        cerr << "Actual: " << inp.size() << " Expected: " << n << endl;
         throw runtime_error("Input length doesn't match extractor parameters");
     }
-    if (source_seed.size() != get_seed_length()){
-        cerr << "Actual: " << source_seed.size() << " Expected: " << get_seed_length() << endl;
+    if (seed.size() != get_seed_length()){
+        cerr << "Actual: " << seed.size() << " Expected: " << get_seed_length() << endl;
         throw runtime_error("Seed length doesn't match extractor parameters");
     }
-    source_loaded = true;
-    this->source_inp = source_inp;
-    this->source_seed = source_seed;
 }
 
-vector<bool> Trevisan::extract() {
-    auto bits = vector<bool>(m);
-    for (int i = 0; i < m; i++) {
-        bits[i] = extract_bit(i);
-        cout << bits[i];
-    }
-    cout << endl;
+thread_local unordered_map<const Trevisan *, Trevisan::LoadedSource> Trevisan::loaded_sources;
 
-    return bits;
+void Trevisan::load_source(const vector<bool> &source_inp, const vector<bool> &source_seed) {
+    check_source(source_inp, source_seed);
+    auto source = Source{ext.coefficients(source_inp), source_seed};
+    for (auto it = loaded_sources.begin(); it != loaded_sources.end();) {
+        it = it->second.owner.expired() ? loaded_sources.erase(it) : next(it);
+    }
+    loaded_sources[this] = LoadedSource{lifetime, move(source)};
 }
 
-bool Trevisan::extract_bit(int i) {
-    if (!source_loaded) {
+Trevisan::Source &Trevisan::loaded_source() {
+    auto source = loaded_sources.find(this);
+    if (source == loaded_sources.end() || source->second.owner.expired()) {
         throw runtime_error("Load source with load_source(input, seed).");
     }
+    return source->second.source;
+}
 
+bool Trevisan::output_bit(const vector<uint64_t> &coeffs, const vector<bool> &seed, int i) {
     auto design_set = wd.get_s(i);
     auto selected_bits = vector<bool>(2*l);
     for (int j = 0; j < 2*l; j++) {
-        selected_bits[j] = source_seed[design_set[j]];
+        selected_bits[j] = seed[design_set[j]];
     }
+    return ext.extract(coeffs, selected_bits);
+}
+
+vector<uint8_t> Trevisan::extract_coeffs(const vector<uint64_t> &coeffs, const vector<bool> &seed) {
+    // The seed bits selected by the weak design: alpha, then beta
+    auto table = design_table();
+    auto alphas = vector<GF2k::element>(m), betas = vector<GF2k::element>(m);
+    parallel_for(m, [&](size_t i) {
+        uint32_t design_set[2 * GF2k::MAX_WORDS * 64];
+        wd.get_s(*table, i, design_set);
+        for (int j = 0; j < l; j++) {
+            alphas[i][j / 64] |= uint64_t(seed[design_set[j]]) << (j % 64);
+            betas[i][j / 64] |= uint64_t(seed[design_set[l + j]]) << (j % 64);
+        }
+    });
+    return ext.extract_many(coeffs, alphas, betas);
+}
 
-    bool bit = ext.extract(source_inp, selected_bits);
-    return bit;
+vector<uint8_t> Trevisan::extract_all(const vector<bool> &inp, const vector<bool> &seed) {
+    check_source(inp, seed);
+    return extract_coeffs(ext.coefficients(inp), seed);
+}
+
+vector<bool> Trevisan::extract_block(const vector<bool> &inp, const vector<bool> &seed) {
+    auto bits = extract_all(inp, seed);
+    return vector<bool>(bits.begin(), bits.end());
+}
+
+vector<bool> Trevisan::extract() {
+    Source &source = loaded_source();
+    auto bits = extract_coeffs(source.coeffs, source.seed);
+    return vector<bool>(bits.begin(), bits.end());
+}
+
+bool Trevisan::extract_bit(int i) {
+    Source &source = loaded_source();
+    return output_bit(source.coeffs, source.seed, i);
 }
@@ -1,12 +1,18 @@
 #pragma once
 
+#include "gf2k.h"
+
 #include <bitset>
 #include <cstdint>
+#include <memory>
+#include <mutex>
+#include <unordered_map>
 #include <vector>
 
 typedef std::bitset<256> poly_bits;
 
-// Implements ring operations in the Galois field (GF(t))
+// Implements ring operations in the Galois field (GF(t)), bit by bit: the
+// reference for GF2k (gf2k.h), which the extractors use
 class GF2Poly {
   public:
     // The order of the Galois field `t` must be a power of two. log(t) can
@@ -27,7 +33,7 @@ class GF2Poly {
 class HRWeakDesign {
   private:
     int c, log_t, mask;
-    GF2Poly field;
+    GF2k field;
 
   public:
     static constexpr double r = 5.43656365691809; // 2 * e
@@ -36,7 +42,33 @@ class HRWeakDesign {
     HRWeakDesign(int m, int log_t);
 
     // Returns the ith subset of the HR weak design
-    std::vector<uint64_t> get_s(int i);
+    std::vector<uint64_t> get_s(int i) const;
+};
+
+class BlockWeakDesign;
+
+// The first `width` indices of every subset of a block weak design in one
+// contiguous array. Every block repeats the subsets of the base (HR)
+// design shifted by block * t^2, and index a < t of a base subset is
+// a t + b with b < t, so only the base subsets are stored, as b: row i
+// holds entries [i width, (i + 1) width). The table either owns its
+// entries or views ones held elsewhere, e.g. in a file mapped into memory.
+class WeakDesignTable {
+  private:
+    std::vector<uint16_t> owned;
+    const uint16_t *data;
+
+  public:
+    int rows, width;
+
+    // Tabulates the design, in parallel
+    WeakDesignTable(const BlockWeakDesign &wd, int width);
+
+    // Views rows * width entries, which must outlive the table
+    WeakDesignTable(const uint16_t *data, int rows, int width);
+
+    const uint16_t *entries() const { return data; }
+    const uint16_t *row(int i) const { return data + size_t(i) * width; }
 };
 
 // Implements the block weak design from Maurer et al.
@@ -52,24 +84,55 @@ class BlockWeakDesign {
 
     BlockWeakDesign(int m, int log_t);
 
+    // The number of subsets of the base design, the rows of its tables
+    int base_size() const { return base.m; }
+
     // Returns the ith subset of the block weak design.
-    std::vector<uint64_t> get_s(int i);
+    std::vector<uint64_t> get_s(int i) const;
+
+    // The first table.width indices of the ith subset, looked up in the
+    // table of this design
+    void get_s(const WeakDesignTable &table, int i, uint32_t *s) const;
+
+    // The table of the first `width` indices of every subset, shared by
+    // all designs with the same parameters while any of them is in use
+    static std::shared_ptr<const WeakDesignTable> shared_table(const BlockWeakDesign &wd, int width);
+
+  private:
+    friend class WeakDesignTable;
+
+    // The block of the ith subset
+    int block(int i) const;
 };
 
 // Implements the Reed-Solomon-Hadamard extractor.
 class RSHExtractor {
   private:
-    GF2Poly field;
+    GF2k field;
   public:
     int n, l, s;
 
     RSHExtractor(int n, int l);
 
-    poly_bits reed_solomon_step(const std::vector<bool> &r_input, const std::vector<bool> &alpha_bits);
+    // The input (n or s * l bits) as the s field elements of the
+    // Reed-Solomon step, in the order GF2k::horner takes them. It is the
+    // same for every output bit of an input, so it can be computed once.
+    std::vector<uint64_t> coefficients(const std::vector<bool> &r_input) const;
+
+    GF2k::element reed_solomon_step(const std::vector<uint64_t> &coeffs, const std::vector<bool> &alpha_bits) const;
+    GF2k::element reed_solomon_step(const std::vector<bool> &r_input, const std::vector<bool> &alpha_bits) const;
+
+    static bool hadamard_step(const GF2k::element &r_bits, const std::vector<bool> &beta);
 
-    static bool hadamard_step(poly_bits r_bits, std::vector<bool> beta);
+    // Extracts one bit from the input, given as its coefficients
+    bool extract(const std::vector<uint64_t> &coeffs, const std::vector<bool> &r_seed) const;
+    bool extract(const std::vector<bool> &r_input, const std::vector<bool> &r_seed) const;
 
-    bool extract(std::vector<bool> &r_input, const std::vector<bool> &r_seed);
+    // Extracts one bit per seed, given as its halves alpha and beta, from
+    // the input given as its coefficients. Each distinct alpha is
+    // evaluated once, blocks of them together and spread over the threads.
+    std::vector<uint8_t> extract_many(const std::vector<uint64_t> &coeffs, const std::vector<GF2k::element> &alphas,
+                                      const std::vector<GF2k::element> &betas) const;
 };
 
 class TrevisanConfig {
@@ -81,22 +144,75 @@ class TrevisanConfig {
     TrevisanConfig(int n, int k, double max_eps);
 };
 
+// The extractor itself is read-only once built. Each thread loads its own
+// source, held in thread-local storage, so threads sharing an extractor can
+// extract different blocks.
 class Trevisan {
   private:
+    // The input as Reed-Solomon coefficients, and the seed
+    struct Source {
+        std::vector<uint64_t> coeffs;
+        std::vector<bool> seed;
+    };
+
     BlockWeakDesign wd;
     RSHExtractor ext;
-    std::vector<bool> source_inp;
-    std::vector<bool> source_seed;
+    std::mutex design_lock;
+    std::shared_ptr<const WeakDesignTable> table;
+    // Expires with the extractor, so that the sources loaded into it are
+    // not taken for those of a later extractor at the same address
+    std::shared_ptr<const bool> lifetime = std::make_shared<const bool>(true);
+
+    struct LoadedSource {
+        std::weak_ptr<const bool> owner;
+        Source source;
+    };
+    // The sources loaded by the calling thread, by extractor. They are freed
+    // when the thread exits, or when it next loads a source once their
+    // extractor is destroyed.
+    static thread_local std::unordered_map<const Trevisan *, LoadedSource> loaded_sources;
+
+    // The source loaded by the calling thread
+    Source &loaded_source();
+
+    // Throws if the input or seed length doesn't match the parameters
+    void check_source(const std::vector<bool> &inp, const std::vector<bool> &seed) const;
+
+    // Output bit i of the input, given as Reed-Solomon coefficients
+    bool output_bit(const std::vector<uint64_t> &coeffs, const std::vector<bool> &seed, int i);
+
+    // All m output bits, one per byte, in parallel
+    std::vector<uint8_t> extract_coeffs(const std::vector<uint64_t> &coeffs, const std::vector<bool> &seed);
   public:
     int n, m, l;
-    bool source_loaded = false;
 
     explicit Trevisan(TrevisanConfig config);
 
     int get_seed_length() const;
 
+    // The table of the weak design used by extract and extract_all, built
+    // (or taken from the extractors sharing it) on first use. It only
+    // depends on the configuration, so that it can be saved.
+    std::shared_ptr<const WeakDesignTable> design_table();
+
+    // Uses the given table of the weak design, e.g. one saved from
+    // design_table and mapped back into memory, instead of building it.
+    // Throws if its shape doesn't match the configuration.
+    void set_design_table(std::shared_ptr<const WeakDesignTable> design);
+
+    // Loads the input and seed for the calling thread, the input packed
+    // into Reed-Solomon coefficients once for all output bits
     void load_source(const std::vector<bool> &source_inp, const std::vector<bool> &source_seed);
 
+    // Extracts all m bits from the loaded source
     std::vector<bool> extract();
     bool extract_bit(int i);
+
+    // Extracts all m bits from the given input and seed, one per byte, the
+    // bits spread over the threads set by set_num_threads. The loaded
+    // source is not touched, so that blocks can be extracted concurrently.
+    std::vector<uint8_t> extract_all(const std::vector<bool> &inp, const std::vector<bool> &seed);
+
+    // As extract_all, as bools
+    std::vector<bool> extract_block(const std::vector<bool> &inp, const std::vector<bool> &seed);
 };
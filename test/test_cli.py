@@ -0,0 +1,125 @@
+import mmap
+
+import numpy as np
+import pytest
+from cryptomite import Circulant, Dodis, Toeplitz, Trevisan, raz
+from cryptomite.cli import main
+from cryptomite.utils import von_neumann
+
+
+def write_bits(path, bits):
+    path.write_bytes(np.packbits(bits).tobytes())
+
+
+def read_bits(path, nbits):
+    return np.unpackbits(np.frombuffer(path.read_bytes(), dtype=np.uint8))[:nbits]
+
+
+@pytest.mark.parametrize('batch', [None, 2])
+@pytest.mark.parametrize('name,n_1,k_1,n_2,k_2,per_block,engine', [
+    ('toeplitz', 100, 90, 150, 150, False, None),
+    ('toeplitz', 96, 90, 150, 150, True, 'gf2'),
+    ('circulant', 100, 90, 100, 100, False, 'gf2'),
+    ('dodis', 100, 90, 101, 95, True, None),
+    ('raz', 254, 250, 100, 99, False, None),
+    ('raz', 254, 250, 127, 120, True, 'ntt'),
+    ('trevisan', 100, 90, None, None, False, None),
+    ('von-neumann', None, None, None, None, False, None),
+])
+def test_cli_extract(tmp_path, name, n_1, k_1, n_2, k_2, per_block, engine,
+                     batch):
+    data = np.random.randint(0, 2, 1000)
+    seed = np.random.randint(0, 2, 10000)
+    write_bits(tmp_path / 'in.bin', data)
+    write_bits(tmp_path / 'seed.bin', seed)
+    args = ['extract', '--extractor', name, '--input', str(tmp_path / 'in.bin'),
+            '--out', str(tmp_path / 'out.bin')]
+    if name != 'von-neumann':
+        args += ['--seed', str(tmp_path / 'seed.bin'), '--log2-error', '-2']
+    for flag, value in [('--n-1', n_1), ('--k-1', k_1), ('--n-2', n_2),
+                        ('--k-2', k_2), ('--batch', batch),
+                        ('--engine', engine)]:
+        if value is not None:
+            args += [flag, str(value)]
+    if per_block:
+        args.append('--seed-per-block')
+    assert main(args) == 0
+
+    if name == 'von-neumann':
+        expected = von_neumann(data.tolist())
+    else:
+        if name == 'toeplitz':
+            ext = Toeplitz.from_params(n_1, k_1, n_2, k_2, -2, False, False)
+            n, d = ext.n_1, ext.n_1 + ext.m - 1
+        elif name == 'circulant':
+            ext = Circulant.from_params(n_1, k_1, n_2, k_2, -2, False, False)
+            n, d = ext.n_1, ext.n_1 + 1
+        elif name == 'dodis':
+            ext = Dodis.from_params(n_1, k_1, n_2, k_2, -2, False, False)
+            n, d = ext.n, ext.n
+        elif name == 'raz':
+            ext = raz.from_params(n_1, k_1, n_2, k_2, -2)
+            n, d = n_1, n_1 // 2
+            seed[n_2:d] = 0
+        else:
+            ext = Trevisan(n_1, k_1, 0.25)
+            n, d = n_1, ext.ext.get_seed_length()
+        blocks = len(data) // n
+        if per_block:
+            blocks = min(blocks, len(seed) // d)
+        # The single-block extract on bit lists, not the batched path the
+        # command line takes
+        expected = []
+        for i in range(blocks):
+            y = seed[i * d:(i + 1) * d] if per_block else seed[:d]
+            expected += ext.extract(data[i * n:(i + 1) * n].tolist(), y.tolist())
+    assert read_bits(tmp_path / 'out.bin', len(expected)).tolist() == list(expected)
+    assert (tmp_path / 'out.bin').stat().st_size == (len(expected) + 7) // 8
+
+
+def test_cli_errors(tmp_path):
+    (tmp_path / 'in.bin').write_bytes(b'\0' * 10)
+    args = ['extract', '--extractor', 'toeplitz', '--input', str(tmp_path / 'in.bin'),
+            '--out', str(tmp_path / 'out.bin')]
+    assert main(args) == 1
+    assert main(args + ['--seed', str(tmp_path / 'missing.bin'), '--n-1', '10', '--k-1', '9']) == 1
+
+
+@pytest.mark.parametrize('name,option', [
+    ('trevisan', ['--n-2', '100']),
+    ('trevisan', ['--k-2', '90']),
+    ('trevisan', ['--engine', 'gf2']),
+    ('trevisan', ['--q-proof']),
+    ('raz', ['--q-proof']),
+    ('raz', ['--engine', 'crt']),
+    ('von-neumann', ['--seed', 'seed.bin']),
+    ('von-neumann', ['--log2-error', '-2']),
+])
+def test_cli_rejects_options(tmp_path, capsys, name, option):
+    (tmp_path / 'in.bin').write_bytes(b'\0' * 10)
+    args = ['extract', '--extractor', name, '--input', str(tmp_path / 'in.bin'),
+            '--out', str(tmp_path / 'out.bin')]
+    with pytest.raises(SystemExit) as e:
+        main(args + option)
+    assert e.value.code == 2
+    assert 'does not apply' in capsys.readouterr().err
+    assert not (tmp_path / 'out.bin').exists()
+
+
+def test_cli_closes_maps(tmp_path, monkeypatch):
+    maps = []
+
+    class RecordedMap(mmap.mmap):
+        def __init__(self, *args, **kwargs):
+            maps.append(self)
+
+    monkeypatch.setattr(mmap, 'mmap', RecordedMap)
+    write_bits(tmp_path / 'in.bin', np.random.randint(0, 2, 1000))
+    write_bits(tmp_path / 'seed.bin', np.random.randint(0, 2, 1000))
+    assert main(['extract', '--extractor', 'toeplitz',
+                 '--input', str(tmp_path / 'in.bin'),
+                 '--seed', str(tmp_path / 'seed.bin'),
+                 '--out', str(tmp_path / 'out.bin'),
+                 '--n-1', '100', '--k-1', '90', '--log2-error', '-2']) == 0
+    assert len(maps) == 2
+    assert all(m.closed for m in maps)
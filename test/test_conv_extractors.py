@@ -0,0 +1,116 @@
+"""
+Tests shared by the convolution extractors (Toeplitz, Circulant and
+Dodis), checked against the pure-Python definitions below on random
+inputs. The known answers of each extractor are in its own module.
+"""
+import numpy as np
+import pytest
+from cryptomite import Circulant, Dodis, Toeplitz
+
+
+def toeplitz_reference(x, y, n, m):
+    # Row i, column j of the Toeplitz matrix is y[i - j], wrapping to the
+    # last n - 1 bits of y above the diagonal.
+    return [sum(x[j] & y[i - j if i >= j else n + m - 1 + i - j]
+                for j in range(n)) & 1 for i in range(m)]
+
+
+def circulant_reference(x, y, n, m):
+    return [sum(x[j] & y[(i + j) % (n + 1)] for j in range(n)) & 1
+            for i in range(m)]
+
+
+def dodis_reference(x, y, n, m):
+    return [sum(x[j] & y[(i + j) % n] for j in range(n)) & 1
+            for i in range(m)]
+
+
+# The extractor, the length of its seed and its pure-Python reference
+extractors = [
+    pytest.param(Toeplitz, lambda n, m: n + m - 1, toeplitz_reference,
+                 id='toeplitz'),
+    pytest.param(Circulant, lambda n, m: n + 1, circulant_reference,
+                 id='circulant'),
+    pytest.param(Dodis, lambda n, m: n, dodis_reference, id='dodis'),
+]
+
+sizes = [(3, 1), (8, 8), (9, 5), (64, 17), (100, 100)]
+
+bit_buffers = [
+    lambda v: np.array(v, dtype=np.uint8),
+    lambda v: np.array(v, dtype=bool),
+    lambda v: np.array(v),
+    lambda v: np.repeat(np.array(v, dtype=np.uint8), 2)[::2],
+    lambda v: bytes(v),
+    lambda v: bytearray(v),
+    lambda v: memoryview(bytes(v)),
+]
+
+packed_bit_buffers = [
+    lambda v: np.packbits(v),
+    lambda v: np.packbits(v).tobytes(),
+    lambda v: list(np.packbits(v)),
+]
+
+
+def random_case(seed_length, reference, n, m):
+    x = np.random.randint(0, 2, n).tolist()
+    y = np.random.randint(0, 2, seed_length(n, m)).tolist()
+    return x, y, reference(x, y, n, m)
+
+
+@pytest.mark.parametrize('engine', [None, 'ntt', 'bigntt', 'crt', 'gf2'])
+@pytest.mark.parametrize('n,m', sizes)
+@pytest.mark.parametrize('cls,seed_length,reference', extractors)
+def test_engines(cls, seed_length, reference, n, m, engine):
+    x, y, z = random_case(seed_length, reference, n, m)
+    ext = cls(n, m, engine=engine)
+    assert ext.extract(x, y) == z
+    assert ext.with_seed(y).extract(np.packbits(x), packed_input=True) == z
+    assert ext.extract_many([x, x], y).tolist() == [z, z]
+
+
+@pytest.mark.parametrize('as_buffer', bit_buffers)
+@pytest.mark.parametrize('n,m', sizes)
+@pytest.mark.parametrize('cls,seed_length,reference', extractors)
+def test_buffers(cls, seed_length, reference, n, m, as_buffer):
+    x, y, z = random_case(seed_length, reference, n, m)
+    assert cls(n, m).extract(as_buffer(x), as_buffer(y)) == z
+
+
+@pytest.mark.parametrize('as_buffer', packed_bit_buffers)
+@pytest.mark.parametrize('n,m', sizes)
+@pytest.mark.parametrize('cls,seed_length,reference', extractors)
+def test_packed_buffers(cls, seed_length, reference, n, m, as_buffer):
+    x, y, z = random_case(seed_length, reference, n, m)
+    ext = cls(n, m)
+    assert ext.extract(as_buffer(x), as_buffer(y), packed_input=True) == z
+    # The packing is never guessed from the length
+    with pytest.raises(ValueError):
+        ext.extract(as_buffer(x), as_buffer(y))
+    with pytest.raises(ValueError):
+        ext.extract(x, as_buffer(y), packed_input=True)
+
+
+@pytest.mark.parametrize('n,m', sizes)
+@pytest.mark.parametrize('cls,seed_length,reference', extractors)
+def test_with_seed(cls, seed_length, reference, n, m):
+    x, y, z = random_case(seed_length, reference, n, m)
+    ext = cls(n, m).with_seed(y)
+    assert ext.extract(x) == z
+    assert ext.extract(np.packbits(x), packed_input=True) == z
+    packed = cls(n, m).with_seed(np.packbits(y), packed_input=True)
+    assert packed.extract(x) == z
+
+
+@pytest.mark.parametrize('n,m', sizes)
+@pytest.mark.parametrize('cls,seed_length,reference', extractors)
+def test_extract_many(cls, seed_length, reference, n, m):
+    x, y, z = random_case(seed_length, reference, n, m)
+    ext = cls(n, m)
+    assert ext.extract_many([x, x], [y, y]).tolist() == [z, z]
+    assert ext.extract_many(np.array([x] * 3), y).tolist() == [z] * 3
+    packed = np.packbits(np.array([x] * 2, dtype=np.uint8), axis=1)
+    seeds = np.packbits(np.array([y], dtype=np.uint8), axis=1)
+    assert ext.extract_many(packed, seeds,
+                            packed_input=True).tolist() == [z] * 2
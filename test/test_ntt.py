@@ -1,5 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
 import pytest
-from cryptomite._cryptomite import BigNTT, NTT
+from cryptomite import Circulant, Dodis, Toeplitz, _cryptomite
+from cryptomite._cryptomite import BigNTT, CrtNTT, GF2Conv, NTT
+from cryptomite.utils import (clear_plan_cache, conv_plan, engine_info,
+                              get_num_threads, ntt_plan, plan_cache_info,
+                              set_num_threads, set_plan_cache_limit)
 import numpy as np
 
 test_range = list(range(2, 21))
@@ -45,3 +52,172 @@ def test_big_ntt_conv(n):
     a = np.random.randint(0, 2, 1 << n).tolist()
     b = np.random.randint(0, 2, 1 << n).tolist()
     assert ntt.conv(a, b) == big_ntt.conv(a, b)
+
+
+@pytest.mark.parametrize('n', list(range(1, 9)))
+def test_radix3_conv(n):
+    a = np.random.randint(0, 2, 3 << n).tolist()
+    b = np.random.randint(0, 2, 3 << n).tolist()
+    for ntt in NTT(n, threes=1), BigNTT(n, threes=1):
+        assert ntt.size == 3 << n
+        assert ntt.conv(a, b) == slow_conv(a, b)
+        v = np.random.randint(0, 1 << 30, 3 << n).tolist()
+        assert ntt.ntt(ntt.ntt(v, False), True) == v
+    with pytest.raises(ValueError):
+        NTT(n, threes=2)
+
+
+@pytest.mark.parametrize('n,row_l,primes,high', [
+    (1, 22, 0, 2), (6, 22, 0, 2), (8, 2, 0, 2), (9, 4, 1, 1 << 10),
+    (8, 3, 2, 1 << 24), (10, 6, 2, 1 << 26)])
+def test_crt_ntt_conv(n, row_l, primes, high):
+    # Short rows exercise the transform across rows, large values the
+    # combination of the residues mod both primes
+    ntt = CrtNTT(n, row_l, primes)
+    assert ntt.size == 1 << n
+    assert ntt.primes == (primes or 1)
+    a = np.random.randint(0, high, 1 << n).tolist()
+    b = np.random.randint(0, high, 1 << n).tolist()
+    assert ntt.conv(a, b) == slow_conv(a, b)
+    with pytest.raises(ValueError):
+        CrtNTT(40, 10)
+
+
+def test_crt_ntt_extract():
+    x = np.random.randint(0, 2, 300).tolist()
+    y = np.random.randint(0, 2, 499).tolist()
+    for row_l in [4, 22]:
+        crt = ntt_plan(10, 'crt') if row_l == 22 else CrtNTT(10, row_l, 2)
+        assert (_cryptomite.toeplitz_extract(crt, x, y, 300, 200)
+                == _cryptomite.toeplitz_extract(NTT(10), x, y, 300, 200))
+
+
+@pytest.mark.parametrize('n', [1, 2, 6, 7, 11])
+def test_gf2_conv(n):
+    info = engine_info()
+    assert info['gf2x_kernel'] == info['available_gf2x_kernels'][0]
+    a = np.random.randint(0, 2, 1 << n).tolist()
+    b = np.random.randint(0, 2, 1 << n).tolist()
+    expected = [c % 2 for c in slow_conv(a, b)]
+    for kernel in info['available_gf2x_kernels']:
+        gf2 = GF2Conv(n, kernel)
+        assert gf2.kernel == kernel and gf2.size == 1 << n
+        assert gf2.conv(a, b) == expected
+    # (1 + x)(1 + x + x^64) = 1 + x^2 + x^64 + x^65
+    assert GF2Conv(n).mul([3], [3, 1]) == [5, 3, 0]
+    with pytest.raises(ValueError):
+        GF2Conv(n, 'neon')
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 5, 12])
+def test_ntt_kernels(n):
+    info = engine_info()
+    assert info['ntt_kernel'] == info['available_ntt_kernels'][0]
+    assert NTT(n).kernel == info['ntt_kernel']
+    scalar = NTT(n, 'scalar')
+    a = np.random.randint(0, 2, 1 << n).tolist()
+    b = np.random.randint(0, 2, 1 << n).tolist()
+    for kernel in info['available_ntt_kernels']:
+        assert NTT(n, kernel).conv(a, b) == scalar.conv(a, b)
+    with pytest.raises(ValueError):
+        NTT(n, 'neon')
+
+
+@pytest.mark.parametrize('n', [14, 15, 17])
+def test_ntt_threads(n):
+    a = np.random.randint(0, 2, 1 << n).tolist()
+    b = np.random.randint(0, 2, 1 << n).tolist()
+    set_num_threads(1)
+    expected = NTT(n).conv(a, b), BigNTT(n).conv(a, b)
+    set_num_threads(4)
+    assert get_num_threads() == engine_info()['num_threads'] == 4
+    assert (NTT(n).conv(a, b), BigNTT(n).conv(a, b)) == expected
+    set_num_threads(None)
+    with pytest.raises(ValueError):
+        set_num_threads(0)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_ntt_threads_after_fork():
+    # The thread pool is not inherited by forked processes, which start
+    # their own
+    a = np.random.randint(0, 2, 1 << 16).tolist()
+    b = np.random.randint(0, 2, 1 << 16).tolist()
+    set_num_threads(4)
+    try:
+        expected = NTT(16).conv(a, b)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(int(NTT(16).conv(a, b) != expected))
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    finally:
+        set_num_threads(None)
+
+
+@pytest.mark.parametrize('engine', [NTT, BigNTT, CrtNTT])
+def test_ntt_shared_between_threads(engine):
+    # The GIL is released in native calls, so a shared plan is used
+    # concurrently
+    ntt = engine(12)
+    pairs = [(np.random.randint(0, 2, 1 << 12).tolist(),
+              np.random.randint(0, 2, 1 << 12).tolist()) for _ in range(8)]
+    expected = [ntt.conv(a, b) for a, b in pairs]
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(lambda p: ntt.conv(*p), pairs)) == expected
+
+
+def test_plan_cache():
+    clear_plan_cache()
+    plan = ntt_plan(10)
+    assert ntt_plan(10) is plan
+    assert ntt_plan(10, 'bigntt') is not plan
+    info = plan_cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert info.plans == [('ntt', 10), ('bigntt', 10)]
+    assert info.nbytes == plan.nbytes + ntt_plan(10, 'bigntt').nbytes
+
+    # least recently used plans are evicted first
+    limit = ntt_plan(11).nbytes + plan.nbytes
+    assert ntt_plan(10) is plan
+    set_plan_cache_limit(limit)
+    assert plan_cache_info().plans == [('ntt', 11), ('ntt', 10)]
+    set_plan_cache_limit(0)
+    assert plan_cache_info().plans == []
+    assert ntt_plan(10) is not plan
+    set_plan_cache_limit(1 << 30)
+    clear_plan_cache()
+
+
+@pytest.mark.parametrize('n,engine,size', [
+    (1, None, 2), (5, None, 6), (13, None, 16), (24, 'bigntt', 24),
+    (25, None, 32), (3000, None, 3072), (3000, 'crt', 4096),
+    (3000, 'gf2', 4096), (1 << 31, 'gf2', 1 << 31)])
+def test_conv_plan(n, engine, size):
+    clear_plan_cache()
+    plan = conv_plan(n, engine)
+    assert plan.size == size
+    if size & (size - 1):
+        assert plan_cache_info().plans == [(engine or 'ntt', (size // 3).bit_length() - 1, 1)]
+    clear_plan_cache()
+
+
+def test_conv_plan_extract():
+    # n_1 + m - 1 = 4999 fits a transform of 3 * 2^11
+    x = np.random.randint(0, 2, 3000)
+    y = np.random.randint(0, 2, 4999)
+    expected = Toeplitz(3000, 2000, engine='gf2').extract(x, y)
+    assert Toeplitz(3000, 2000).extract(x, y) == expected
+    assert Toeplitz(3000, 2000, engine='bigntt').extract(x, y) == expected
+
+
+@pytest.mark.parametrize('engine', ['ntt', 'bigntt', 'crt'])
+def test_pruned_extract(engine):
+    # Few output bits: the inverse transforms compute only those
+    n, m = 5000, 13
+    x = np.random.randint(0, 2, n)
+    for cls, d in ((Toeplitz, n + m - 1), (Circulant, n + 1), (Dodis, n)):
+        y = np.random.randint(0, 2, d)
+        expected = cls(n, m, engine='gf2').extract(x, y)
+        assert cls(n, m, engine=engine).extract(x, y) == expected
+        assert cls(n, m, engine=engine).with_seed(y).extract(x) == expected
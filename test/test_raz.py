@@ -0,0 +1,101 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from cryptomite import raz
+from cryptomite.raz import Raz
+
+
+@pytest.mark.parametrize('n_1,m', [(6, 2), (30, 10), (254, 60), (1042, 200)])
+def test_raz_extract_many(n_1, m):
+    ext = Raz(n_1, m)
+    inputs = np.random.randint(0, 2, (4, n_1))
+    seeds = np.random.randint(0, 2, (4, n_1 // 2))
+    out = ext.extract_many(inputs, seeds)
+    assert out.shape == (4, m)
+    for x, y, z in zip(inputs.tolist(), seeds.tolist(), out.tolist()):
+        assert ext.extract(x, y) == z
+    shared = ext.extract_many(inputs, seeds[0])
+    assert shared[0].tolist() == out[0].tolist()
+
+
+@pytest.mark.parametrize('n_1,m', [(6, 2), (62, 30), (254, 60), (1042, 200),
+                                   (4562, 100), (8846, 4423), (46418, 500)])
+def test_raz_engines_agree(n_1, m):
+    gf2, ntt = Raz(n_1, m), Raz(n_1, m, engine='ntt')
+    for _ in range(3):
+        x = np.random.randint(0, 2, n_1)
+        # Seeds may be shorter than n_1 / 2
+        y = np.random.randint(0, 2, np.random.randint(1, n_1 // 2 + 1))
+        expected = ntt.extract(x, y)
+        assert gf2.extract(x, y) == expected
+        seed = np.packbits(np.pad(y, (0, gf2.n - len(y))))
+        assert gf2.extract(np.packbits(x).tobytes(), seed.tolist(),
+                           packed_input=True) == expected
+    with pytest.raises(ValueError):
+        Raz(n_1, m, engine='crt')
+
+
+def test_trinomial_search_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('CRYPTOMITE_CACHE_DIR', str(tmp_path))
+    assert raz.trinomial_cache_path() == str(tmp_path / 'trinomials.json')
+    assert raz.find_trinomial(127) == 7
+    assert raz.find_trinomial(999, max_s=50) == 0
+    assert raz.find_trinomial(999) == 59
+    # No irreducible trinomial has a degree divisible by 8
+    assert raz.find_trinomial(1000) == 0
+    assert raz.closest_trinomial(1000) == 999
+    assert [s for s in range(1, 127) if raz.is_irreducible_trinomial(127, s)
+            ] == [1, 7, 15, 30, 63, 64, 97, 112, 120, 126]
+
+    # Later searches read the cache file instead
+    monkeypatch.setattr(raz, '_trinomials', {})
+    monkeypatch.setattr(raz._cryptomite, 'find_trinomial', None)
+    assert json.loads((tmp_path / 'trinomials.json').read_text()) == {
+        '999': 59, '1000': -500}
+    assert raz.find_trinomial(999) == 59
+    assert raz.is_irreducible_trinomial(999, 940)
+    assert not raz.is_irreducible_trinomial(999, 58)
+
+
+def test_raz_any_length(tmp_path, monkeypatch):
+    monkeypatch.setenv('CRYPTOMITE_CACHE_DIR', str(tmp_path))
+    ext = Raz(1998, 100)
+    assert ext.s == 59
+    x, y = np.random.randint(0, 2, 1998), np.random.randint(0, 2, 999)
+    assert ext.extract(x, y) == Raz(1998, 100, engine='ntt').extract(x, y)
+    with pytest.raises(ValueError):
+        Raz(2000, 100)
+    with pytest.raises(ValueError):
+        Raz(254, 60, trinomial=8, verify=True)
+    assert Raz(254, 60, trinomial=30, verify=True).s == 30
+    # Unverified overrides are taken as given
+    assert Raz(254, 60, trinomial=8).s == 8
+
+    ext = raz.from_params(2000, 1800, 1000, 990, -10)
+    assert ext.n == 999
+    assert 0 < ext.m <= 999
+    # 1007 is closer to 1006, but would need a longer input
+    assert raz.closest_trinomial(1006) == 1007
+    assert raz.previous_trinomial(1006) == 1001
+    assert raz.from_params(2012, 1800, 1000, 990, -10).n == 1001
+
+
+def test_trinomial_searches_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setenv('CRYPTOMITE_CACHE_DIR', str(tmp_path))
+    # Only the degrees above the largest known one are searched
+    assert raz.previous_trinomial(110504) == 110503
+    ext = raz.from_params(2 * 110504, 2e5, 10000, 9000, -10)
+    assert ext.n == 110503
+
+    # Long searches give up at the timeout
+    start = time.monotonic()
+    with pytest.raises(TimeoutError, match='859433'):
+        raz.from_params(2 * 10**6, 1.9e6, 10000, 9000, -10, timeout=1)
+    with pytest.raises(TimeoutError):
+        raz.closest_trinomial(10**6, timeout=0)
+    assert time.monotonic() - start < 10
+    # The degrees settled meanwhile are cached
+    cache = json.loads((tmp_path / 'trinomials.json').read_text())
+    assert cache['1000000'] == -1024
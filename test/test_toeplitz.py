@@ -1,3 +1,6 @@
+import io
+
+import numpy as np
 import pytest
 from cryptomite.toeplitz import Toeplitz
 
@@ -30,7 +33,31 @@ toeplitz_testcases = [
 ]
 
 
-
 @pytest.mark.parametrize("n,m,x,y,z", toeplitz_testcases)
 def test_toeplitz(n, m, x, y, z):
     assert Toeplitz(n, m).extract(x, y) == z
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+@pytest.mark.parametrize("n,m,x,y,z", toeplitz_testcases)
+def test_toeplitz_extract_stream(n, m, x, y, z, chunk_size):
+    ext = Toeplitz(n, m)
+    # Chunks straddle blocks; the trailing partial block is dropped
+    bits = x * 3
+    chunks = [bits[:n // 2], bits[n // 2:2 * n + 1], np.array(bits[2 * n + 1:])]
+    stream = ext.extract_stream(chunks + [x[:1]], y, chunk_size=chunk_size)
+    assert list(stream) == [z] * 3
+    packed = io.BytesIO(np.packbits(x * 8).tobytes())
+    stream = ext.extract_stream(packed, y, chunk_size=chunk_size, packed=True)
+    assert list(stream) == [np.packbits(z).tobytes()] * 8
+
+
+@pytest.mark.parametrize("segment_size", [1, 7, 1 << 20])
+@pytest.mark.parametrize("n,m,x,y,z", toeplitz_testcases)
+def test_toeplitz_extract_segmented(n, m, x, y, z, segment_size):
+    ext = Toeplitz(n, m)
+    assert ext.extract_segmented(x, y, segment_size) == z
+    assert ext.extract_segmented(np.packbits(x), np.packbits(y),
+                                 segment_size, packed_input=True) == z
+    with pytest.raises(ValueError):
+        ext.extract_segmented(x, y, 0)
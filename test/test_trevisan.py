@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from cryptomite.trevisan import Trevisan
+from cryptomite.utils import set_num_threads
+
+
+@pytest.mark.parametrize('n,k,error', [(100, 80, 0.1), (200, 150, 0.01)])
+def test_trevisan_extract_many(n, k, error):
+    ext = Trevisan(n, k, error)
+    inputs = np.random.randint(0, 2, (3, n))
+    seed = np.random.randint(0, 2, ext.ext.get_seed_length())
+    out = ext.extract_many(inputs, seed)
+    assert out.shape == (3, ext.config.m)
+    for x, z in zip(inputs.tolist(), out.tolist()):
+        assert ext.extract(x, seed.tolist()) == z
+    with pytest.raises(ValueError):
+        ext.extract_many(inputs[0], seed)
+
+
+def test_trevisan_shared_between_threads():
+    ext = Trevisan(200, 150, 0.01)
+    blocks = [(np.random.randint(0, 2, 200).tolist(),
+               np.random.randint(0, 2, ext.ext.get_seed_length()).tolist())
+              for _ in range(8)]
+    expected = [ext.extract(x, y) for x, y in blocks]
+
+    def extract_bits(block):
+        # Each thread loads its own source into the shared extractor
+        ext.ext.load_source(*block)
+        return [ext.ext.extract_bit(i) for i in range(ext.config.m)]
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(extract_bits, blocks)) == expected
+        assert list(pool.map(lambda b: ext.extract(*b), blocks)) == expected
+
+
+def test_trevisan_source_is_per_thread():
+    ext = Trevisan(200, 150, 0.01)
+    ext.ext.load_source([1] * 200, [1] * ext.ext.get_seed_length())
+    ext.ext.extract_bit(0)
+    # A thread that never loaded a source doesn't see another thread's
+    with ThreadPoolExecutor(1) as pool:
+        with pytest.raises(RuntimeError, match='Load source'):
+            pool.submit(ext.ext.extract_bit, 0).result()
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+def test_trevisan_extract_packed(threads):
+    ext = Trevisan(300, 250, 0.01)
+    x = np.random.randint(0, 2, 300)
+    seed = np.random.randint(0, 2, ext.ext.get_seed_length())
+    ext.ext.load_source(x.tolist(), seed.tolist())
+    expected = [ext.ext.extract_bit(i) for i in range(ext.config.m)]
+    set_num_threads(threads)
+    try:
+        assert ext.extract(x, seed) == expected
+        assert ext.extract(np.packbits(x), np.packbits(seed), packed=True,
+                           packed_input=True) == \
+            np.packbits(expected).tobytes()
+    finally:
+        set_num_threads(None)
+
+
+def test_trevisan_design_table(tmp_path):
+    ext = Trevisan(2000, 1800, 0.01)
+    table = ext.ext.design_table()
+    assert table.dtype == np.uint16 and table.shape[1] == 2 * ext.config.l
+    assert not table.flags.writeable
+    # Extractors with the same parameters share the table
+    assert np.shares_memory(table, Trevisan(2000, 1800, 0.01).ext.design_table())
+
+    x = np.random.randint(0, 2, 2000)
+    seed = np.random.randint(0, 2, ext.ext.get_seed_length())
+    expected = ext.extract(x, seed)
+    path = tmp_path / 'design.npy'
+    ext.save_design(path)
+    for mmap in (True, False):
+        loaded = Trevisan(2000, 1800, 0.01)
+        loaded.load_design(path, mmap=mmap)
+        assert loaded.extract(x, seed) == expected
+    assert Trevisan(2000, 1800, 0.01, design=path).extract(x, seed) == \
+        expected
+    with pytest.raises(ValueError):
+        Trevisan(3000, 2800, 0.01, design=path)
@@ -1,7 +1,45 @@
 // tests.cpp
 #include <trevisan.cpp>
+#include <bigntt.h>
+#include <crtntt.h>
+#include <extractors.h>
+#include <gf2k.h>
+#include <gf2n.h>
+#include <gf2x.h>
+#include <modarith.h>
+#include <ntt.h>
+#include <parallel.h>
+#include <raz.h>
 #include <gtest/gtest.h>
 
+#include <array>
+#include <atomic>
+#include <cstdlib>
+#include <mutex>
+#include <new>
+#include <random>
+#include <set>
+#include <thread>
+
+/** Heap allocations made by the test binary so far */
+static std::atomic<size_t> allocations{0};
+
+void *operator new(size_t n) {
+    allocations++;
+    if (void *p = std::malloc(n ? n : 1)) {
+        return p;
+    }
+    throw std::bad_alloc();
+}
+
+void operator delete(void *p) noexcept {
+    std::free(p);
+}
+
+void operator delete(void *p, size_t) noexcept {
+    std::free(p);
+}
+
 TEST(GF2PolyTest, Example) {
     GF2Poly poly(4);
     poly_bits x(0b1101);
@@ -12,6 +50,180 @@ TEST(GF2PolyTest, Example) {
     ASSERT_EQ(xy, poly.poly_mul(x, y));
 }
 
+TEST(GF2kTest, MatchesGF2Poly) {
+    mt19937_64 rng(3);
+    for (int k : {1, 2, 3, 5, 8, 13, 16, 17, 31, 33, 48, 61, 63, 64, 65, 100, 127, 128, 129, 200, 255}) {
+        GF2Poly poly(k);
+        for (const Gf2xKernels *kernels : available_gf2x_kernels()) {
+            GF2k field(k, *kernels);
+            EXPECT_EQ(field.tabulated(), k <= GF2k::TABLE_MAX);
+            auto random_element = [&]() {
+                GF2k::element a{};
+                poly_bits bits;
+                for (int i = 0; i < k; i++) {
+                    if (rng() & 1) {
+                        a[i / 64] |= uint64_t(1) << (i % 64);
+                        bits[i] = 1;
+                    }
+                }
+                return make_pair(a, bits);
+            };
+            auto to_bits = [&](const GF2k::element &a) {
+                poly_bits bits;
+                for (int i = 0; i < 256; i++) {
+                    bits[i] = (a[i / 64] >> (i % 64)) & 1;
+                }
+                return bits;
+            };
+            for (int trial = 0; trial < 20; trial++) {
+                auto a = random_element(), b = random_element();
+                GF2k::element c{};
+                field.mul(c.data(), a.first.data(), b.first.data());
+                ASSERT_EQ(to_bits(c), poly.poly_mul(a.second, b.second)) << "k = " << k;
+            }
+
+            vector<uint64_t> coeffs;
+            vector<poly_bits> coeff_bits;
+            for (int j = 0; j < 7; j++) {
+                auto c = random_element();
+                coeffs.insert(coeffs.end(), c.first.begin(), c.first.begin() + field.words);
+                coeff_bits.push_back(c.second);
+            }
+            auto x = random_element();
+            EXPECT_EQ(to_bits(field.horner(coeffs.data(), 7, x.first)), poly.horner_method(coeff_bits, x.second));
+
+            // More points than a block, the last one partial
+            vector<GF2k::element> points, values(GF2k::BLOCK + 3);
+            for (size_t i = 0; i < values.size(); i++) {
+                points.push_back(random_element().first);
+            }
+            field.horner_many(coeffs.data(), 7, points.data(), points.size(), values.data());
+            for (size_t i = 0; i < values.size(); i++) {
+                ASSERT_EQ(values[i], field.horner(coeffs.data(), 7, points[i])) << "k = " << k;
+            }
+        }
+    }
+    EXPECT_THROW(GF2k(256), std::runtime_error);
+}
+
+TEST(GF2nTest, MatchesBitwiseReduction) {
+    mt19937_64 rng(29);
+    for (auto ns : {make_pair(3, 1), make_pair(64, 3), make_pair(127, 7), make_pair(128, 64), make_pair(200, 150),
+                    make_pair(521, 520)}) {
+        uint64_t n = ns.first, s = ns.second;
+        for (const Gf2xKernels *kernels : available_gf2x_kernels()) {
+            GF2n field(n, s, *kernels);
+            auto random_element = [&]() {
+                vector<uint64_t> a(field.words, 0);
+                for (uint64_t i = 0; i < n; i++) {
+                    a[i / 64] |= (rng() & uint64_t(1)) << (i % 64);
+                }
+                return a;
+            };
+            auto bit = [](const vector<uint64_t> &a, uint64_t i) { return (a[i / 64] >> (i % 64)) & 1; };
+            auto a = random_element(), b = random_element(), c = a, d = a;
+            field.mul(c.data(), a.data(), b.data());
+
+            // Schoolbook product, reduced from the top bit down
+            vector<uint8_t> p(2 * n, 0);
+            for (uint64_t i = 0; i < n; i++) {
+                for (uint64_t j = 0; j < n; j++) {
+                    p[i + j] ^= bit(a, i) & bit(b, j);
+                }
+            }
+            for (uint64_t i = 2 * n - 1; i >= n; i--) {
+                p[i - n] ^= p[i];
+                p[i - n + s] ^= p[i];
+                p[i] = 0;
+            }
+            for (uint64_t i = 0; i < n; i++) {
+                ASSERT_EQ(bit(c, i), p[i]) << "n = " << n << ", bit " << i;
+            }
+
+            field.sqr(d.data(), d.data());
+            field.mul(c.data(), a.data(), a.data());
+            EXPECT_EQ(d, c);
+        }
+    }
+    EXPECT_THROW(GF2n(10, 10), std::invalid_argument);
+}
+
+TEST(GF2nTest, RazTrinomialsAreFields) {
+    // In GF(2^n), a^(2^n) = a: squaring n times is the identity
+    mt19937_64 rng(31);
+    for (auto ns : {make_pair(127, 7), make_pair(1279, 216), make_pair(4423, 271), make_pair(23209, 1530),
+                    make_pair(44497, 8575)}) {
+        GF2n field(ns.first, ns.second);
+        vector<uint64_t> a(field.words), b;
+        for (uint64_t &w : a) {
+            w = rng();
+        }
+        a.back() &= ~uint64_t(0) >> (64 * field.words - field.n);
+        b = a;
+        for (uint64_t i = 0; i < field.n; i++) {
+            field.sqr(b.data(), b.data());
+        }
+        EXPECT_EQ(a, b) << "n = " << field.n;
+    }
+}
+
+TEST(GF2nTest, TrinomialIrreducibility) {
+    // Against trial division by every polynomial of degree up to n / 2
+    auto divides = [](uint64_t f, uint64_t g) {
+        int dg = 63;
+        while (!(g >> dg)) {
+            dg--;
+        }
+        for (int d = 63; d >= dg; d--) {
+            if ((f >> d) & 1) {
+                f ^= g << (d - dg);
+            }
+        }
+        return f == 0;
+    };
+    for (uint64_t n = 2; n <= 26; n++) {
+        uint64_t least = 0;
+        for (uint64_t s = 1; s < n; s++) {
+            uint64_t f = (uint64_t(1) << n) | (uint64_t(1) << s) | 1;
+            bool irreducible = true;
+            for (uint64_t g = 2; g >> (n / 2 + 1) == 0 && irreducible; g++) {
+                irreducible = !divides(f, g);
+            }
+            ASSERT_EQ(trinomial_is_irreducible(n, s), irreducible) << "n = " << n << ", s = " << s;
+            if (irreducible && !least) {
+                least = s;
+            }
+        }
+        EXPECT_EQ(find_trinomial(n), least) << "n = " << n;
+    }
+    EXPECT_TRUE(trinomial_is_irreducible(4423, 271));
+    EXPECT_FALSE(trinomial_is_irreducible(4423, 272));
+    EXPECT_EQ(find_trinomial(127), 1u);
+    EXPECT_EQ(find_trinomial(1279), 216u);
+    EXPECT_EQ(find_trinomial(1279, 1, 215), 0u);
+    EXPECT_EQ(find_trinomial(1279, 217), 418u);
+    EXPECT_THROW(trinomial_is_irreducible(10, 0), std::invalid_argument);
+}
+
+TEST(GF2nTest, TrinomialSearchDeadline) {
+    // Past the deadline the search gives up at its first Rabin test, the
+    // candidates before it having been sieved out
+    uint64_t searched;
+    EXPECT_EQ(find_trinomial(1279, 1, 0, Deadline::min(), &searched), 0u);
+    EXPECT_LT(searched, 216u);
+    EXPECT_EQ(find_trinomial(1279, searched + 1), 216u);
+    EXPECT_EQ(find_trinomial(1279, 100, 0, Deadline::min(), &searched), 0u);
+    EXPECT_LT(searched, 216u);
+    EXPECT_GE(searched, 99u);
+    EXPECT_EQ(find_trinomial(1279, searched + 1), 216u);
+
+    // A complete search settles every candidate up to the one found or last
+    EXPECT_EQ(find_trinomial(1279, 1, 0, Deadline::max(), &searched), 216u);
+    EXPECT_EQ(searched, 216u);
+    EXPECT_EQ(find_trinomial(1279, 1, 215, Deadline::max(), &searched), 0u);
+    EXPECT_EQ(searched, 215u);
+}
+
 typedef tuple<int, int, int, vector<uint64_t>> HRExample;
 
 static const vector<HRExample> hr_examples = {
@@ -133,13 +345,36 @@ INSTANTIATE_TEST_SUITE_P(BwdTests,
                          BwdTest,
                          testing::ValuesIn(bwd_examples));
 
+TEST(WeakDesignTableTest, MatchesSubsets) {
+    for (int n : {500, 5000, 50000}) {
+        TrevisanConfig config(n, n * 4 / 5, 0.01);
+        BlockWeakDesign wd(config.m, config.log_t);
+        int width = 2 * config.l;
+        auto table = BlockWeakDesign::shared_table(wd, width);
+        EXPECT_EQ(table->rows, wd.base_size());
+        EXPECT_EQ(table, BlockWeakDesign::shared_table(BlockWeakDesign(config.m, config.log_t), width));
+        vector<uint32_t> s(width);
+        for (int i = 0; i < wd.m; i += 7) {
+            auto expected = wd.get_s(i);
+            wd.get_s(*table, i, s.data());
+            ASSERT_EQ(vector<uint64_t>(s.begin(), s.end()), vector<uint64_t>(expected.begin(), expected.begin() + width));
+        }
+        // A view of the same entries looks up the same subsets
+        WeakDesignTable view(table->entries(), table->rows, width);
+        wd.get_s(view, wd.m - 1, s.data());
+        EXPECT_EQ(s[width - 1], wd.get_s(wd.m - 1)[width - 1]);
+    }
+}
+
 
 TEST_P(RshTest, Example) {
     int n = get<0>(GetParam()), l = get<1>(GetParam());
     vector<bool> r_input = get<2>(GetParam()), r_seed = get<3>(GetParam());
 
     int result = get<4>(GetParam());
-    EXPECT_EQ(result, RSHExtractor(n, l).extract(r_input, r_seed));
+    RSHExtractor ext(n, l);
+    EXPECT_EQ(result, ext.extract(r_input, r_seed));
+    EXPECT_EQ(result, ext.extract(ext.coefficients(r_input), r_seed));
 }
 
 INSTANTIATE_TEST_SUITE_P(RshTests,
@@ -170,8 +405,636 @@ TEST(TimingTest, Example) {
     }
 }
 
+TEST(TrevisanTest, ExtractAllMatchesBits) {
+    mt19937_64 rng(5);
+    Trevisan trevisan(TrevisanConfig(500, 400, 0.01));
+    vector<bool> inp(trevisan.n), seed(trevisan.get_seed_length());
+    for (size_t i = 0; i < inp.size(); i++) {
+        inp[i] = rng() & 1;
+    }
+    for (size_t i = 0; i < seed.size(); i++) {
+        seed[i] = rng() & 1;
+    }
+    trevisan.load_source(inp, seed);
+    vector<uint8_t> expected(trevisan.m);
+    for (int i = 0; i < trevisan.m; i++) {
+        expected[i] = trevisan.extract_bit(i);
+    }
+    for (unsigned threads : {1, 8}) {
+        set_num_threads(threads);
+        EXPECT_EQ(trevisan.extract_all(inp, seed), expected);
+    }
+    set_num_threads(0);
+    EXPECT_EQ(trevisan.extract(), vector<bool>(expected.begin(), expected.end()));
+    seed.pop_back();
+    EXPECT_THROW(trevisan.extract_all(inp, seed), std::runtime_error);
+}
+
+TEST(TrevisanTest, SourcesArePerThread) {
+    TrevisanConfig config(200, 150, 0.01);
+    Trevisan trevisan(config);
+    vector<bool> inp(trevisan.n, true), seed(trevisan.get_seed_length(), true);
+    trevisan.load_source(inp, seed);
+    EXPECT_NO_THROW(trevisan.extract_bit(0));
+
+    // A thread that never loaded a source doesn't see another thread's
+    bool threw = false;
+    thread([&] {
+        try {
+            trevisan.extract_bit(0);
+        } catch (const std::runtime_error &) {
+            threw = true;
+        }
+    }).join();
+    EXPECT_TRUE(threw);
+
+    // Nor does a later extractor, even one at the address of a destroyed one
+    auto first = make_unique<Trevisan>(config);
+    first->load_source(inp, seed);
+    first.reset();
+    auto second = make_unique<Trevisan>(config);
+    EXPECT_THROW(second->extract_bit(0), std::runtime_error);
+}
+
+
+// The modular multiplications used before the Shoup/Montgomery kernels.
+static uint32_t reference_mul32(uint32_t a, uint32_t b) {
+    uint64_t n = a; n *= b;
+    return n % mod32::P;
+}
+
+static uint64_t reference_mul64(uint64_t a, uint64_t b) {
+    const uint64_t P = mod64::P;
+    uint64_t c = (double)a * b / P;
+    int64_t ans = int64_t(a * b - c * P) % int64_t(P);
+    if (ans < 0)
+        ans += P;
+    return ans;
+}
+
+TEST(ModArithTest, Mod32) {
+    const uint32_t P = mod32::P;
+    mt19937_64 rng(32);
+    vector<uint32_t> values = {0, 1, 2, P / 2, P - 2, P - 1};
+    for (int i = 0; i < 2000; i++) {
+        values.push_back(rng() % P);
+    }
+    for (uint32_t a : values) {
+        for (int i = 0; i < 10; i++) {
+            uint32_t b = values[rng() % values.size()];
+            uint32_t expected = reference_mul32(a, b);
+            ASSERT_EQ(expected, mod32::mul(a, b));
+            ASSERT_EQ(expected, mod32::mul_mont(a, mod32::to_mont(b)));
+            ASSERT_EQ((a + (uint64_t)b) % P, mod32::add(a, b));
+            ASSERT_EQ((a + (uint64_t)P - b) % P, mod32::sub(a, b));
+        }
+        // multiplying by a Montgomery form operand also reduces unreduced inputs
+        uint32_t big = P + (uint32_t)(rng() % (UINT32_MAX - P));
+        ASSERT_EQ(reference_mul32(big % P, a), mod32::mul_mont(big, mod32::to_mont(a)));
+    }
+}
+
+TEST(ModArithTest, Mod64) {
+    const uint64_t P = mod64::P;
+    mt19937_64 rng(64);
+    vector<uint64_t> values = {0, 1, 2, P / 2, P - 2, P - 1};
+    for (int i = 0; i < 2000; i++) {
+        values.push_back(rng() % P);
+    }
+    for (uint64_t a : values) {
+        for (int i = 0; i < 10; i++) {
+            uint64_t b = values[rng() % values.size()];
+            uint64_t expected = reference_mul64(a, b);
+            ASSERT_EQ(expected, mod64::mul(a, b));
+            ASSERT_EQ(expected, mod64::mul_shoup(a, b, mod64::shoup(b)));
+            // lazy results are in [0, 2P), for any input below 4P
+            uint64_t lazy = mod64::mul_shoup_lazy(a + 3 * P, b, mod64::shoup(b));
+            ASSERT_LT(lazy, 2 * P);
+            ASSERT_EQ(expected, lazy % P);
+            ASSERT_EQ(a % P, mod64::reduce4(a + 3 * P));
+        }
+    }
+}
+
+// Naive O(L^2) evaluation of the transform, X_k = sum_j x_j r^(jk)
+template <class T>
+static vector<T> naive_ntt(const vector<T> &x, T P, T (*mul)(T, T)) {
+    size_t L = x.size();
+    auto pow = [&](T a, uint64_t e) {
+        T r = 1;
+        for (; e; e >>= 1, a = mul(a, a)) {
+            if (e & 1) {
+                r = mul(r, a);
+            }
+        }
+        return r;
+    };
+    T root = pow(5, (P - 1) / L);
+    vector<T> y(L);
+    for (size_t k = 0; k < L; k++) {
+        T acc = 0, rk = pow(root, k), w = 1;
+        for (size_t j = 0; j < L; j++) {
+            acc = (T)((acc + (uint64_t)mul(x[j] % P, w)) % P);
+            w = mul(w, rk);
+        }
+        y[k] = acc;
+    }
+    return y;
+}
+
+TEST(NttTest, MatchesNaiveTransform) {
+    mt19937_64 rng(7);
+    for (unsigned l = 1; l <= 8; l++) {
+        NTT ntt(l);
+        BigNTT big_ntt(l);
+        vector<uint32_t> x(1 << l);
+        vector<uint64_t> x64(1 << l);
+        for (size_t i = 0; i < x.size(); i++) {
+            x[i] = rng() % mod32::P;
+            x64[i] = rng() % mod64::P;
+        }
+        vector<uint32_t> y = ntt.ntt(x, false);
+        vector<uint64_t> y64 = big_ntt.ntt(x64, false);
+        EXPECT_EQ(naive_ntt(x, mod32::P, reference_mul32), y);
+        EXPECT_EQ(naive_ntt(x64, mod64::P, reference_mul64), y64);
+        EXPECT_EQ(x, ntt.ntt(y, true));
+        EXPECT_EQ(x64, big_ntt.ntt(y64, true));
+    }
+}
+
+TEST(NttTest, ParallelMatchesSerial) {
+    mt19937_64 rng(9);
+    for (unsigned l = 14; l <= 18; l += 2) {
+        NTT ntt(l);
+        BigNTT big_ntt(l);
+        vector<uint32_t> a(1 << l), b(1 << l);
+        vector<uint64_t> a64(1 << l), b64(1 << l);
+        for (size_t i = 0; i < a.size(); i++) {
+            a[i] = a64[i] = rng() & 1;
+            b[i] = b64[i] = rng() & 1;
+        }
+        set_num_threads(1);
+        vector<uint32_t> c = ntt.conv(a, b), y = ntt.ntt(a, false, true);
+        vector<uint64_t> c64 = big_ntt.conv(a64, b64);
+        set_num_threads(8);
+        EXPECT_EQ(c, ntt.conv(a, b));
+        EXPECT_EQ(y, ntt.ntt(a, false, true));
+        EXPECT_EQ(c64, big_ntt.conv(a64, b64));
+    }
+    set_num_threads(0);
+}
+
+TEST(NttTest, Radix3MatchesNaiveTransform) {
+    mt19937_64 rng(11);
+    for (unsigned l = 1; l <= 7; l++) {
+        NTT ntt(l, 1);
+        BigNTT big_ntt(l, 1);
+        ASSERT_EQ(ntt.size(), 3u << l);
+        vector<uint32_t> x(3 << l);
+        vector<uint64_t> x64(3 << l);
+        for (size_t i = 0; i < x.size(); i++) {
+            x[i] = rng() % mod32::P;
+            x64[i] = rng() % mod64::P;
+        }
+        vector<uint32_t> y = ntt.ntt(x, false);
+        vector<uint64_t> y64 = big_ntt.ntt(x64, false);
+        EXPECT_EQ(naive_ntt(x, mod32::P, reference_mul32), y);
+        EXPECT_EQ(naive_ntt(x64, mod64::P, reference_mul64), y64);
+        EXPECT_EQ(x, ntt.ntt(y, true));
+        EXPECT_EQ(x64, big_ntt.ntt(y64, true));
+
+        // plusone flips the low bit of x[0]
+        x[0] = rng() & 1;
+        y = ntt.ntt(x, false, true);
+        x[0] ^= 1;
+        EXPECT_EQ(ntt.ntt(x, false), y);
+    }
+    EXPECT_THROW(BasicNTT<mod32_b>(4, 1), std::invalid_argument);
+    EXPECT_THROW(BigNTT(4, 2), std::invalid_argument);
+}
+
+TEST(NttTest, Radix3ParallelMatchesSerial) {
+    mt19937_64 rng(13);
+    unsigned l = 16;
+    NTT ntt(l, 1);
+    BigNTT big_ntt(l, 1);
+    vector<uint32_t> a(3 << l), b(3 << l);
+    vector<uint64_t> a64(3 << l), b64(3 << l);
+    for (size_t i = 0; i < a.size(); i++) {
+        a[i] = a64[i] = rng() & 1;
+        b[i] = b64[i] = rng() & 1;
+    }
+    set_num_threads(1);
+    vector<uint32_t> c = ntt.conv(a, b);
+    vector<uint64_t> c64 = big_ntt.conv(a64, b64);
+    set_num_threads(8);
+    EXPECT_EQ(c, ntt.conv(a, b));
+    EXPECT_EQ(c64, big_ntt.conv(a64, b64));
+    set_num_threads(0);
+    for (size_t i = 0; i < c.size(); i++) {
+        ASSERT_EQ(c[i], c64[i]);
+    }
+}
+
+TEST(NttTest, InPlaceMatchesOutOfPlace) {
+    mt19937_64 rng(17);
+    for (unsigned threads : {1, 8}) {
+        set_num_threads(threads);
+        for (unsigned threes : {0, 1}) {
+            for (unsigned l : {2, 5, 15}) {
+                NTT ntt(l, threes);
+                uint64_t L = ntt.size(), r = L / 2 - 1, s = r / 3;
+                vector<uint32_t> a(L, 0), b(L, 0);
+                for (uint64_t i = 0; i < r; i++) {
+                    a[i] = rng() & 1;
+                    b[i] = rng() & 1;
+                }
+                for (bool inverse : {false, true}) {
+                    vector<uint32_t> y = a;
+                    ntt.transform_inplace(y.data(), inverse, !inverse);
+                    EXPECT_EQ(y, ntt.ntt(a, inverse, !inverse));
+                }
+
+                // Outputs may overwrite the inputs
+                vector<uint32_t> c = a;
+                ntt.conv(c.data(), b.data(), c.data());
+                EXPECT_EQ(c, ntt.conv(a, b));
+
+                // product (delta + 1) and delta^2 in GF(2^r)
+                vector<uint32_t> product = a, delta = b, delta1 = b;
+                delta1[0] ^= 1;
+                ntt.raz_iteration(product.data(), delta.data(), r, s);
+                EXPECT_EQ(product, ntt.conv_and_reduce(a, delta1, r, s));
+                EXPECT_EQ(delta, ntt.conv_and_reduce(b, b, r, s));
+            }
+        }
+    }
+    set_num_threads(0);
+}
+
+TEST(NttTest, ConvAllocatesNothingOnceWarm) {
+    set_num_threads(1);
+    for (unsigned threes : {0, 1}) {
+        NTT ntt(12, threes);
+        uint64_t L = ntt.size(), r = L / 2 - 1;
+        vector<uint32_t> a(L, 0), b(L, 0), c(L);
+        a[1] = b[2] = 1;
+        ntt.conv_and_reduce(a.data(), b.data(), c.data(), r, 1);
+        ntt.raz_iteration(a.data(), b.data(), r, 1);
+        size_t before = allocations;
+        for (int i = 0; i < 4; i++) {
+            ntt.conv(a.data(), b.data(), c.data());
+            ntt.conv_and_reduce(a.data(), b.data(), c.data(), r, 1);
+            ntt.raz_iteration(a.data(), b.data(), r, 1);
+        }
+        EXPECT_EQ(allocations, before);
+    }
+    set_num_threads(0);
+}
+
+TEST(RazTest, PackedMatchesNtt) {
+    mt19937_64 rng(23);
+    // Trinomials need not be irreducible for the two to agree
+    for (auto ns : {make_pair(3, 1), make_pair(64, 3), make_pair(127, 7), make_pair(200, 150), make_pair(521, 520)}) {
+        uint64_t n = ns.first, s = ns.second, l = 1;
+        while ((uint64_t(1) << l) < 2 * n) {
+            l++;
+        }
+        NTT ntt(l);
+        GF2Conv gf2(l);
+        for (uint64_t extra : {0, 1}) {
+            vector<uint8_t> x(2 * n + extra), y(n - extra);
+            for (auto &b : x) {
+                b = rng() & 1;
+            }
+            for (auto &b : y) {
+                b = rng() & 1;
+            }
+            BitView bx, by;
+            bx.data = x.data();
+            bx.size = x.size();
+            by.data = y.data();
+            by.size = y.size();
+            EXPECT_EQ(raz_extract(gf2, bx, by, n, s, n), raz_extract(ntt, bx, by, n, s, n)) << "n = " << n;
+        }
+    }
+}
+
+TEST(ParallelTest, BoundedNesting) {
+    set_num_threads(6);
+    vector<unsigned> budgets(3);
+    atomic<int> calls{0};
+    parallel_for(3, [&](size_t i) {
+        budgets[i] = thread_budget();
+        parallel_for(4, [&](size_t) { calls++; });
+    });
+    EXPECT_EQ(calls, 12);
+    EXPECT_EQ(budgets, vector<unsigned>({2, 2, 2}));
+    EXPECT_EQ(thread_budget(), 6u);
+    EXPECT_THROW(parallel_for(4, [](size_t i) {
+        if (i == 3) {
+            throw std::runtime_error("task failed");
+        }
+    }), std::runtime_error);
+    set_num_threads(0);
+}
+
+TEST(ParallelTest, PoolReusesThreads) {
+    set_num_threads(4);
+    mutex lock;
+    set<thread::id> ids;
+    atomic<int> calls{0};
+    for (int section = 0; section < 200; section++) {
+        parallel_for(4, [&](size_t) {
+            lock_guard<mutex> guard(lock);
+            ids.insert(this_thread::get_id());
+        });
+        // Nested sections take back the shares no free thread picked up
+        parallel_for(3, [&](size_t) {
+            parallel_for(5, [&](size_t) { calls++; });
+        });
+    }
+    EXPECT_LE(ids.size(), 4u);
+    EXPECT_EQ(calls, 200 * 15);
+    set_num_threads(2);
+    ids.clear();
+    parallel_for(8, [&](size_t) {
+        lock_guard<mutex> guard(lock);
+        ids.insert(this_thread::get_id());
+    });
+    EXPECT_LE(ids.size(), 2u);
+    set_num_threads(0);
+}
+
+TEST(NttTest, SimdKernelsMatchScalar) {
+    mt19937_64 rng(8);
+    for (const NttKernels *kernels : available_ntt_kernels()) {
+        SCOPED_TRACE(kernels->name);
+        for (unsigned l = 1, threes = 0; l <= 12; l += threes, threes ^= 1) {
+            NTT scalar(l, threes, ntt_scalar_kernels()), simd(l, threes, *kernels);
+            vector<uint32_t> a(scalar.size()), b(scalar.size());
+            for (size_t i = 0; i < a.size(); i++) {
+                a[i] = rng() % mod32::P;
+                b[i] = rng() % mod32::P;
+            }
+            EXPECT_EQ(scalar.ntt(a, false, true), simd.ntt(a, false, true));
+            EXPECT_EQ(scalar.ntt(a, true), simd.ntt(a, true));
+            EXPECT_EQ(scalar.mul_vec(a, b), simd.mul_vec(a, b));
+            EXPECT_EQ(scalar.conv(a, b), simd.conv(a, b));
+        }
+    }
+}
+
+TEST(NttTest, SecondPrimeKernelsMatchScalar) {
+    mt19937_64 rng(10);
+    for (const NttKernels *kernels : available_ntt_kernels<mod32_b>()) {
+        SCOPED_TRACE(kernels->name);
+        for (unsigned l = 1; l <= 12; l++) {
+            BasicNTT<mod32_b> scalar(l, ntt_scalar_kernels<mod32_b>()), simd(l, *kernels);
+            vector<uint32_t> a(1 << l), b(1 << l);
+            for (size_t i = 0; i < a.size(); i++) {
+                a[i] = rng() % mod32_b::P;
+                b[i] = rng() % mod32_b::P;
+            }
+            EXPECT_EQ(scalar.ntt(a, false, true), simd.ntt(a, false, true));
+            EXPECT_EQ(scalar.conv(a, b), simd.conv(a, b));
+        }
+    }
+}
+
+TEST(CrtNttTest, MatchesNaiveConv) {
+    mt19937_64 rng(11);
+    // (l, row_l, primes, bits per input): short rows to exercise the
+    // transform across rows, and large inputs to need both primes
+    vector<array<unsigned, 4>> cases = {
+        {1, 22, 0, 1}, {6, 22, 0, 1}, {8, 2, 0, 1}, {9, 4, 1, 10},
+        {8, 3, 2, 24}, {10, 6, 2, 26}, {7, 8, 2, 27},
+    };
+    for (auto [l, row_l, primes, bits] : cases) {
+        SCOPED_TRACE(l);
+        CrtNTT ntt(l, row_l, primes);
+        size_t L = size_t(1) << l;
+        vector<uint64_t> a(L), b(L), expected(L);
+        for (size_t i = 0; i < L; i++) {
+            a[i] = rng() >> (64 - bits);
+            b[i] = rng() >> (64 - bits);
+        }
+        for (size_t i = 0; i < L; i++) {
+            for (size_t j = 0; j < L; j++) {
+                expected[(i + j) % L] += a[i] * b[j];
+            }
+        }
+        EXPECT_EQ(expected, ntt.conv(a, b));
+        EXPECT_EQ(expected, ntt.conv_transformed(a, ntt.ntt(b, false)));
+    }
+    EXPECT_EQ(1u, CrtNTT(20).num_primes());
+    EXPECT_THROW(CrtNTT(41), std::runtime_error);
+    EXPECT_THROW(CrtNTT(40, 10), std::invalid_argument);
+}
+
+TEST(CrtNttTest, ParallelMatchesSerial) {
+    mt19937_64 rng(12);
+    CrtNTT ntt(18, 10, 2);
+    vector<uint64_t> a(ntt.size()), b(ntt.size());
+    for (size_t i = 0; i < a.size(); i++) {
+        a[i] = rng() & 1;
+        b[i] = rng() & 1;
+    }
+    set_num_threads(1);
+    vector<uint64_t> c = ntt.conv(a, b);
+    set_num_threads(8);
+    EXPECT_EQ(c, ntt.conv(a, b));
+    EXPECT_EQ(c, BigNTT(18).conv(a, b));
+    set_num_threads(0);
+}
+
+/** Whether the coefficients of c and expected agree in the ranges */
+template <class T>
+static bool agree_in(const vector<T> &c, const vector<T> &expected, const CoefficientRanges &keep) {
+    for (const auto &r : keep) {
+        for (uint64_t i = r.first; i < r.second; i++) {
+            if (c[i % c.size()] != expected[i % c.size()]) {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
+TEST(PrunedTest, MatchesFullConv) {
+    mt19937_64 rng(14);
+    for (unsigned threads : {1, 8}) {
+        set_num_threads(threads);
+        for (unsigned l : {3, 9, 16}) {
+            NTT ntt(l), ntt3(l, 1);
+            BigNTT big_ntt(l), big_ntt3(l, 1);
+            CrtNTT crt(l + 1, 8, 2);
+            for (int trial = 0; trial < 4; trial++) {
+                // One or two windows, possibly wrapping around
+                uint64_t L = uint64_t(3) << l, m = rng() % (L / (trial + 1)) + 1;
+                CoefficientRanges keep = {{0, m}};
+                if (trial % 2) {
+                    uint64_t start = rng() % L;
+                    keep.push_back({start, start + m});
+                }
+                vector<uint32_t> a(L), b(L);
+                vector<uint64_t> a64(L), b64(L);
+                for (size_t i = 0; i < L; i++) {
+                    a[i] = a64[i] = rng() & 1;
+                    b[i] = b64[i] = rng() & 1;
+                }
+                for (NTT *e : {&ntt, &ntt3}) {
+                    vector<uint32_t> x(a.begin(), a.begin() + e->size()), y(b.begin(), b.begin() + e->size());
+                    EXPECT_TRUE(agree_in(e->conv_transformed(x, e->ntt(y, false), keep), e->conv(x, y), keep));
+                }
+                for (BigNTT *e : {&big_ntt, &big_ntt3}) {
+                    vector<uint64_t> x(a64.begin(), a64.begin() + e->size()), y(b64.begin(), b64.begin() + e->size());
+                    EXPECT_TRUE(agree_in(e->conv_transformed(x, e->ntt(y, false), keep), e->conv(x, y), keep));
+                }
+                vector<uint64_t> x(a64.begin(), a64.begin() + crt.size()), y(b64.begin(), b64.begin() + crt.size());
+                EXPECT_TRUE(agree_in(crt.conv_transformed(x, crt.ntt(y, false), keep), crt.conv(x, y), keep));
+            }
+        }
+    }
+    set_num_threads(0);
+}
+
+TEST(Gf2xTest, MatchesNaiveProduct) {
+    mt19937_64 rng(13);
+    vector<pair<size_t, size_t>> sizes = {{1, 1}, {2, 1}, {3, 3}, {16, 16}, {17, 17}, {33, 5}, {40, 70}, {100, 100}, {129, 64}};
+    for (const Gf2xKernels *kernels : available_gf2x_kernels()) {
+        SCOPED_TRACE(kernels->name);
+        for (auto [na, nb] : sizes) {
+            vector<uint64_t> a(na), b(nb), c(na + nb), expected(na + nb, 0);
+            for (uint64_t &w : a) {
+                w = rng();
+            }
+            for (uint64_t &w : b) {
+                w = rng();
+            }
+            a[0] |= uint64_t(1) << 63;
+            b[nb - 1] = ~uint64_t(0);
+            for (size_t i = 0; i < 64 * na; i++) {
+                if ((a[i >> 6] >> (i & 63)) & 1) {
+                    for (size_t j = 0; j < 64 * nb; j++) {
+                        if ((b[j >> 6] >> (j & 63)) & 1) {
+                            expected[(i + j) >> 6] ^= uint64_t(1) << ((i + j) & 63);
+                        }
+                    }
+                }
+            }
+            gf2x_mul(c.data(), a.data(), na, b.data(), nb, *kernels);
+            EXPECT_EQ(expected, c);
+        }
+    }
+}
+
+TEST(Gf2xTest, ParallelMatchesSerial) {
+    mt19937_64 rng(14);
+    vector<uint64_t> a(5000), b(4500);
+    for (uint64_t &w : a) {
+        w = rng();
+    }
+    for (uint64_t &w : b) {
+        w = rng();
+    }
+    GF2Conv gf2(20);
+    set_num_threads(1);
+    vector<uint64_t> c = gf2.mul(a, b);
+    set_num_threads(8);
+    EXPECT_EQ(c, gf2.mul(a, b));
+    EXPECT_EQ(c, GF2Conv(20, gf2x_scalar_kernels()).mul(a, b));
+    set_num_threads(0);
+}
+
+TEST(ExtractorsTest, Gf2MatchesNtt) {
+    mt19937_64 rng(15);
+    for (ConvKind kind : {ConvKind::toeplitz, ConvKind::circulant, ConvKind::dodis}) {
+        for (uint64_t n : {1, 2, 63, 64, 65, 500, 1021}) {
+            uint64_t m = (n + 1) / 2;
+            vector<uint8_t> x(n), y(conv_seed_length(kind, n, m));
+            for (uint8_t &b : x) {
+                b = rng() & 1;
+            }
+            for (uint8_t &b : y) {
+                b = rng() & 1;
+            }
+            BitView bx{x.data(), x.size()}, by{y.data(), y.size()};
+            NTT ntt(12);
+            GF2Conv gf2(12);
+            EXPECT_EQ(conv_extract(ntt, kind, bx, by, n, m), conv_extract(gf2, kind, bx, by, n, m));
+        }
+    }
+}
+
 
 int main(int argc, char **argv) {
     testing::InitGoogleTest(&argc, argv);
     return RUN_ALL_TESTS();
 }
+
+TEST(ExtractorsTest, ToeplitzStreamMatchesBlocks) {
+    mt19937_64 rng(11);
+    const uint64_t n = 1000, m = 300;
+    vector<uint8_t> x(3 * n), y(n + m - 1);
+    for (auto &bit : x) {
+        bit = rng() & 1;
+    }
+    for (auto &bit : y) {
+        bit = rng() & 1;
+    }
+    BitView xv, yv;
+    xv.data = x.data();
+    yv.data = y.data();
+    yv.size = y.size();
+
+    NTT full(11);
+    vector<vector<uint8_t>> expected;
+    for (int block = 0; block < 3; block++) {
+        xv.data = x.data() + block * n;
+        xv.size = n;
+        expected.push_back(conv_extract(full, ConvKind::toeplitz, xv, yv, n, m));
+    }
+
+    for (uint64_t chunk : {1, 64, 100, 1024}) {
+        NTT ntt(chunk == 1 ? 1 : 11);
+        ToeplitzStream stream(ntt, yv, n, m, chunk);
+        vector<vector<uint8_t>> out;
+        // Feed pieces that straddle chunks and blocks
+        for (size_t pos = 0; pos < x.size(); pos += 77) {
+            xv.data = x.data() + pos;
+            xv.size = min<size_t>(77, x.size() - pos);
+            for (auto &bits : stream.update(xv)) {
+                out.push_back(bits);
+            }
+        }
+        EXPECT_EQ(out, expected);
+        EXPECT_EQ(stream.buffered(), 0u);
+    }
+}
+
+TEST(ExtractorsTest, ToeplitzSegmentedMatchesFull) {
+    mt19937_64 rng(12);
+    const uint64_t n = 1000, m = 300;
+    vector<uint8_t> x(n), y(n + m - 1);
+    for (auto &bit : x) {
+        bit = rng() & 1;
+    }
+    for (auto &bit : y) {
+        bit = rng() & 1;
+    }
+    BitView xv, yv;
+    xv.data = x.data();
+    xv.size = n;
+    yv.data = y.data();
+    yv.size = y.size();
+
+    NTT full(11);
+    vector<uint8_t> expected = conv_extract(full, ConvKind::toeplitz, xv, yv, n, m);
+    for (uint64_t segment : {1, 64, 333, 1000}) {
+        NTT ntt(segment == 1 ? 1 : 11);
+        EXPECT_EQ(toeplitz_extract_segmented(ntt, xv, yv, n, m, segment), expected);
+    }
+    NTT small(6);
+    EXPECT_THROW(toeplitz_extract_segmented(small, xv, yv, n, m, 64), std::invalid_argument);
+}